@@ -3,12 +3,7 @@ from typing import Optional, List
 from task_time_estimator import estimate_task_time
 from websocket_manager import manager
 import db
-from pymongo import MongoClient
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+from mongo_clients import mongo_clients
 
 
 async def run_agent_background(
@@ -39,13 +34,10 @@ async def run_agent_background(
         tag_description = ""
         
         # Get tag description from database
-        mongo_client = MongoClient(MONGO_URI)
-        try:
-            tag = db.get_tag(mongo_client, email, tag_name)
-            if tag:
-                tag_description = tag.get("tag_description", "")
-        finally:
-            mongo_client.close()
+        mongo_client = mongo_clients.get("agents")
+        tag = await db.get_tag(mongo_client, email, tag_name)
+        if tag:
+            tag_description = tag.get("tag_description", "")
 
         # Run the time estimation agent
         # Run the time estimation agent in a separate thread to avoid blocking the event loop
@@ -86,9 +78,8 @@ async def run_agent_background(
         print(f"[DEBUG] WebSocket message sent successfully for task {task_client_id}")
 
         # Persist AI result to database
-        mongo_client = MongoClient(MONGO_URI)
         try:
-            db.update_task_ai_estimation(
+            await db.update_task_ai_estimation(
                 mongo_client,
                 task_client_id,
                 ai_estimation_status="success",
@@ -101,8 +92,6 @@ async def run_agent_background(
             print(f"[DEBUG] Persisted AI result to DB for task {task_client_id}")
         except Exception as e:
             print(f"[ERROR] Failed to persist AI result: {e}")
-        finally:
-            mongo_client.close()
 
         # Notify completion
         await manager.send_personal_message({
@@ -121,17 +110,14 @@ async def run_agent_background(
         }, client_id)
         
         # Persist error status to database
-        mongo_client = MongoClient(MONGO_URI)
         try:
-            db.update_task_ai_estimation(
-                mongo_client,
+            await db.update_task_ai_estimation(
+                mongo_clients.get("agents"),
                 task_client_id,
                 ai_estimation_status="error"
             )
         except:
             pass
-        finally:
-            mongo_client.close()
 
 
 async def run_search_agent_background(
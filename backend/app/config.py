@@ -5,6 +5,10 @@ class Settings(BaseSettings):
     MONGODB_URI: str = "mongodb://localhost:27017"
     DATABASE_NAME: str = "chronoheight"
     ALLOWED_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
+    # How often category_stats is recounted from the tasks. Off (0) by default:
+    # startup backfills the counters once and writes keep them current; turn it
+    # on to repair drift
+    CATEGORY_STATS_RECONCILE_SECONDS: int = 0
 
     class Config:
         env_file = ".env"
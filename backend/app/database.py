@@ -1,4 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import PyMongoError
 from .config import get_settings
 
 settings = get_settings()
@@ -8,12 +10,30 @@ class Database:
 
 db = Database()
 
+# Task listing filters and their (start_time, _id) keyset order; the second also
+# serves the week view and listings without a category
+TASK_INDEXES = [
+    IndexModel([("category", ASCENDING), ("start_time", ASCENDING), ("_id", ASCENDING)], name="category_start_time"),
+    IndexModel([("start_time", ASCENDING), ("_id", ASCENDING)], name="start_time"),
+]
+
 async def get_database():
     return db.client[settings.DATABASE_NAME]
 
 async def connect_to_mongo():
     db.client = AsyncIOMotorClient(settings.MONGODB_URI)
     print("Connected to MongoDB")
+    try:
+        await db.client[settings.DATABASE_NAME]["tasks"].create_indexes(TASK_INDEXES)
+    except PyMongoError as e:
+        print(f"Index creation failed: {e}")
+    # Imported here: the task service itself imports this module
+    from .services.task_service import TaskService
+    try:
+        if await TaskService.backfill_category_stats():
+            print("Backfilled category_stats from the tasks")
+    except PyMongoError as e:
+        print(f"Category stats backfill failed: {e}")
 
 async def close_mongo_connection():
     db.client.close()
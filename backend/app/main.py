@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -5,15 +7,32 @@ from contextlib import asynccontextmanager
 from app.config import get_settings
 from app.database import connect_to_mongo, close_mongo_connection
 from app.routers import tasks, calendar
+from app.services.task_service import TaskService
 
 settings = get_settings()
 
+async def reconcile_category_stats_periodically(interval: int):
+    """Recounts category_stats at startup and then every interval seconds."""
+    while True:
+        try:
+            await TaskService.reconcile_category_stats()
+        except Exception as e:
+            print(f"Category stats reconciliation failed: {e}")
+        await asyncio.sleep(interval)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
+    reconcile_job = None
+    if settings.CATEGORY_STATS_RECONCILE_SECONDS > 0:
+        reconcile_job = asyncio.create_task(
+            reconcile_category_stats_periodically(settings.CATEGORY_STATS_RECONCILE_SECONDS)
+        )
     yield
     # Shutdown
+    if reconcile_job:
+        reconcile_job.cancel()
     await close_mongo_connection()
 
 app = FastAPI(
@@ -30,6 +49,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-After-Start-Time", "X-Next-After-Id"],
 )
 
 # Routers
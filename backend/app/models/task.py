@@ -24,12 +24,16 @@ class TaskUpdate(BaseModel):
     start_time: Optional[datetime] = None
     duration: Optional[int] = None
     is_completed: Optional[bool] = None
+    # Optimistic concurrency: the version the client last read (update fails with 409 if it moved on)
+    version: Optional[int] = None
 
 class Task(TaskBase):
     id: Optional[PyObjectId] = Field(alias="_id", default=None)
     end_time: datetime
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Bumped by every update; tasks written before versioning read as 0
+    version: int = 0
     
     # Phase 3 prep
     embedding: Optional[List[float]] = None
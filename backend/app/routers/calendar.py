@@ -29,6 +29,7 @@ async def get_week_view(start: datetime = Query(default_factory=datetime.utcnow)
 async def get_category_stats():
     """
     Get category summary stats.
+    Read from the incrementally kept category_stats counters (O(1), no task scan).
     """
     # Return seed categories + stats?
     # For now, just stats from db.
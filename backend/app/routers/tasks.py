@@ -1,4 +1,6 @@
-from fastapi import APIRouter, HTTPException, Query, Body, status
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query, Body, Response, status
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Any
 from datetime import datetime
 
@@ -9,14 +11,37 @@ router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 
 @router.get("/", response_model=List[Task])
 async def list_tasks(
+    response: Response,
     category: Optional[str] = Query(None),
     start_date: Optional[datetime] = Query(None),
-    end_date: Optional[datetime] = Query(None)
+    end_date: Optional[datetime] = Query(None),
+    after_start_time: Optional[datetime] = Query(None),
+    after_id: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    stream: bool = Query(False)
 ):
     """
-    List tasks with optional filters.
+    List tasks with optional filters, ordered by start_time.
+    A full page carries the next page's after_start_time/after_id in the
+    X-Next-After-Start-Time / X-Next-After-Id headers.
+    With stream=true every matching task is sent as NDJSON (limit is ignored).
     """
-    return await TaskService.get_tasks(category, start_date, end_date)
+    if (after_start_time is None) != (after_id is None):
+        raise HTTPException(status_code=400, detail="after_start_time and after_id must be given together")
+    if after_id is not None and not ObjectId.is_valid(after_id):
+        raise HTTPException(status_code=400, detail="after_id is not a valid id")
+
+    if stream:
+        async def ndjson():
+            async for task in TaskService.iter_tasks(category, start_date, end_date, after_start_time, after_id):
+                yield task.model_dump_json(by_alias=True) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    tasks = await TaskService.get_tasks(category, start_date, end_date, after_start_time, after_id, limit)
+    if len(tasks) == limit:
+        response.headers["X-Next-After-Start-Time"] = tasks[-1].start_time.isoformat()
+        response.headers["X-Next-After-Id"] = str(tasks[-1].id)
+    return tasks
 
 @router.post("/", response_model=Task, status_code=status.HTTP_201_CREATED)
 async def create_task(task: TaskCreate):
@@ -59,10 +84,12 @@ async def delete_task(task_id: str):
 async def move_task(
     task_id: str,
     start_time: Optional[datetime] = Body(None),
-    category: Optional[str] = Body(None) # category: Literal["work", ...] but str is fine here
+    category: Optional[str] = Body(None), # category: Literal["work", ...] but str is fine here
+    version: Optional[int] = Body(None)
 ):
     """
     Quick endpoint for drag-drop moves.
+    Send the task's version to get a 409 instead of overwriting a concurrent move.
     """
     # Create TaskUpdate object manually or use service helper.
     # The requirement said "PATCH .../move".
@@ -84,6 +111,8 @@ async def move_task(
         return task
 
     # We can use update_task directly.
+    if version is not None:
+        update_data["version"] = version
     task_update = TaskUpdate(**update_data)
     task = await TaskService.update_task(task_id, task_update)
     
@@ -1,11 +1,72 @@
 from datetime import datetime, timedelta
-from typing import List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any
 from bson import ObjectId
 from fastapi import HTTPException
+from pymongo import ReturnDocument
 
 from app.models.task import Task, TaskCreate, TaskUpdate
 from app.database import get_database
-from app.utils.date_utils import calculate_end_time
+from app.utils.date_utils import calculate_end_time, to_naive_utc
+
+CATEGORIES = ("work", "school", "hobbies")
+
+# Task listings: (start_time, _id) order so keyset pages never skip or repeat ties
+TASK_LIST_ORDER = [("start_time", 1), ("_id", 1)]
+TASK_LIST_PROJECTION = {"embedding": 0, "stats_counted": 0}
+
+# Week view documents: everything the calendar renders, not the embedding
+WEEK_VIEW_PROJECTION = {
+    "_id": {"$toString": "$_id"},
+    "title": 1, "description": 1, "category": 1,
+    "start_time": 1, "end_time": 1, "duration": 1,
+    "is_completed": 1, "estimated_time": 1, "productivity_score": 1,
+    "created_at": 1, "updated_at": 1,
+    # Sent back as TaskUpdate.version when the calendar moves or edits the task
+    "version": 1,
+}
+
+# {_id: category, count, total_duration}, kept current with $inc by task writes.
+# Each task's stats_counted records the {category, duration} it is counted under.
+CATEGORY_STATS = "category_stats"
+# Compare-and-set retries when another update re-counts the same task
+_RECOUNT_ATTEMPTS = 3
+
+
+def _stats_snapshot(task: dict) -> dict:
+    return {"category": task.get("category"), "duration": task.get("duration") or 0}
+
+
+async def _inc_category_stats(db, old: Optional[dict], new: Optional[dict]):
+    """Moves one task's contribution from old to new ({category, duration} or None)."""
+    changes: Dict[Any, Dict[str, int]] = {}
+    for sign, snapshot in ((-1, old), (1, new)):
+        if snapshot:
+            amounts = changes.setdefault(snapshot["category"], {"count": 0, "total_duration": 0})
+            amounts["count"] += sign
+            amounts["total_duration"] += sign * snapshot["duration"]
+    for category, amounts in changes.items():
+        if any(amounts.values()):
+            await db[CATEGORY_STATS].update_one({"_id": category}, {"$inc": amounts}, upsert=True)
+
+
+async def _recount_task(db, task: dict):
+    """After an update, swaps the task's stats_counted to its current values and $incs the difference."""
+    for _ in range(_RECOUNT_ATTEMPTS):
+        old, new = task.get("stats_counted"), _stats_snapshot(task)
+        if old == new:
+            return
+        result = await db["tasks"].update_one(
+            {"_id": task["_id"], "stats_counted": old},
+            {"$set": {"stats_counted": new}}
+        )
+        if result.modified_count:
+            await _inc_category_stats(db, old, new)
+            return
+        task = await db["tasks"].find_one({"_id": task["_id"]}, {"category": 1, "duration": 1, "stats_counted": 1})
+        if task is None:
+            return
+    print(f"Category stats for task {task['_id']} kept changing; the next reconciliation will fix them")
+
 
 class TaskService:
     @staticmethod
@@ -24,15 +85,27 @@ class TaskService:
         # Let's set it to duration for now if not present, but TaskCreate doesn't have it. 
         # Ah, TaskCreate doesn't have estimated_time. So we infer it or set it same as duration.
         task_data["estimated_time"] = task_data["duration"]
+        task_data["version"] = 1
+        task_data["stats_counted"] = _stats_snapshot(task_data)
         
         result = await db["tasks"].insert_one(task_data)
-        created_task = await db["tasks"].find_one({"_id": result.inserted_id})
-        return Task(**created_task)
+        await _inc_category_stats(db, None, task_data["stats_counted"])
+        # insert_one doesn't change anything server-side, so no need to read it back
+        task_data["_id"] = result.inserted_id
+        return Task(**task_data)
 
     @staticmethod
-    async def get_tasks(category: Optional[str] = None, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[Task]:
-        db = await get_database()
+    def _list_query(
+        category: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        after_start_time: Optional[datetime] = None,
+        after_id: Optional[str] = None
+    ) -> dict:
         query: dict[str, Any] = {}
+        # Query strings may carry an offset (...Z) while the echoed cursor is naive;
+        # the bounds below compare them, so both are naive UTC like the stored times
+        start_date, end_date, after_start_time = (to_naive_utc(value) for value in (start_date, end_date, after_start_time))
         if category:
             query["category"] = category
         
@@ -43,10 +116,52 @@ class TaskService:
         elif start_date:
             query["start_time"] = {"$gte": start_date}
 
-        cursor = db["tasks"].find(query).sort("start_time", 1)
-        tasks = await cursor.to_list(length=100)
+        # Keyset cursor: strictly after (after_start_time, after_id) in list order.
+        # The $gte bound lets the start_time index skip the earlier pages; the $or
+        # alone would be planned as a scan of each branch
+        if after_start_time is not None and after_id is not None:
+            bounds = query.setdefault("start_time", {})
+            bounds["$gte"] = max(bounds["$gte"], after_start_time) if "$gte" in bounds else after_start_time
+            query["$or"] = [
+                {"start_time": {"$gt": after_start_time}},
+                {"start_time": after_start_time, "_id": {"$gt": ObjectId(after_id)}},
+            ]
+        return query
+
+    @staticmethod
+    async def get_tasks(
+        category: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        after_start_time: Optional[datetime] = None,
+        after_id: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Task]:
+        """
+        One page of tasks in (start_time, _id) order. Pass the last task's
+        start_time and id as after_start_time/after_id to get the next page.
+        """
+        db = await get_database()
+        query = TaskService._list_query(category, start_date, end_date, after_start_time, after_id)
+        cursor = db["tasks"].find(query, TASK_LIST_PROJECTION).sort(TASK_LIST_ORDER).limit(limit)
+        tasks = await cursor.to_list(length=None)
         return [Task(**task) for task in tasks]
 
+    @staticmethod
+    async def iter_tasks(
+        category: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        after_start_time: Optional[datetime] = None,
+        after_id: Optional[str] = None
+    ) -> AsyncIterator[Task]:
+        """Every matching task in list order, read in batches (for streaming large ranges)."""
+        db = await get_database()
+        query = TaskService._list_query(category, start_date, end_date, after_start_time, after_id)
+        cursor = db["tasks"].find(query, TASK_LIST_PROJECTION).sort(TASK_LIST_ORDER).batch_size(1000)
+        async for task in cursor:
+            yield Task(**task)
+
     @staticmethod
     async def get_task(task_id: str) -> Optional[Task]:
         db = await get_database()
@@ -57,40 +172,57 @@ class TaskService:
 
     @staticmethod
     async def update_task(task_id: str, task_update: TaskUpdate) -> Optional[Task]:
+        """
+        Applies the update and returns the task as written, in one round trip.
+        If task_update.version is set the write only happens while the stored
+        version still matches (409 otherwise), so concurrent edits fail fast.
+        """
         db = await get_database()
         update_data = task_update.model_dump(exclude_unset=True)
+        expected_version = update_data.pop("version", None)
         
         if not update_data:
             return await TaskService.get_task(task_id)
 
-        # specific logic for drag-drop (move) handled generally by update or specific method?
-        # If start_time or duration changes, we might need to recalculate end_time
-        current_task = await db["tasks"].find_one({"_id": ObjectId(task_id)})
-        if not current_task:
-            return None
-            
-        if "start_time" in update_data or "duration" in update_data:
-            start = update_data.get("start_time", current_task["start_time"])
-            duration = update_data.get("duration", current_task["duration"])
-            update_data["end_time"] = calculate_end_time(start, duration)
-            
+        query: dict[str, Any] = {"_id": ObjectId(task_id)}
+        if expected_version is not None:
+            # Tasks written before versioning count as version 0
+            query["version"] = expected_version if expected_version else {"$in": [0, None]}
+
         update_data["updated_at"] = datetime.utcnow()
-        
-        await db["tasks"].update_one(
-            {"_id": ObjectId(task_id)},
-            {"$set": update_data}
-        )
-        
-        return await TaskService.get_task(task_id)
+        # Update pipeline: values are $literal so strings starting with "$" aren't read as field paths
+        pipeline: List[dict] = [
+            {"$set": {
+                **{field: {"$literal": value} for field, value in update_data.items()},
+                "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+            }}
+        ]
+        if "start_time" in update_data or "duration" in update_data:
+            # end_time from the stored start_time/duration merged with this update
+            pipeline.append({"$set": {
+                "end_time": {"$add": ["$start_time", {"$multiply": ["$duration", 60 * 1000]}]}
+            }})
+
+        task = await db["tasks"].find_one_and_update(query, pipeline, return_document=ReturnDocument.AFTER)
+        if task is not None:
+            if "category" in update_data or "duration" in update_data:
+                await _recount_task(db, task)
+            return Task(**task)
+        if expected_version is not None and await db["tasks"].count_documents({"_id": query["_id"]}, limit=1):
+            raise HTTPException(status_code=409, detail="Task was modified by another request; reload and retry")
+        return None
 
     @staticmethod
     async def delete_task(task_id: str) -> bool:
         db = await get_database()
-        result = await db["tasks"].delete_one({"_id": ObjectId(task_id)})
-        return result.deleted_count > 0
+        task = await db["tasks"].find_one_and_delete({"_id": ObjectId(task_id)}, projection={"stats_counted": 1})
+        if task is None:
+            return False
+        await _inc_category_stats(db, task.get("stats_counted"), None)
+        return True
 
     @staticmethod
-    async def move_task(task_id: str, start_time: Optional[datetime] = None, category: Optional[str] = None) -> Optional[Task]:
+    async def move_task(task_id: str, start_time: Optional[datetime] = None, category: Optional[str] = None, version: Optional[int] = None) -> Optional[Task]:
         update_data: dict[str, Any] = {}
         if start_time:
             update_data["start_time"] = start_time
@@ -99,51 +231,82 @@ class TaskService:
             
         if not update_data:
             return await TaskService.get_task(task_id)
+        if version is not None:
+            update_data["version"] = version
             
         return await TaskService.update_task(task_id, TaskUpdate(**update_data))
 
     @staticmethod
     async def get_week_view(start_date: datetime) -> dict:
         db = await get_database()
-        # Ensure we get whole week
-        # Actually logic says "Get week view data (grouped by day and category)"
-        # The frontend likely requests a specific week start date.
-        
         end_date = start_date + timedelta(days=7)
-        
-        cursor = db["tasks"].find({
-            "start_time": {"$gte": start_date, "$lt": end_date}
-        })
-        tasks = await cursor.to_list(length=1000)
-        
-        # Group by date string (YYYY-MM-DD) and then category
-        week_view = {}
-        # Initialize days? Or just return what we have? 
+
+        # Group by date string (YYYY-MM-DD) and then category in Mongo; documents go
+        # out as plain dicts (no Task validation) and without the embedding vector.
+        pipeline = [
+            {"$match": {"start_time": {"$gte": start_date, "$lt": end_date}}},
+            {"$sort": {"start_time": 1}},
+            {"$project": WEEK_VIEW_PROJECTION},
+            {"$group": {
+                "_id": {
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$start_time"}},
+                    "category": "$category"
+                },
+                "tasks": {"$push": "$$ROOT"}
+            }},
+        ]
+        groups = db["tasks"].aggregate(pipeline, allowDiskUse=True)
+
         # Requirement: "2024-01-15": { "work": [], ... }
-        # Better to initialize structure if we want to be consistent, but dynamic is fine too.
-        
-        for task_doc in tasks:
-            task = Task(**task_doc)
-            date_key = task.start_time.strftime("%Y-%m-%d")
-            
-            if date_key not in week_view:
-                week_view[date_key] = {"work": [], "school": [], "hobbies": []}
-                
-            if task.category in week_view[date_key]:
-                week_view[date_key][task.category].append(task)
-            else:
-                 # Fallback if category invalid or new
-                 if task.category not in week_view[date_key]:
-                     week_view[date_key][task.category] = []
-                 week_view[date_key][task.category].append(task)
-                 
-        return week_view
+        week_view: Dict[str, Dict[str, List[dict]]] = {}
+        async for group in groups:
+            day = week_view.setdefault(group["_id"]["day"], {category: [] for category in CATEGORIES})
+            day[group["_id"]["category"]] = group["tasks"]
+        return dict(sorted(week_view.items()))
 
     @staticmethod
     async def get_category_stats():
+        """Per-category {_id, count, total_duration}: one small read, no task scan."""
         db = await get_database()
+        return await db[CATEGORY_STATS].find({"count": {"$gt": 0}}).to_list(length=None)
+
+    @staticmethod
+    async def backfill_category_stats() -> bool:
+        """
+        Runs reconcile_category_stats() when the counters are missing tasks: none
+        have been built yet, or some tasks were written without stats_counted
+        (before the counters existed). Called at startup; returns whether it ran.
+        """
+        db = await get_database()
+        empty = await db[CATEGORY_STATS].find_one({}, {"_id": 1}) is None
+        uncounted = await db["tasks"].find_one({"stats_counted": {"$exists": False}}, {"_id": 1})
+        if not empty and uncounted is None:
+            return False
+        await TaskService.reconcile_category_stats()
+        return True
+
+    @staticmethod
+    async def reconcile_category_stats() -> List[dict]:
+        """
+        Recounts category_stats from the tasks, fixing any drift (e.g. a crash
+        between a write and its $inc). Only tasks whose stats_counted no longer
+        matches their fields are written; the totals are aggregated into a new
+        collection that $out swaps in for category_stats in one step.
+        Writes that land while it runs can be miscounted until the next run.
+        """
+        db = await get_database()
+        current = {"category": "$category", "duration": {"$ifNull": ["$duration", 0]}}
+        await db["tasks"].update_many(
+            {"$expr": {"$ne": ["$stats_counted", current]}},
+            [{"$set": {"stats_counted": current}}]
+        )
         pipeline = [
-            {"$group": {"_id": "$category", "count": {"$sum": 1}, "total_duration": {"$sum": "$duration"}}}
+            {"$group": {
+                "_id": "$stats_counted.category",
+                "count": {"$sum": 1},
+                "total_duration": {"$sum": "$stats_counted.duration"}
+            }},
+            {"$out": CATEGORY_STATS},
         ]
-        stats = await db["tasks"].aggregate(pipeline).to_list(length=None)
-        return stats
+        await db["tasks"].aggregate(pipeline).to_list(length=None)
+        return await TaskService.get_category_stats()
@@ -1,9 +1,16 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 def calculate_end_time(start_time: datetime, duration_minutes: int) -> datetime:
     """Calculates end time based on start time and duration."""
     return start_time + timedelta(minutes=duration_minutes)
 
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Converts an aware datetime to naive UTC, the form task times are stored and compared in."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
 def get_week_range(date: datetime = None) -> tuple[datetime, datetime]:
     """Returns the start and end of the week for a given date."""
     if date is None:
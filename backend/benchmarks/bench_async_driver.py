@@ -0,0 +1,128 @@
+"""
+Concurrent dashboard-load benchmark: blocking pymongo vs the async db layer.
+
+"before" replays what main.py used to do (synchronous pymongo calls made
+directly inside coroutines), "after" awaits the Motor-backed functions in
+db.py. Each simulated request performs the reads a dashboard load makes
+(user, settings, tags). A heartbeat coroutine measures how long the event
+loop is stalled, which is what every open WebSocket experiences.
+
+Usage (from backend/):
+    python -m benchmarks.bench_async_driver --requests 2000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+import db
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+BENCH_DB = "flowstate_bench"
+USER_COUNT = 200
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _seed(client: AsyncIOMotorClient):
+    database = client[BENCH_DB]
+    await database["users"].delete_many({})
+    await database["tags"].delete_many({})
+    await database["users"].insert_many([
+        {"email": f"bench{i}@flowstate.dev", "settings": {"light_mode": False}}
+        for i in range(USER_COUNT)
+    ])
+    await database["tags"].insert_many([
+        {"email": f"bench{i}@flowstate.dev", "tag_name": name, "tag_description": name}
+        for i in range(USER_COUNT)
+        for name in ("work", "school", "hobbies")
+    ])
+
+
+async def _heartbeat(stop: asyncio.Event, stalls: List[float], interval: float = 0.005):
+    """Records how late each tick fires; late ticks mean the loop was blocked."""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        stalls.append(max(0.0, time.perf_counter() - expected))
+
+
+async def _run(mode: str, requests: int, concurrency: int) -> dict:
+    sync_client = MongoClient(MONGO_URI)
+    async_client = AsyncIOMotorClient(MONGO_URI)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def blocking_request(email: str):
+        # Mirrors the pre-async endpoints: pymongo calls on the event loop thread
+        database = sync_client[BENCH_DB]
+        database["users"].find_one({"email": email})
+        database["users"].find_one({"email": email}, {"settings": 1})
+        list(database["tags"].find({"email": email}))
+
+    async def async_request(email: str):
+        await db.get_user(async_client, email)
+        await db.get_settings(async_client, email)
+        await db.get_all_tags_for_user(async_client, email)
+
+    handler = blocking_request if mode == "before" else async_request
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await handler(f"bench{i % USER_COUNT}@flowstate.dev")
+            latencies.append(time.perf_counter() - started)
+
+    stop = asyncio.Event()
+    stalls: List[float] = []
+    heartbeat = asyncio.create_task(_heartbeat(stop, stalls))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await heartbeat
+
+    sync_client.close()
+    async_client.close()
+    return {
+        "mode": mode,
+        "throughput": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "max_loop_stall_ms": (max(stalls) if stalls else 0.0) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    db.DB_NAME = BENCH_DB
+    seed_client = AsyncIOMotorClient(MONGO_URI)
+    await _seed(seed_client)
+
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'loop stall ms':>16}")
+    for mode in ("before", "after"):
+        r = await _run(mode, args.requests, args.concurrency)
+        print(f"{r['mode']:<8}{r['throughput']:>10.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_loop_stall_ms']:>16.2f}")
+
+    await seed_client.drop_database(BENCH_DB)
+    seed_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Task write throughput: one set_task per task vs set_tasks_bulk.
+
+By default a constant local embedder stands in for Gemini so the numbers
+isolate Mongo round trips; pass --gemini to include real embedding calls
+(per-task embed_query vs one embed_documents call per bulk chunk).
+
+Usage (from backend/):
+    python -m benchmarks.bench_bulk_upsert --tasks 2000 --chunk 500
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import db
+from embedding_service import embedding_service
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+BENCH_DB = "flowstate_bench"
+EMAIL = "bench@flowstate.dev"
+
+
+class ConstantEmbeddings:
+    def embed_query(self, text):
+        return [0.0] * 8
+
+    def embed_documents(self, texts):
+        return [[0.0] * 8 for _ in texts]
+
+
+def _task(prefix: str, i: int) -> dict:
+    return {
+        "email": EMAIL,
+        "title": f"{prefix} task {i}",
+        "task_client_id": f"{prefix}-{i}",
+        "description": f"Imported task number {i}",
+        "tag_names": ["work"],
+        "start_time": datetime(2024, 1, 1, 9, 0) + timedelta(hours=i),
+        "duration": 30,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--chunk", type=int, default=500, help="Items per bulk request")
+    parser.add_argument("--gemini", action="store_true", help="Use the real Gemini embeddings client")
+    args = parser.parse_args()
+
+    if not args.gemini:
+        embedding_service._client = ConstantEmbeddings()
+    db.DB_NAME = BENCH_DB
+    client = AsyncIOMotorClient(MONGO_URI)
+    await client.drop_database(BENCH_DB)
+    await db.ensure_indexes(client)
+
+    started = time.perf_counter()
+    for i in range(args.tasks):
+        await db.set_task(client, **_task("single", i))
+    single = args.tasks / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for offset in range(0, args.tasks, args.chunk):
+        chunk = [_task("bulk", i) for i in range(offset, min(offset + args.chunk, args.tasks))]
+        await db.set_tasks_bulk(client, chunk)
+    bulk = args.tasks / (time.perf_counter() - started)
+
+    print(f"{'path':<24}{'tasks/sec':>12}")
+    print(f"{'POST /api/tasks':<24}{single:>12.1f}")
+    print(f"{'POST /api/tasks/bulk':<24}{bulk:>12.1f}")
+    print(f"speedup: {bulk / single:.1f}x")
+
+    await client.drop_database(BENCH_DB)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
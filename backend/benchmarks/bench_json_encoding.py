@@ -0,0 +1,86 @@
+"""
+Serialization micro-benchmark: time to turn N task documents into a JSON body.
+
+Compares the old endpoint path (per-document _id/start_time conversion, then
+FastAPI's jsonable_encoder + json.dumps) with json_response.dumps (orjson,
+ObjectId and datetime handled natively). No database needed; documents are
+shaped like what Motor returns for a listing read.
+
+Usage (from backend/):
+    python -m benchmarks.bench_json_encoding --tasks 10000 --runs 20
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from json_response import dumps
+
+
+def _documents(count: int):
+    start = datetime(2024, 1, 1, 9, 0)
+    return [{
+        "_id": ObjectId(),
+        "email": "bench@flowstate.dev",
+        "task_client_id": f"bench-{i}",
+        "title": f"Task {i}",
+        "description": "Benchmark task description",
+        "tag_names": ["work", "deep-focus"],
+        "start_time": start + timedelta(hours=i),
+        "duration": 60,
+        "estimated_cost": 0,
+        "is_completed": i % 3 == 0,
+        "color": "#4f46e5",
+        "ai_estimation_status": "success",
+        "ai_time_estimation": 75,
+        "ai_confidence": "medium",
+    } for i in range(count)]
+
+
+def _legacy_body(docs) -> bytes:
+    """What an endpoint did before: serialize_task per document, then FastAPI's encoder."""
+    items = []
+    for doc in docs:
+        task = dict(doc)
+        task["_id"] = str(task["_id"])
+        if isinstance(task.get("start_time"), datetime):
+            task["start_time"] = task["start_time"].strftime('%Y-%m-%dT%H:%M:%SZ')
+        items.append(task)
+    return json.dumps(jsonable_encoder(items), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _measure(label: str, encode, docs, runs: int) -> float:
+    timings = []
+    body = b""
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = encode(docs)
+        timings.append((time.perf_counter() - started) * 1000)
+    p50 = statistics.median(timings)
+    print(f"{label:<36}{len(body) / 1024:>12.1f}{p50:>10.2f}{min(timings):>10.2f}")
+    return p50
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    docs = _documents(args.tasks)
+    # Both paths must produce the same JSON
+    assert json.loads(_legacy_body(docs)) == json.loads(dumps(docs))
+
+    print(f"{'encoder':<36}{'body KB':>12}{'p50 ms':>10}{'min ms':>10}")
+    before = _measure("serialize_task + jsonable_encoder", _legacy_body, docs, args.runs)
+    after = _measure("json_response.dumps (orjson)", dumps, docs, args.runs)
+    print(f"speedup: {before / after:.1f}x per {args.tasks} tasks")
+
+
+if __name__ == "__main__":
+    main()
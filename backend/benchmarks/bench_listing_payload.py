@@ -0,0 +1,87 @@
+"""
+Listing payload benchmark for a seeded 10k-task user.
+
+Compares the JSON size and read+serialize time of GET /api/tasks/{email}
+for the old whole-document read, the default projection (no embeddings)
+and a ?fields= projection with only the columns the calendar renders.
+
+Usage (from backend/):
+    python -m benchmarks.bench_listing_payload --tasks 10000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import db
+from json_response import dumps
+from main import parse_fields
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+BENCH_DB = "flowstate_bench"
+EMAIL = "bench@flowstate.dev"
+EMBEDDING_DIMS = 3072
+
+
+async def _seed(client: AsyncIOMotorClient, count: int):
+    collection = client[BENCH_DB]["tasks"]
+    await collection.delete_many({})
+    start = datetime(2024, 1, 1, 9, 0)
+    batch = []
+    for i in range(count):
+        batch.append({
+            "email": EMAIL,
+            "task_client_id": f"bench-{i}",
+            "title": f"Task {i}",
+            "description": "Benchmark task description",
+            "tag_names": ["work"],
+            "start_time": start + timedelta(hours=i),
+            "duration": 60,
+            "estimated_cost": 0,
+            "is_completed": False,
+            "embedding": [random.random() for _ in range(EMBEDDING_DIMS)],
+        })
+        if len(batch) == 500:
+            await collection.insert_many(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch)
+
+
+async def _measure(label: str, read):
+    started = time.perf_counter()
+    tasks = await read()
+    body = dumps(tasks)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28}{len(body) / 1024 / 1024:>12.2f}{elapsed * 1000:>12.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=10000)
+    args = parser.parse_args()
+
+    db.DB_NAME = BENCH_DB
+    client = AsyncIOMotorClient(MONGO_URI)
+    await _seed(client, args.tasks)
+    collection = client[BENCH_DB]["tasks"]
+
+    print(f"{'read':<28}{'body MB':>12}{'ms':>12}")
+    await _measure("whole documents (before)", lambda: collection.find({"email": EMAIL}).to_list(length=None))
+    await _measure("default projection", lambda: db.get_all_tasks_for_user(client, EMAIL))
+    fields = parse_fields("title,start_time,duration,color,is_completed")
+    await _measure("?fields=calendar columns", lambda: db.get_all_tasks_for_user(client, EMAIL, fields))
+
+    await client.drop_database(BENCH_DB)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""
+Calendar window benchmark: week range query vs the full task list.
+
+Seeds a user with several years of hourly tasks (plus a few multi-day ones),
+then compares latency and JSON payload of GET /api/tasks/{email} against
+GET /api/tasks/{email}/range for a one-week window, and reports the
+explain() plan of the range query (it should be an IXSCAN on
+email_start_time with totalDocsExamined close to the number returned).
+
+Usage (from backend/):
+    python -m benchmarks.bench_range_query --tasks 30000 --runs 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import db
+from json_response import dumps
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+BENCH_DB = "flowstate_bench"
+EMAIL = "bench@flowstate.dev"
+FIRST_START = datetime(2023, 1, 2, 9, 0)
+
+
+async def _seed(client: AsyncIOMotorClient, count: int):
+    collection = client[BENCH_DB]["tasks"]
+    await collection.delete_many({})
+    batch = []
+    for i in range(count):
+        batch.append({
+            "email": EMAIL,
+            "task_client_id": f"bench-{i}",
+            "title": f"Task {i}",
+            "description": "Calendar task",
+            "tag_names": ["work"],
+            "start_time": FIRST_START + timedelta(hours=i),
+            # Every 500th task runs for three days so the lookback is non-trivial
+            "duration": 3 * 24 * 60 if i % 500 == 0 else 60,
+            "is_completed": False,
+        })
+        if len(batch) == 5000:
+            await collection.insert_many(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch)
+
+
+async def _measure(label: str, read, runs: int):
+    timings = []
+    body = b""
+    for _ in range(runs):
+        started = time.perf_counter()
+        tasks = await read()
+        body = dumps(tasks)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{label:<22}{len(tasks):>8}{len(body) / 1024:>12.1f}"
+        f"{statistics.median(timings):>10.1f}{max(timings):>10.1f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=30000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    db.DB_NAME = BENCH_DB
+    client = AsyncIOMotorClient(MONGO_URI)
+    await _seed(client, args.tasks)
+    await db.ensure_indexes(client)
+
+    # A week in the middle of the seeded history
+    start = FIRST_START + timedelta(hours=args.tasks // 2)
+    end = start + timedelta(days=7)
+
+    print(f"{'read':<22}{'tasks':>8}{'body KB':>12}{'p50 ms':>10}{'max ms':>10}")
+    await _measure("full list", lambda: db.get_all_tasks_for_user(client, EMAIL), args.runs)
+    await _measure("range (one week)", lambda: db.get_tasks_in_range(client, EMAIL, start, end), args.runs)
+
+    lookback = timedelta(minutes=3 * 24 * 60)
+    plan = await client[BENCH_DB]["tasks"].find({
+        "email": EMAIL,
+        "start_time": {"$gte": start - lookback, "$lt": end}
+    }).explain()
+    stats = plan.get("executionStats", {})
+    print(
+        f"range plan: index={plan['queryPlanner']['winningPlan'].get('inputStage', {}).get('indexName')} "
+        f"keysExamined={stats.get('totalKeysExamined')} docsExamined={stats.get('totalDocsExamined')}"
+    )
+
+    await client.drop_database(BENCH_DB)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
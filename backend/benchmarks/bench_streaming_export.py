@@ -0,0 +1,90 @@
+"""
+Memory profile of a full task export: JSON list vs ?stream=true NDJSON.
+
+Seeds N tasks for one user, then reads GET /api/tasks/{email} through the
+ASGI app in both modes and reports bytes received and the peak Python heap
+(tracemalloc) while the response was produced. The NDJSON peak should stay
+flat as N grows; the list peak grows with N.
+
+Usage (from backend/):
+    python -m benchmarks.bench_streaming_export --tasks 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import httpx
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import db
+import main
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+BENCH_DB = "flowstate_bench"
+EMAIL = "bench@flowstate.dev"
+
+
+async def _seed(client: AsyncIOMotorClient, count: int):
+    collection = client[BENCH_DB]["tasks"]
+    await collection.delete_many({})
+    start = datetime(2020, 1, 1, 9, 0)
+    batch = []
+    for i in range(count):
+        batch.append({
+            "email": EMAIL,
+            "task_client_id": f"bench-{i}",
+            "title": f"Task {i}",
+            "description": "Exported task",
+            "start_time": start + timedelta(minutes=30 * i),
+            "duration": 30,
+        })
+        if len(batch) == 5000:
+            await collection.insert_many(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch)
+
+
+async def _export(http: httpx.AsyncClient, stream: bool):
+    tracemalloc.start()
+    started = time.perf_counter()
+    received = 0
+    async with http.stream("GET", f"/api/tasks/{EMAIL}", params={"stream": "true"} if stream else None) as response:
+        async for chunk in response.aiter_bytes():
+            received += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    label = "NDJSON stream" if stream else "JSON list"
+    print(f"{label:<16}{received / 1024 / 1024:>12.1f}{peak / 1024 / 1024:>14.1f}{elapsed:>10.1f}")
+
+
+async def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=100000)
+    args = parser.parse_args()
+
+    db.DB_NAME = BENCH_DB
+    client = AsyncIOMotorClient(MONGO_URI)
+    await _seed(client, args.tasks)
+    await db.ensure_indexes(client)
+    main.mongo_client = client
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        print(f"{'mode':<16}{'body MB':>12}{'peak heap MB':>14}{'s':>10}")
+        await _export(http, stream=True)
+        await _export(http, stream=False)
+
+    await client.drop_database(BENCH_DB)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,111 @@
+"""
+Week view benchmark for the ChronoHeight app: TaskService.get_week_view.
+
+Seeds one week with N tasks (10k+ by default) spread over the three
+categories, then compares the previous implementation (find, to_list(1000),
+a Pydantic Task per document, grouping in Python) with the $group pipeline.
+Reports latency, how many tasks each returned (the old one truncates at 1000)
+and the encoded payload size.
+
+Usage (from backend/):
+    python -m benchmarks.bench_week_view --tasks 20000 --runs 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import database
+from app.models.task import Task
+from app.services.task_service import CATEGORIES, TaskService
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+BENCH_DB = "chronoheight_bench"
+WEEK_START = datetime(2024, 1, 15)
+
+
+async def _seed(client: AsyncIOMotorClient, count: int):
+    collection = client[BENCH_DB]["tasks"]
+    await collection.delete_many({})
+    await collection.create_index("start_time")
+    step = timedelta(days=7) / count
+    batch = []
+    for i in range(count):
+        start = WEEK_START + step * i
+        batch.append({
+            "title": f"Task {i}",
+            "description": "Week view task",
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "start_time": start,
+            "end_time": start + timedelta(minutes=30),
+            "duration": 30,
+            "is_completed": False,
+            "estimated_time": 30,
+            "created_at": WEEK_START,
+            "updated_at": WEEK_START,
+            "embedding": [0.0] * 64,
+        })
+        if len(batch) == 5000:
+            await collection.insert_many(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch)
+
+
+async def _legacy_week_view(start_date: datetime) -> dict:
+    """get_week_view before the pipeline, kept here for comparison."""
+    db = await database.get_database()
+    cursor = db["tasks"].find({"start_time": {"$gte": start_date, "$lt": start_date + timedelta(days=7)}})
+    week_view = {}
+    for task_doc in await cursor.to_list(length=1000):
+        task = Task(**task_doc)
+        day = week_view.setdefault(task.start_time.strftime("%Y-%m-%d"), {category: [] for category in CATEGORIES})
+        day.setdefault(task.category, []).append(task)
+    return week_view
+
+
+async def _measure(label: str, read, runs: int):
+    timings = []
+    view = {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        view = await read(WEEK_START)
+        timings.append((time.perf_counter() - started) * 1000)
+    returned = sum(len(tasks) for day in view.values() for tasks in day.values())
+    body = json.dumps(jsonable_encoder(view))
+    print(
+        f"{label:<28}{returned:>10}{len(body) / 1024:>12.1f}"
+        f"{statistics.median(timings):>10.1f}{max(timings):>10.1f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(MONGO_URI)
+    database.db.client = client
+    database.settings.DATABASE_NAME = BENCH_DB
+    await _seed(client, args.tasks)
+
+    print(f"{'week view':<28}{'tasks':>10}{'body KB':>12}{'p50 ms':>10}{'max ms':>10}")
+    await _measure("find + Task() (old)", _legacy_week_view, args.runs)
+    await _measure("$group pipeline", TaskService.get_week_view, args.runs)
+
+    await client.drop_database(BENCH_DB)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+WebSocket broadcast benchmark: fan-out latency to N connected clients when a
+few of them are slow.
+
+Uses in-memory sockets (no network) so it measures the server side only: the
+time from broadcast() being called until each fast client's send completes,
+and how long the caller is blocked. Compares the previous manager (await
+send_json for each socket in turn, so every slow socket delays everyone after
+it) with the queued manager in websocket_manager.py.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ws_broadcast --clients 10000 --slow 10 --slow-delay 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+from websocket_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    """Records when each message arrived; slow sockets take delay seconds per send."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received: List[float] = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append(time.perf_counter())
+
+    async def send_json(self, message: dict):
+        await self.send_text(json.dumps(message))
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def _sockets(clients: int, slow: int, slow_delay: float) -> List[FakeWebSocket]:
+    # Slow sockets spread through the registry, not all at the end
+    step = max(1, clients // max(1, slow))
+    return [FakeWebSocket(slow_delay if slow and i % step == 0 and i // step < slow else 0.0) for i in range(clients)]
+
+
+def _report(label: str, sockets: List[FakeWebSocket], started: float, blocked: float):
+    fast = [(s.received[-1] - started) * 1000 for s in sockets if not s.delay and s.received]
+    fast.sort()
+    p99 = fast[int(len(fast) * 0.99) - 1] if fast else 0.0
+    print(
+        f"{label:<24}{blocked * 1000:>12.1f}{statistics.median(fast):>10.1f}"
+        f"{p99:>10.1f}{fast[-1]:>10.1f}{len(fast):>10}"
+    )
+
+
+async def _legacy(sockets: List[FakeWebSocket], message: dict):
+    """The old broadcast loop: one send_json after another."""
+    started = time.perf_counter()
+    for websocket in sockets:
+        await websocket.send_json(message)
+    _report("inline send_json (old)", sockets, started, time.perf_counter() - started)
+
+
+async def _queued(sockets: List[FakeWebSocket], message: dict):
+    manager = ConnectionManager()
+    for i, websocket in enumerate(sockets):
+        await manager.connect(websocket, f"client-{i}")
+    await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    await manager.broadcast(message)
+    blocked = time.perf_counter() - started
+    # Wait until every fast socket has its message
+    while any(not s.delay and not s.received for s in sockets):
+        await asyncio.sleep(0.001)
+    _report("queued writers", sockets, started, blocked)
+    await manager.stop()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--slow", type=int, default=10, help="How many sockets are slow")
+    parser.add_argument("--slow-delay", type=float, default=0.2, help="Seconds a slow socket takes per send")
+    args = parser.parse_args()
+
+    message = {"type": "agent_status", "status": "started", "task_client_id": "bench", "message": "AI analyzing task"}
+    print(f"{args.clients} clients, {args.slow} slow ({args.slow_delay * 1000:.0f} ms per send)")
+    print(f"{'broadcast':<24}{'caller ms':>12}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'fast':>10}")
+    await _legacy(_sockets(args.clients, args.slow, args.slow_delay), message)
+    await _queued(_sockets(args.clients, args.slow, args.slow_delay), message)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
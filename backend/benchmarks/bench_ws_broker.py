@@ -0,0 +1,117 @@
+"""
+WebSocket broker benchmark: delivery latency between workers.
+
+Starts two MongoBroker instances on separate clients, standing in for two
+uvicorn workers. Worker A publishes messages for a client held by worker B
+(sent one at a time at --rate per second), and B records when each message
+reaches its deliver(). Reports publish-to-deliver latency p50/p99/max and
+the in-process baseline (direct delivery, what a single worker gets).
+
+Needs a local mongod (standalone is fine; the broker tails a capped
+collection, no replica set needed).
+
+Usage (from backend/):
+    python -m benchmarks.bench_ws_broker --messages 2000 --rate 500
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from json_response import dumps
+from mongo_clients import MONGO_URI
+from ws_broker import InProcessBroker, MongoBroker
+
+BENCH_DB = "flowstate_bench"
+
+
+class Receiver:
+    """A worker's deliver(): records arrival times by sequence number."""
+
+    def __init__(self):
+        self.arrived: Dict[int, float] = {}
+
+    def __call__(self, client_id: Optional[str], text: str, coalesce_key: Optional[str], seq: Optional[int] = None, topic: Optional[str] = None) -> int:
+        if client_id != "client-b":
+            return 0
+        self.arrived[json.loads(text)["seq"]] = time.perf_counter()
+        return 1
+
+
+def _report(label: str, sent: Dict[int, float], arrived: Dict[int, float]):
+    latencies = sorted((arrived[seq] - sent[seq]) * 1000 for seq in sent if seq in arrived)
+    if not latencies:
+        print(f"{label:<24}{'no messages arrived':>40}")
+        return
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    print(
+        f"{label:<24}{statistics.median(latencies):>10.2f}{p99:>10.2f}"
+        f"{latencies[-1]:>10.2f}{len(latencies):>8}/{len(sent)}"
+    )
+
+
+async def _publish(broker, count: int, rate: float) -> Dict[int, float]:
+    sent: Dict[int, float] = {}
+    interval = 1.0 / rate
+    for seq in range(count):
+        text = dumps({"type": "agent_status", "status": "progress", "seq": seq}).decode()
+        sent[seq] = time.perf_counter()
+        await broker.publish("client-b", text)
+        await asyncio.sleep(interval)
+    return sent
+
+
+async def _inprocess(count: int, rate: float):
+    broker = InProcessBroker()
+    receiver = Receiver()
+    broker.bind(receiver)
+    sent = await _publish(broker, count, rate)
+    _report("in-process", sent, receiver.arrived)
+
+
+async def _mongo(count: int, rate: float):
+    clients: List[AsyncIOMotorClient] = [AsyncIOMotorClient(MONGO_URI) for _ in range(2)]
+    await clients[0].drop_database(BENCH_DB)
+    worker_a = MongoBroker(clients[0][BENCH_DB])
+    worker_b = MongoBroker(clients[1][BENCH_DB])
+    receiver = Receiver()
+    # A holds no sockets for client-b; B does
+    worker_a.bind(lambda client_id, text, coalesce_key, seq, topic: 0)
+    worker_b.bind(receiver)
+    await worker_a.start()
+    await worker_b.start()
+    try:
+        sent = await _publish(worker_a, count, rate)
+        deadline = time.perf_counter() + 5
+        while len(receiver.arrived) < count and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        _report("mongo capped tail", sent, receiver.arrived)
+        stats = worker_b.stats()
+        print(f"worker B stats: received={stats['received']} p50={stats['latency_ms_p50']} ms p99={stats['latency_ms_p99']} ms")
+    finally:
+        await worker_a.stop()
+        await worker_b.stop()
+        await clients[0].drop_database(BENCH_DB)
+        for client in clients:
+            client.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=500, help="Messages published per second")
+    args = parser.parse_args()
+
+    print(f"{args.messages} messages at {args.rate:.0f}/s, worker A -> client held by worker B")
+    print(f"{'broker':<24}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'arrived':>12}")
+    await _inprocess(args.messages, args.rate)
+    await _mongo(args.messages, args.rate)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""
+Real-time change events for FlowState.
+
+Task, tag, pad and project writes in db.py record what changed here, with the
+user's email. The feed collects a user's changes for a short window (so a
+drag, a bulk import or an agent run sends one message, not one per write) and
+then publishes a single "changes" message to the user's topic. Every
+WebSocket that sent {"type": "subscribe", "email": ...} is on that topic,
+whichever worker holds it (see ws_broker.py):
+
+    {"type": "changes", "email": ..., "version": <data version>,
+     "tasks": {"changed": [task, ...], "deleted": [{_id, task_client_id}, ...]},
+     "changes": [{"entity": "tag" | "pad" | "project", "op": "upsert" | "delete", "key": ...}]}
+
+Task writes are stamped with sync_seq, so the task part is a delta-sync read
+(db.get_task_changes) since the window's first write: one query per window
+however many writes it covered. If that delta is more than a page,
+"tasks" is {"resync": true} and the client should reload its tasks. For the
+other entities a later op on the same key replaces an earlier one.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+WINDOW = float(os.getenv("WS_CHANGE_WINDOW_MS", "250")) / 1000
+
+# publish(topic, message) and load_task_changes(email, since) -> db.get_task_changes result
+Publish = Callable[[str, Dict[str, Any]], Awaitable[int]]
+LoadTaskChanges = Callable[[str, int], Awaitable[Dict[str, Any]]]
+
+
+# Topic names never reach client_ids (they have their own delivery path), but
+# /ws refuses client_ids with this prefix so the two can't be confused in logs and stats
+TOPIC_PREFIX = "user:"
+
+
+def user_topic(email: str) -> str:
+    return f"{TOPIC_PREFIX}{email}"
+
+
+@dataclass
+class PendingChanges:
+    due: float
+    version: int = 0
+    # Lowest task sync_seq written in the window (None: no task writes)
+    first_task_seq: Optional[int] = None
+    # (entity, key) -> op, latest wins
+    ops: Dict[Tuple[str, str], str] = field(default_factory=dict)
+
+
+class ChangeFeed:
+    def __init__(self, window: float = WINDOW):
+        self.window = window
+        self._pending: Dict[str, PendingChanges] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._publish: Optional[Publish] = None
+        self._load_task_changes: Optional[LoadTaskChanges] = None
+        self.counters: Dict[str, int] = {"recorded": 0, "published": 0, "resyncs": 0, "failed": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def record(self, email: Optional[str], entity: str, op: str = "upsert", key: Optional[str] = None,
+               version: Optional[int] = None, seq: Optional[int] = None):
+        """
+        Notes a write at the user's data version. entity "task" passes the write's
+        sync_seq as seq; the other entities are keyed by key. A no-op when the
+        feed isn't running (CLI scripts, tests).
+        """
+        if not self.running or not email:
+            return
+        pending = self._pending.get(email)
+        if pending is None:
+            pending = self._pending[email] = PendingChanges(due=time.monotonic() + self.window)
+            self._wakeup.set()
+        if version is not None:
+            pending.version = max(pending.version, version)
+        if entity == "task":
+            if seq is not None and (pending.first_task_seq is None or seq < pending.first_task_seq):
+                pending.first_task_seq = seq
+        else:
+            pending.ops[(entity, key)] = op
+        self.counters["recorded"] += 1
+
+    async def start(self, publish: Publish, load_task_changes: LoadTaskChanges):
+        """Starts the worker task on the running loop."""
+        if self.running:
+            return
+        self._publish = publish
+        self._load_task_changes = load_task_changes
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the worker and publishes whatever is still pending."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        for email in list(self._pending):
+            await self._flush(email)
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            due = min(pending.due for pending in self._pending.values())
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = time.monotonic()
+            for email in [email for email, pending in self._pending.items() if pending.due <= now]:
+                await self._flush(email)
+
+    async def _flush(self, email: str):
+        pending = self._pending.pop(email, None)
+        if pending is None:
+            return
+        message: Dict[str, Any] = {"type": "changes", "email": email, "version": pending.version}
+        try:
+            if pending.first_task_seq is not None:
+                delta = await self._load_task_changes(email, pending.first_task_seq - 1)
+                if delta["has_more"]:
+                    message["tasks"] = {"resync": True}
+                    self.counters["resyncs"] += 1
+                else:
+                    message["tasks"] = {"changed": delta["changed"], "deleted": delta["deleted"]}
+            if pending.ops:
+                message["changes"] = [
+                    {"entity": entity, "op": op, "key": key}
+                    for (entity, key), op in pending.ops.items()
+                ]
+            await self._publish(user_topic(email), message)
+            self.counters["published"] += 1
+        except Exception as e:
+            self.counters["failed"] += 1
+            print(f"✗ Change event for {email} failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "pending": len(self._pending)}
+
+
+change_feed = ChangeFeed()
@@ -5,69 +5,605 @@ Provides getters and setters for:
 - User: {email, description(optional)}
 - Tags: {email, tag_name, tag_description(optional)}
 - Tasks: {email, tag_names(list)(optional), description(optional), title(required)}
+  Recurring tasks also carry recurrence (shorthand or RRULE) and
+  recurrence_exceptions; the range read expands them (recurrence.py)
+- Data versions: {_id: email, version} bumped by every write below, so readers
+  can tell whether anything a user owns has changed (ETag / response cache)
+- Task tombstones: {_id: task _id, email, task_client_id, sync_seq} left by deletes
+  for delta sync (get_task_changes)
+- Task rollups: {email, tag, day, <metric sums>} kept current by every task write
+  for analytics (rollups.py, get_task_analytics)
+
+All operations are coroutines on the Motor async driver so callers in the
+FastAPI app never block the event loop on a Mongo round trip.
 """
 
-from pymongo import MongoClient
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, DeleteMany, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 from dotenv import load_dotenv
+import asyncio
 import os
 
+from change_events import change_feed
+from embedding_queue import embedding_queue
+from embedding_service import embedding_service
+import rollups
+from recurrence import NON_RECURRING, RECURRENCE_FIELDS, expand_task, expansion_cache, is_recurring, to_naive_utc
+
 # Load environment variables for embedding model
 load_dotenv()
 
 DB_NAME = "flowstate_db"
 
+# =============================================================================
+# INDEX MANIFEST
+# =============================================================================
+
+# One entry per query shape used below; natural upsert keys are unique
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "tags": [
+        IndexModel([("email", ASCENDING), ("tag_name", ASCENDING)], unique=True, name="email_tag_name_unique"),
+        IndexModel([("embedding_status", ASCENDING)], sparse=True, name="embedding_status"),
+    ],
+    "tasks": [
+        # Legacy tasks may lack task_client_id, so uniqueness only covers documents that have one
+        IndexModel(
+            [("email", ASCENDING), ("task_client_id", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"task_client_id": {"$exists": True}},
+            name="email_task_client_id_unique"
+        ),
+        IndexModel([("email", ASCENDING), ("title", ASCENDING)], name="email_title"),
+        IndexModel([("email", ASCENDING), ("tag_names", ASCENDING)], name="email_tag_names"),
+        # Keyset pagination of a user's tasks (email filter, _id order)
+        IndexModel([("email", ASCENDING), ("_id", ASCENDING)], name="email_id"),
+        # Calendar window reads: start_time range plus the longest-duration lookback probe
+        IndexModel([("email", ASCENDING), ("start_time", ASCENDING)], name="email_start_time"),
+        IndexModel([("email", ASCENDING), ("duration", ASCENDING)], name="email_duration"),
+        # Recurring series for the calendar window read (most tasks have no recurrence)
+        IndexModel(
+            [("email", ASCENDING), ("recurrence", ASCENDING)],
+            partialFilterExpression={"recurrence": {"$exists": True}},
+            name="email_recurrence"
+        ),
+        IndexModel([("task_client_id", ASCENDING)], name="task_client_id"),
+        IndexModel([("embedding_status", ASCENDING)], sparse=True, name="embedding_status"),
+        # Delta sync: a user's tasks changed after a sequence number
+        IndexModel([("email", ASCENDING), ("sync_seq", ASCENDING)], name="email_sync_seq"),
+    ],
+    "task_tombstones": [
+        IndexModel([("email", ASCENDING), ("sync_seq", ASCENDING)], name="email_sync_seq"),
+    ],
+    "task_rollups": [
+        # $inc upserts and analytics reads (email, optional tag, day range)
+        IndexModel([("email", ASCENDING), ("tag", ASCENDING), ("day", ASCENDING)], unique=True, name="email_tag_day_unique"),
+    ],
+    "pads": [
+        IndexModel([("email", ASCENDING), ("pad_id", ASCENDING)], unique=True, name="email_pad_id_unique"),
+    ],
+    "projects": [
+        IndexModel([("email", ASCENDING), ("project_id", ASCENDING)], unique=True, name="email_project_id_unique"),
+    ],
+}
+
+
+async def ensure_indexes(client: AsyncIOMotorClient) -> Dict[str, List[str]]:
+    """
+    Creates every index in INDEXES (no-op for ones that already exist).
+    Returns the index names per collection. Raises if an index can't be built,
+    e.g. a unique key over existing duplicates.
+    """
+    db = client[DB_NAME]
+    created = {}
+    for collection_name, indexes in INDEXES.items():
+        created[collection_name] = await db[collection_name].create_indexes(indexes)
+    return created
+
+
+# =============================================================================
+# DATA VERSIONS
+# =============================================================================
+
+VERSIONS_COLLECTION = "data_versions"
+
+
+async def get_data_version(client: AsyncIOMotorClient, email: str) -> int:
+    """Returns the user's data version (0 if they have never written anything)."""
+    doc = await client[DB_NAME][VERSIONS_COLLECTION].find_one({"_id": email}, {"version": 1})
+    return doc["version"] if doc else 0
+
+
+async def _touch(
+    client: AsyncIOMotorClient,
+    email: Optional[str],
+    entity: Optional[str] = None,
+    op: str = "upsert",
+    key: Optional[str] = None,
+    seq: Optional[int] = None
+) -> Optional[int]:
+    """
+    Bumps the user's data version and returns the new value. Called after every
+    write so that a reader who sees the new version also sees the write.
+    Background embedding writes don't bump it; embedding fields are excluded from listings.
+    With an entity, the write is also recorded for the user's change events
+    (task writes pass their sync_seq as seq).
+    """
+    if not email:
+        return None
+    doc = await client[DB_NAME][VERSIONS_COLLECTION].find_one_and_update(
+        {"_id": email},
+        {"$inc": {"version": 1}},
+        projection={"version": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    if entity is not None:
+        change_feed.record(email, entity, op, key, doc["version"], seq)
+    return doc["version"]
+
+
+# =============================================================================
+# DELTA SYNC
+# =============================================================================
+
+# A task write's sync_seq is the writer's clock in microseconds, taken just before
+# the write and set by it: no round trip first, and nothing is spent (no version
+# bump, no change event) on a write that matches no task. Two writers can land
+# out of order, and their clocks can disagree; the sync cursor only moves past
+# changes older than this, by which time their stamps are visible.
+SYNC_SETTLE_SECONDS = 5
+# Larger than the biggest bulk write (1000), whose documents share one sync_seq
+SYNC_PAGE_SIZE = 2000
+
+_last_sync_seq = 0
+
+
+def _task_stamp() -> Dict[str, Any]:
+    """
+    Returns the fields (sync_seq, updated_at) that stamp a task write, for the
+    write's own $set. sync_seq never repeats or goes back within a process.
+    Once the write has matched, _task_written records it.
+    """
+    global _last_sync_seq
+    now = datetime.utcnow()
+    _last_sync_seq = max(_last_sync_seq + 1, int(now.replace(tzinfo=timezone.utc).timestamp() * 1_000_000))
+    return {"sync_seq": _last_sync_seq, "updated_at": now}
+
+
+async def _task_written(client: AsyncIOMotorClient, tasks: List[Dict[str, Any]], stamp: Dict[str, Any]):
+    """
+    After a write stamped with stamp matched tasks (projected with _ROLLUP_PROJECTION,
+    as written): bumps their users' versions, recording the change events, and
+    brings the tasks' rollups up to date.
+    """
+    for email in {task.get("email") for task in tasks}:
+        await _touch(client, email, "task", seq=stamp["sync_seq"])
+    await _update_rollups(client, tasks)
+
+
+async def _tombstone_task(client: AsyncIOMotorClient, task: Dict[str, Any]):
+    """Records a deleted task for delta sync."""
+    if not task.get("email"):
+        return
+    stamp = _task_stamp()
+    await client[DB_NAME]["task_tombstones"].update_one(
+        {"_id": task["_id"]},
+        {"$set": {
+            "email": task["email"],
+            "task_client_id": task.get("task_client_id"),
+            **stamp
+        }},
+        upsert=True
+    )
+    await _touch(client, task["email"], "task", "delete", seq=stamp["sync_seq"])
+
+
+async def get_task_changes(client: AsyncIOMotorClient, email: str, since: int = 0) -> Dict[str, Any]:
+    """
+    Returns a user's tasks created or updated after the `since` cursor, and
+    tombstones ({_id, task_client_id}) for tasks deleted after it.
+    since=0 returns every task (a full sync) and no tombstones.
+    The returned cursor is the `since` for the next call; has_more means
+    another page is ready right away.
+    """
+    db = client[DB_NAME]
+    # Listing projection, but keeping the sync stamps
+    projection = {field: 0 for field in DEFAULT_LISTING_PROJECTION if field not in ("sync_seq", "updated_at")}
+    if since <= 0:
+        changed = await db["tasks"].find({"email": email}, projection).to_list(length=None)
+        deleted: List[Dict[str, Any]] = []
+        has_more = False
+    else:
+        changed = await db["tasks"].find(
+            {"email": email, "sync_seq": {"$gt": since}},
+            projection
+        ).sort("sync_seq", ASCENDING).limit(SYNC_PAGE_SIZE + 1).to_list(length=None)
+        deleted = await db["task_tombstones"].find(
+            {"email": email, "sync_seq": {"$gt": since}},
+            {"task_client_id": 1, "sync_seq": 1, "updated_at": 1}
+        ).sort("sync_seq", ASCENDING).limit(SYNC_PAGE_SIZE + 1).to_list(length=None)
+        has_more = len(changed) > SYNC_PAGE_SIZE or len(deleted) > SYNC_PAGE_SIZE
+
+    # Merge in sequence order (legacy tasks without a sync_seq first) and page
+    entries = sorted(
+        [(doc.get("sync_seq") or 0, False, doc) for doc in changed] +
+        [(doc["sync_seq"], True, doc) for doc in deleted],
+        key=lambda entry: entry[0]
+    )
+    if has_more:
+        # Never split the documents of one sequence number across pages
+        barrier = entries[SYNC_PAGE_SIZE][0]
+        entries = [entry for entry in entries[:SYNC_PAGE_SIZE] if entry[0] < barrier]
+
+    # Advance over the settled prefix only; newer changes are sent again next time
+    settled_before = datetime.utcnow() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    cursor = since
+    for seq, _, doc in entries:
+        updated_at = doc.get("updated_at")
+        if updated_at is not None and updated_at > settled_before:
+            break
+        cursor = max(cursor, seq)
+
+    for _, _, doc in entries:
+        doc.pop("sync_seq", None)
+        doc.pop("updated_at", None)
+    return {
+        "changed": [doc for _, is_tombstone, doc in entries if not is_tombstone],
+        "deleted": [doc for _, is_tombstone, doc in entries if is_tombstone],
+        "cursor": cursor,
+        "has_more": has_more
+    }
+
+
+# =============================================================================
+# ANALYTICS ROLLUPS
+# =============================================================================
+
+ROLLUPS_COLLECTION = "task_rollups"
+_ROLLUP_PROJECTION = {**{field: 1 for field in rollups.SOURCE_FIELDS}, "rollup": 1}
+# Compare-and-set retries when another writer re-snapshots the same task
+_ROLLUP_ATTEMPTS = 3
+
+
+async def _apply_rollup_delta(client: AsyncIOMotorClient, changes: Dict[rollups.RollupKey, Dict[str, float]]):
+    if not changes:
+        return
+    keys = [{"email": email, "tag": tag, "day": day} for email, tag, day in changes]
+    operations: List[Any] = [
+        UpdateOne(key, {"$inc": amounts}, upsert=True)
+        for key, amounts in zip(keys, changes.values())
+    ]
+    # Each $inc adds or removes whole tasks, so a rollup with no tasks left is all zeros.
+    # Ordered, so the delete sees the $incs, in the same round trip.
+    operations.append(DeleteMany({"$or": keys, "tasks": {"$lte": 0}}))
+    await client[DB_NAME][ROLLUPS_COLLECTION].bulk_write(operations, ordered=True)
+
+
+async def _rollup_task(client: AsyncIOMotorClient, task: Dict[str, Any]) -> Dict[rollups.RollupKey, Dict[str, float]]:
+    """
+    Moves a task's rollup snapshot to its current fields and returns the $incs for the difference.
+    The snapshot is swapped with a compare-and-set so two writers never apply the same delta.
+    """
+    collection = client[DB_NAME]["tasks"]
+    for _ in range(_ROLLUP_ATTEMPTS):
+        old, new = task.get("rollup"), rollups.snapshot(task)
+        if old == new:
+            return {}
+        result = await collection.update_one({"_id": task["_id"], "rollup": old}, {"$set": {"rollup": new}})
+        if result.modified_count:
+            return rollups.delta(old, new)
+        task = await collection.find_one({"_id": task["_id"]}, _ROLLUP_PROJECTION)
+        if task is None:
+            return {}
+    print(f"Warning: rollup for task {task['_id']} kept changing; run rebuild_rollups.py to reconcile")
+    return {}
+
+
+async def _update_rollups(client: AsyncIOMotorClient, tasks: List[Dict[str, Any]]):
+    """
+    Brings the rollups of just-written tasks (projected with _ROLLUP_PROJECTION, as
+    written) up to date, with one $inc batch for all of them.
+    """
+    changes: Dict[rollups.RollupKey, Dict[str, float]] = {}
+    for task in tasks:
+        rollups.merge(changes, await _rollup_task(client, task))
+    await _apply_rollup_delta(client, changes)
+
+
+async def _remove_from_rollups(client: AsyncIOMotorClient, task: Dict[str, Any]):
+    """Takes a deleted task (projected with rollup) out of its rollups."""
+    await _apply_rollup_delta(client, rollups.delta(task.get("rollup"), None))
+
+
+async def get_task_analytics(
+    client: AsyncIOMotorClient,
+    email: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    tag: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Estimate accuracy and completion per tag from the rollups, for days in [start, end)
+    ("YYYY-MM-DD"; undated tasks only count when no range is given).
+    With tag, also returns that tag's per-day series. Reads O(tags x days) rollup
+    documents, never the tasks themselves.
+    """
+    query: Dict[str, Any] = {"email": email}
+    if tag is not None:
+        query["tag"] = tag
+    if start or end:
+        query["day"] = {}
+        if start:
+            query["day"]["$gte"] = start
+        if end:
+            query["day"]["$lt"] = end
+    rows = await client[DB_NAME][ROLLUPS_COLLECTION].find(query, {"_id": 0}).to_list(length=None)
+    rows = [row for row in rows if row.get("tasks")]
+
+    analytics: Dict[str, Any] = {"tags": rollups.group_rows(rows, "tag")}
+    if tag is not None:
+        analytics["days"] = rollups.group_rows(rows, "day")
+    return analytics
+
+
+async def rebuild_task_rollups(client: AsyncIOMotorClient, email: Optional[str] = None, batch_size: int = 1000) -> int:
+    """
+    Regenerates task_rollups (for one user, or everyone) from the tasks themselves:
+    re-snapshots every task, then groups the snapshots with an aggregation pipeline.
+    Writes that land while it runs can be miscounted; run it again to settle them.
+    Returns the number of rollup documents written.
+    """
+    db = client[DB_NAME]
+    tasks = db["tasks"]
+    scope = {"email": email} if email else {}
+
+    operations = []
+    async for task in tasks.find(scope, _ROLLUP_PROJECTION):
+        new = rollups.snapshot(task)
+        if task.get("rollup") != new:
+            operations.append(UpdateOne({"_id": task["_id"]}, {"$set": {"rollup": new}}))
+        if len(operations) >= batch_size:
+            await tasks.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await tasks.bulk_write(operations, ordered=False)
+
+    pipeline = [
+        {"$match": {**scope, "rollup": {"$type": "object"}}},
+        {"$unwind": "$rollup.tags"},
+        {"$group": {
+            "_id": {"email": "$rollup.email", "tag": "$rollup.tags", "day": "$rollup.day"},
+            **{name: {"$sum": f"$rollup.metrics.{name}"} for name in rollups.METRICS}
+        }},
+        {"$project": {
+            "_id": 0, "email": "$_id.email", "tag": "$_id.tag", "day": "$_id.day",
+            **{name: 1 for name in rollups.METRICS}
+        }},
+    ]
+    collection = db[ROLLUPS_COLLECTION]
+    await collection.delete_many(scope)
+    written = 0
+    batch = []
+    async for row in tasks.aggregate(pipeline, allowDiskUse=True):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+        written += len(batch)
+    return written
+
+
 # =============================================================================
 # EMBEDDING UTILITIES
 # =============================================================================
 
 
-def _generate_embedding(text: str) -> Optional[List[float]]:
+async def _generate_embedding(client: AsyncIOMotorClient, text: str) -> Optional[List[float]]:
     """
     Generates a vector embedding for text using Gemini.
+    Goes through the shared embedding service, so unchanged text is served
+    from its in-memory LRU or the persistent embedding_cache collection.
     Returns None if text is empty or embedding generation fails.
     """
-    if not text or not text.strip():
-        return None
-    
-    try:
-        from langchain_google_genai import GoogleGenerativeAIEmbeddings
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-        return embeddings.embed_query(text)
-    except Exception as e:
-        print(f"Warning: Failed to generate embedding: {e}")
-        return None
+    return await embedding_service.embed(client[DB_NAME], text)
 
 
-def _generate_tag_embedding(tag_description: str) -> Optional[List[float]]:
+async def _generate_tag_embedding(client: AsyncIOMotorClient, tag_description: str) -> Optional[List[float]]:
     """Wrapper for _generate_embedding to maintain backward compatibility if needed."""
-    return _generate_embedding(tag_description)
+    return await _generate_embedding(client, tag_description)
+
+
+def _task_embedding_text(title: str, description: Optional[str]) -> str:
+    """Combines title and description for better context in task embeddings."""
+    if description:
+        return f"{title}: {description}"
+    return title
+
+
+def embedding_text_for(collection_name: str, doc: Dict[str, Any]) -> Optional[str]:
+    """Returns the text a task or tag document's embedding should be computed from."""
+    if collection_name == "tasks":
+        return _task_embedding_text(doc.get("title") or "", doc.get("description"))
+    if collection_name == "tags":
+        return doc.get("tag_description")
+    raise ValueError(f"No embedding source for collection '{collection_name}'")
+
+
+def embedding_is_fresh(doc: Dict[str, Any], text: Optional[str]) -> bool:
+    """
+    True if the stored (or pending) vector was computed from `text` with the current model.
+    Relies on the embedding_source_hash/embedding_model fields written with every vector.
+    A pending embedding that the queue gave up on ("failed") is not fresh.
+    """
+    if not text or not text.strip():
+        return True
+    text_hash = embedding_service.cache_key(text)
+    if doc.get("embedding_pending_hash") == text_hash and doc.get("embedding_status") != "failed":
+        return True
+    return doc.get("embedding_source_hash") == text_hash and doc.get("embedding_model") == embedding_service.model
+
+
+async def _embedding_fields(client: AsyncIOMotorClient, text: Optional[str]) -> Dict[str, Any]:
+    """
+    Returns the embedding fields to $set alongside a write whose embedding text is `text`.
+    With the background embedding queue running the write is marked pending and
+    the vector is filled in later (see _enqueue_embedding); otherwise, e.g. in
+    scripts, the embedding is generated inline as before.
+    """
+    if not text or not text.strip():
+        return {}
+    if embedding_queue.running:
+        return {"embedding_status": "pending", "embedding_pending_hash": embedding_service.cache_key(text)}
+    embedding = await _generate_embedding(client, text)
+    if embedding is None:
+        return {}
+    return {
+        "embedding": embedding,
+        "embedding_status": "ready",
+        "embedding_source_hash": embedding_service.cache_key(text),
+        "embedding_model": embedding_service.model
+    }
+
+
+def _enqueue_embedding(collection_name: str, query: Dict[str, Any], text: Optional[str]):
+    """Hands the embedding for a just-written document to the background queue."""
+    if embedding_queue.running and text:
+        embedding_queue.enqueue(collection_name, query, text)
+
+
+async def _refresh_task_embedding(client: AsyncIOMotorClient, task: Dict[str, Any]):
+    """
+    Re-embeds a task after its title or description changed.
+    Does nothing if the stored or pending vector already matches the current text.
+    """
+    text = embedding_text_for("tasks", task)
+    if embedding_is_fresh(task, text):
+        return
+    fields = await _embedding_fields(client, text)
+    if not fields:
+        return
+    await client[DB_NAME]["tasks"].update_one({"_id": task["_id"]}, {"$set": fields})
+    _enqueue_embedding("tasks", {"_id": task["_id"]}, text)
+
+
+# Fields needed to decide whether a task's embedding is stale
+_TASK_EMBEDDING_PROJECTION = {
+    "title": 1, "description": 1,
+    "embedding_source_hash": 1, "embedding_model": 1, "embedding_pending_hash": 1
+}
+
+
+async def requeue_pending_embeddings(client: AsyncIOMotorClient) -> int:
+    """
+    Re-enqueues documents left with embedding_status "pending" (e.g. by a restart).
+    Returns the number of documents queued.
+    """
+    db = client[DB_NAME]
+    queued = 0
+    sources = [
+        ("tasks", {"title": 1, "description": 1}),
+        ("tags", {"tag_description": 1}),
+    ]
+    for collection_name, projection in sources:
+        cursor = db[collection_name].find({"embedding_status": "pending"}, {**projection, "embedding_pending_hash": 1})
+        async for doc in cursor:
+            text = embedding_text_for(collection_name, doc)
+            if not text or not text.strip():
+                continue
+            text_hash = embedding_service.cache_key(text)
+            if doc.get("embedding_pending_hash") != text_hash:
+                await db[collection_name].update_one(
+                    {"_id": doc["_id"], "embedding_pending_hash": doc.get("embedding_pending_hash")},
+                    {"$set": {"embedding_pending_hash": text_hash}}
+                )
+            embedding_queue.enqueue(collection_name, {"_id": doc["_id"]}, text)
+            queued += 1
+    return queued
+
+
+# =============================================================================
+# PROJECTION UTILITIES
+# =============================================================================
+
+# Listing reads never ship the 3072-float embedding vector (or its bookkeeping) back to callers.
+# The bookkeeping is written in the background without a data version bump, so it must stay out;
+# so are the analytics rollup snapshots, which are written just after it, and the delta sync stamps.
+DEFAULT_LISTING_PROJECTION = {
+    "embedding": 0, "embedding_status": 0, "embedding_model": 0,
+    "embedding_pending_hash": 0, "embedding_source_hash": 0,
+    "sync_seq": 0, "updated_at": 0, "rollup": 0
+}
+
+
+def _listing_projection(fields: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    Builds the find() projection for listing reads.
+    If fields is given only those columns (plus _id) are returned, otherwise
+    every column except the embedding is returned.
+    """
+    if fields:
+        projection = {field: 1 for field in fields if field not in DEFAULT_LISTING_PROJECTION}
+        if projection:
+            return projection
+    return DEFAULT_LISTING_PROJECTION
+
+
+def _listing_cursor(
+    collection,
+    query: Dict[str, Any],
+    fields: Optional[List[str]] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    batch_size: int = 500
+):
+    """
+    Returns a cursor for a keyset-paginated listing read in _id order.
+    `after` is the last _id of the previous page; raises ValueError if it isn't an ObjectId.
+    The cursor can be streamed with `async for` or materialized with to_list().
+    """
+    if after:
+        if not ObjectId.is_valid(after):
+            raise ValueError(f"Invalid pagination cursor: {after}")
+        query = {**query, "_id": {"$gt": ObjectId(after)}}
+    cursor = collection.find(query, _listing_projection(fields)).sort("_id", ASCENDING).batch_size(batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
 
 
 # =============================================================================
 # USER OPERATIONS
 # =============================================================================
 
-def get_user(client: MongoClient, email: str) -> Optional[Dict[str, Any]]:
+async def get_user(client: AsyncIOMotorClient, email: str) -> Optional[Dict[str, Any]]:
     """Retrieves a user document by email."""
     db = client[DB_NAME]
     collection = db["users"]
-    return collection.find_one({"email": email})
+    return await collection.find_one({"email": email})
 
 
-def get_user_description(client: MongoClient, email: str) -> Optional[str]:
+async def get_user_description(client: AsyncIOMotorClient, email: str) -> Optional[str]:
     """Retrieves the description for a user."""
     db = client[DB_NAME]
     collection = db["users"]
-    result = collection.find_one({"email": email}, {"description": 1})
+    result = await collection.find_one({"email": email}, {"description": 1})
     if result:
         return result.get("description")
     return None
 
 
-def set_user(client: MongoClient, email: str, description: Optional[str] = None) -> bool:
+async def set_user(client: AsyncIOMotorClient, email: str, description: Optional[str] = None) -> bool:
     """
     Creates or updates a user. Description is optional.
     Returns True if the operation was successful.
@@ -79,15 +615,16 @@ def set_user(client: MongoClient, email: str, description: Optional[str] = None)
     if description is not None:
         update_data["description"] = description
     
-    result = collection.update_one(
+    result = await collection.update_one(
         {"email": email},
         {"$set": update_data},
         upsert=True
     )
+    await _touch(client, email)
     return result.acknowledged
 
 
-def set_user_description(client: MongoClient, email: str, description: str) -> bool:
+async def set_user_description(client: AsyncIOMotorClient, email: str, description: str) -> bool:
     """
     Sets or updates only the description for a user.
     Returns True if the operation was successful.
@@ -95,45 +632,52 @@ def set_user_description(client: MongoClient, email: str, description: str) -> b
     db = client[DB_NAME]
     collection = db["users"]
     
-    result = collection.update_one(
+    result = await collection.update_one(
         {"email": email},
         {"$set": {"description": description}},
         upsert=True
     )
+    await _touch(client, email)
     return result.acknowledged
 
 
-def delete_user(client: MongoClient, email: str) -> bool:
+async def delete_user(client: AsyncIOMotorClient, email: str) -> bool:
     """Deletes a user by email. Returns True if a user was deleted."""
     db = client[DB_NAME]
     collection = db["users"]
-    result = collection.delete_one({"email": email})
+    result = await collection.delete_one({"email": email})
+    await _touch(client, email)
     return result.deleted_count > 0
 
 
-def get_all_users(client: MongoClient) -> List[Dict[str, Any]]:
-    """Retrieves all users."""
+def iter_all_users(client: AsyncIOMotorClient, after: Optional[str] = None, limit: Optional[int] = None):
+    """Cursor over all users in _id order (see _listing_cursor)."""
     db = client[DB_NAME]
     collection = db["users"]
-    return list(collection.find())
+    return _listing_cursor(collection, {}, after=after, limit=limit)
+
+
+async def get_all_users(client: AsyncIOMotorClient, after: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Retrieves all users, or one page of them when after/limit are given."""
+    return await iter_all_users(client, after, limit).to_list(length=None)
 
 
 # =============================================================================
 # SETTINGS OPERATIONS
 # =============================================================================
 
-def get_settings(client: MongoClient, email: str) -> Dict[str, Any]:
+async def get_settings(client: AsyncIOMotorClient, email: str) -> Dict[str, Any]:
     """Retrieves settings for a specific user from the users collection."""
     db = client[DB_NAME]
     collection = db["users"]
-    user = collection.find_one({"email": email}, {"settings": 1})
+    user = await collection.find_one({"email": email}, {"settings": 1})
     if user and "settings" in user:
         return user["settings"]
     # Default settings if none exist
     return {"light_mode": False}
 
 
-def set_settings(client: MongoClient, email: str, updates: Dict[str, Any]) -> bool:
+async def set_settings(client: AsyncIOMotorClient, email: str, updates: Dict[str, Any]) -> bool:
     """Updates the settings field in the user document."""
     db = client[DB_NAME]
     collection = db["users"]
@@ -144,11 +688,12 @@ def set_settings(client: MongoClient, email: str, updates: Dict[str, Any]) -> bo
         del settings_data["email"]
     
     # We store the settings as a sub-object in the user document
-    result = collection.update_one(
+    result = await collection.update_one(
         {"email": email},
         {"$set": {"settings": settings_data}},
         upsert=True
     )
+    await _touch(client, email)
     return result.acknowledged
 
 
@@ -156,18 +701,18 @@ def set_settings(client: MongoClient, email: str, updates: Dict[str, Any]) -> bo
 # TAGS OPERATIONS
 # =============================================================================
 
-def get_tag(client: MongoClient, email: str, tag_name: str) -> Optional[Dict[str, Any]]:
+async def get_tag(client: AsyncIOMotorClient, email: str, tag_name: str) -> Optional[Dict[str, Any]]:
     """Retrieves a specific tag by email and tag_name."""
     db = client[DB_NAME]
     collection = db["tags"]
-    return collection.find_one({"email": email, "tag_name": tag_name})
+    return await collection.find_one({"email": email, "tag_name": tag_name})
 
 
-def get_tag_description(client: MongoClient, email: str, tag_name: str) -> Optional[str]:
+async def get_tag_description(client: AsyncIOMotorClient, email: str, tag_name: str) -> Optional[str]:
     """Retrieves the description for a specific tag."""
     db = client[DB_NAME]
     collection = db["tags"]
-    result = collection.find_one(
+    result = await collection.find_one(
         {"email": email, "tag_name": tag_name}, 
         {"tag_description": 1}
     )
@@ -176,7 +721,7 @@ def get_tag_description(client: MongoClient, email: str, tag_name: str) -> Optio
     return None
 
 
-def set_tag(client: MongoClient, email: str, tag_name: str, tag_description: Optional[str] = None) -> bool:
+async def set_tag(client: AsyncIOMotorClient, email: str, tag_name: str, tag_description: Optional[str] = None) -> bool:
     """
     Creates or updates a tag. Tag description is optional.
     Automatically generates and stores embedding if tag_description is provided.
@@ -188,21 +733,21 @@ def set_tag(client: MongoClient, email: str, tag_name: str, tag_description: Opt
     update_data = {"email": email, "tag_name": tag_name}
     if tag_description is not None:
         update_data["tag_description"] = tag_description
-        # Generate embedding for vector search
-        embedding = _generate_tag_embedding(tag_description)
-        if embedding is not None:
-            update_data["embedding"] = embedding
+        # Embedding for vector search (generated in the background when the queue is running)
+        update_data.update(await _embedding_fields(client, tag_description))
     
-    result = collection.update_one(
+    result = await collection.update_one(
         {"email": email, "tag_name": tag_name},
         {"$set": update_data},
         upsert=True
     )
+    _enqueue_embedding("tags", {"email": email, "tag_name": tag_name}, tag_description)
+    await _touch(client, email, "tag", "upsert", tag_name)
     return result.acknowledged
 
 
 
-def set_tag_description(client: MongoClient, email: str, tag_name: str, tag_description: str) -> bool:
+async def set_tag_description(client: AsyncIOMotorClient, email: str, tag_name: str, tag_description: str) -> bool:
     """
     Sets or updates only the description for a tag.
     Automatically regenerates embedding for the new description.
@@ -212,124 +757,172 @@ def set_tag_description(client: MongoClient, email: str, tag_name: str, tag_desc
     collection = db["tags"]
     
     update_data = {"tag_description": tag_description}
-    # Regenerate embedding for vector search
-    embedding = _generate_tag_embedding(tag_description)
-    if embedding is not None:
-        update_data["embedding"] = embedding
+    # Regenerate embedding for vector search (in the background when the queue is running)
+    update_data.update(await _embedding_fields(client, tag_description))
     
-    result = collection.update_one(
+    result = await collection.update_one(
         {"email": email, "tag_name": tag_name},
         {"$set": update_data},
         upsert=True
     )
+    _enqueue_embedding("tags", {"email": email, "tag_name": tag_name}, tag_description)
+    await _touch(client, email, "tag", "upsert", tag_name)
     return result.acknowledged
 
 
 
-def delete_tag(client: MongoClient, email: str, tag_name: str) -> bool:
+async def delete_tag(client: AsyncIOMotorClient, email: str, tag_name: str) -> bool:
     """Deletes a specific tag. Returns True if a tag was deleted."""
     db = client[DB_NAME]
     collection = db["tags"]
-    result = collection.delete_one({"email": email, "tag_name": tag_name})
+    result = await collection.delete_one({"email": email, "tag_name": tag_name})
+    await _touch(client, email, "tag", "delete", tag_name)
     return result.deleted_count > 0
 
 
-def get_all_tags_for_user(client: MongoClient, email: str) -> List[Dict[str, Any]]:
-    """Retrieves all tags for a specific user."""
+async def get_all_tags_for_user(client: AsyncIOMotorClient, email: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Retrieves all tags for a specific user (without embeddings)."""
     db = client[DB_NAME]
     collection = db["tags"]
-    return list(collection.find({"email": email}))
+    return await collection.find({"email": email}, _listing_projection(fields)).to_list(length=None)
 
 
-def get_all_tags(client: MongoClient) -> List[Dict[str, Any]]:
-    """Retrieves all tags in the database."""
+def iter_all_tags(client: AsyncIOMotorClient, fields: Optional[List[str]] = None, after: Optional[str] = None, limit: Optional[int] = None):
+    """Cursor over all tags in _id order (without embeddings)."""
     db = client[DB_NAME]
     collection = db["tags"]
-    return list(collection.find())
+    return _listing_cursor(collection, {}, fields, after, limit)
+
+
+async def get_all_tags(client: AsyncIOMotorClient, fields: Optional[List[str]] = None, after: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Retrieves all tags in the database (without embeddings), or one page when after/limit are given."""
+    return await iter_all_tags(client, fields, after, limit).to_list(length=None)
+
+
+# =============================================================================
+# TASK IDENTIFIER RESOLUTION
+# =============================================================================
+
+# email -> {title -> _id}, for users whose tasks were recently looked up by title.
+# Entries are dropped by task writes, and lookups still match on title so an
+# entry made stale by another worker only costs a fallback query.
+_TITLE_CACHE_MAX_USERS = 1024
+_TITLE_CACHE_MAX_TITLES = 256
+_title_cache: "OrderedDict[str, Dict[str, ObjectId]]" = OrderedDict()
+
+
+def _task_identifier_query(email: str, identifier: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Builds a single query matching a task by ObjectId or by title.
+    Strings that can't be ObjectIds only match by title, so no exception is raised.
+    """
+    cached = _title_cache.get(email, {}).get(identifier) if use_cache else None
+    if cached is not None:
+        return {"email": email, "_id": cached, "title": identifier}
+    if ObjectId.is_valid(identifier):
+        return {"email": email, "$or": [{"_id": ObjectId(identifier)}, {"title": identifier}]}
+    return {"email": email, "title": identifier}
+
+
+def _remember_task_title(email: str, identifier: str, task: Optional[Dict[str, Any]]):
+    if not task or task.get("title") != identifier or "_id" not in task:
+        return
+    titles = _title_cache.setdefault(email, {})
+    _title_cache.move_to_end(email)
+    titles[identifier] = task["_id"]
+    if len(titles) > _TITLE_CACHE_MAX_TITLES:
+        titles.pop(next(iter(titles)))
+    while len(_title_cache) > _TITLE_CACHE_MAX_USERS:
+        _title_cache.popitem(last=False)
+
+
+def _forget_task_titles(email: Optional[str] = None, task_id: Optional[ObjectId] = None):
+    """Invalidates cached titles for a user, or for whichever user owns task_id."""
+    if email is not None:
+        _title_cache.pop(email, None)
+        return
+    if task_id is not None:
+        for titles in _title_cache.values():
+            for title, cached_id in list(titles.items()):
+                if cached_id == task_id:
+                    del titles[title]
+
+
+async def _resolve_task(
+    email: str,
+    identifier: str,
+    operation: Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Runs operation (a find_one / find_one_and_* call taking a query) against the
+    task identified by ID or title, in one round trip unless a cached entry is stale.
+    The operation's projection must include title for the cache to be filled.
+    """
+    query = _task_identifier_query(email, identifier)
+    task = await operation(query)
+    if task is None and "_id" in query:
+        # Cached _id no longer carries this title; drop it and retry uncached
+        _forget_task_titles(email=email)
+        task = await operation(_task_identifier_query(email, identifier, use_cache=False))
+    _remember_task_title(email, identifier, task)
+    return task
 
 
 # =============================================================================
 # TASKS OPERATIONS
 # =============================================================================
 
-def get_task(client: MongoClient, email: str, task_id: str) -> Optional[Dict[str, Any]]:
+async def get_task(client: AsyncIOMotorClient, email: str, task_id: str) -> Optional[Dict[str, Any]]:
     """Retrieves a specific task by email and object id."""
     db = client[DB_NAME]
     collection = db["tasks"]
     try:
-        return collection.find_one({"email": email, "_id": ObjectId(task_id)})
+        return await collection.find_one({"email": email, "_id": ObjectId(task_id)})
     except Exception:
         return None
 
-def get_task_by_title(client: MongoClient, email: str, title: str) -> Optional[Dict[str, Any]]:
+async def get_task_by_title(client: AsyncIOMotorClient, email: str, title: str) -> Optional[Dict[str, Any]]:
     """Retrieves a specific task by email and title."""
     db = client[DB_NAME]
     collection = db["tasks"]
-    return collection.find_one({"email": email, "title": title})
+    return await collection.find_one({"email": email, "title": title})
 
 
-def get_task_by_id(client: MongoClient, task_id: str) -> Optional[Dict[str, Any]]:
+async def get_task_by_id(client: AsyncIOMotorClient, task_id: str) -> Optional[Dict[str, Any]]:
     """Retrieves a task by its MongoDB _id."""
     from bson import ObjectId
     db = client[DB_NAME]
     collection = db["tasks"]
-    return collection.find_one({"_id": ObjectId(task_id)})
+    return await collection.find_one({"_id": ObjectId(task_id)})
 
 
-def get_task_description(client: MongoClient, email: str, identifier: str) -> Optional[str]:
+async def get_task_description(client: AsyncIOMotorClient, email: str, identifier: str) -> Optional[str]:
     """Retrieves the description for a specific task by ID or Title."""
     db = client[DB_NAME]
     collection = db["tasks"]
-    
-    # Try as ObjectId first
-    try:
-        result = collection.find_one(
-            {"email": email, "_id": ObjectId(identifier)}, 
-            {"description": 1}
-        )
-        if result:
-            return result.get("description")
-    except Exception:
-        pass
-        
-    # Fallback to Title
-    result = collection.find_one(
-        {"email": email, "title": identifier}, 
-        {"description": 1}
+    result = await _resolve_task(
+        email, identifier,
+        lambda query: collection.find_one(query, {"description": 1, "title": 1})
     )
     if result:
         return result.get("description")
     return None
 
 
-def get_task_tags(client: MongoClient, email: str, identifier: str) -> Optional[List[str]]:
+async def get_task_tags(client: AsyncIOMotorClient, email: str, identifier: str) -> Optional[List[str]]:
     """Retrieves the tags for a specific task by ID or Title."""
     db = client[DB_NAME]
     collection = db["tasks"]
-    
-    # Try as ObjectId first
-    try:
-        result = collection.find_one(
-            {"email": email, "_id": ObjectId(identifier)}, 
-            {"tag_names": 1}
-        )
-        if result:
-            return result.get("tag_names")
-    except Exception:
-        pass
-
-    # Fallback to Title
-    result = collection.find_one(
-        {"email": email, "title": identifier}, 
-        {"tag_names": 1}
+    result = await _resolve_task(
+        email, identifier,
+        lambda query: collection.find_one(query, {"tag_names": 1, "title": 1})
     )
     if result:
         return result.get("tag_names")
     return None
 
 
-def set_task(
-    client: MongoClient, 
+def _task_document(
     email: str, 
     title: str, 
     task_client_id: str,
@@ -351,16 +944,8 @@ def set_task(
     ai_recommendation: Optional[str] = None,
     ai_reasoning: Optional[str] = None,
     ai_confidence: Optional[str] = None
-) -> bool:
-    """
-    Creates or updates a task. 
-    - title is required
-    - description and tag_names are optional
-    Returns True if the operation was successful.
-    """
-    db = client[DB_NAME]
-    collection = db["tasks"]
-    
+) -> Dict[str, Any]:
+    """Builds the $set document for a task upsert (everything except embedding fields)."""
     update_data = {
         "email": email, 
         "title": title,
@@ -372,16 +957,7 @@ def set_task(
         update_data["description"] = description
     if tag_names is not None:
         update_data["tag_names"] = tag_names
-    
-    # Generate embedding for vector search using title and description
-    # Combine title and description for better context
-    embedding_text = title
-    if description:
-        embedding_text += f": {description}"
-    
-    embedding = _generate_embedding(embedding_text)
-    if embedding is not None:
-        update_data["embedding"] = embedding
+
     if start_time is not None:
         update_data["start_time"] = start_time
     if duration is not None:
@@ -412,17 +988,164 @@ def set_task(
         update_data["ai_reasoning"] = ai_reasoning
     if ai_confidence is not None:
         update_data["ai_confidence"] = ai_confidence
+    return update_data
+
+
+async def set_task(
+    client: AsyncIOMotorClient, 
+    email: str, 
+    title: str, 
+    task_client_id: str,
+    description: Optional[str] = None, 
+    tag_names: Optional[List[str]] = None,
+    start_time: Optional[Any] = None,
+    duration: Optional[int] = 0,
+    estimated_cost: Optional[int] = 0,
+    recurrence: Optional[str] = None,
+    is_completed: bool = False,
+    flowbot_suggest_duration: Optional[int] = None,
+    flowbot_suggest_cost: Optional[int] = 0,
+    actual_duration: Optional[int] = None,
+    actual_cost: Optional[int] = 0,
+    color: Optional[str] = None,
+    ai_estimation_status: Optional[str] = None,
+    ai_time_estimation: Optional[int] = None,
+    ai_cost_estimation: Optional[int] = 0,
+    ai_recommendation: Optional[str] = None,
+    ai_reasoning: Optional[str] = None,
+    ai_confidence: Optional[str] = None
+) -> bool:
+    """
+    Creates or updates a task. 
+    - title is required
+    - description and tag_names are optional
+    Returns True if the operation was successful.
+    """
+    db = client[DB_NAME]
+    collection = db["tasks"]
     
-    result = collection.update_one(
+    update_data = _task_document(
+        email, title, task_client_id, description, tag_names, start_time, duration,
+        estimated_cost, recurrence, is_completed,
+        flowbot_suggest_duration=flowbot_suggest_duration,
+        flowbot_suggest_cost=flowbot_suggest_cost,
+        actual_duration=actual_duration,
+        actual_cost=actual_cost,
+        color=color,
+        ai_estimation_status=ai_estimation_status,
+        ai_time_estimation=ai_time_estimation,
+        ai_cost_estimation=ai_cost_estimation,
+        ai_recommendation=ai_recommendation,
+        ai_reasoning=ai_reasoning,
+        ai_confidence=ai_confidence
+    )
+    
+    # Embedding for vector search using title and description
+    # (generated in the background when the queue is running)
+    embedding_text = _task_embedding_text(title, description)
+    update_data.update(await _embedding_fields(client, embedding_text))
+    stamp = _task_stamp()
+    update_data.update(stamp)
+    
+    task = await collection.find_one_and_update(
         {"email": email, "task_client_id": task_client_id},
         {"$set": update_data},
-        upsert=True
+        projection=_ROLLUP_PROJECTION,
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
-    
-    return result.acknowledged
+    # The title may have changed for this task_client_id
+    _forget_task_titles(email=email)
+    _enqueue_embedding("tasks", {"email": email, "task_client_id": task_client_id}, embedding_text)
+    await _task_written(client, [task], stamp)
+    return task is not None
 
 
-def update_task_fields(client: MongoClient, task_id: str, updates: Dict[str, Any]) -> bool:
+async def set_tasks_bulk(client: AsyncIOMotorClient, tasks: List[Dict[str, Any]], ordered: bool = False) -> List[Dict[str, Any]]:
+    """
+    Creates or updates many tasks with a single bulk_write of upserts on (email, task_client_id).
+    Each item takes the same keyword arguments as set_task. Embeddings are generated
+    in one batch (or queued when the background queue is running).
+    With ordered=True the write stops at the first error and later items are reported as skipped.
+    Returns one result per item: {"index", "task_client_id", "status": created|updated|error|skipped, "error"?}.
+    """
+    db = client[DB_NAME]
+    collection = db["tasks"]
+    if not tasks:
+        return []
+
+    documents = [_task_document(**task) for task in tasks]
+    texts = [_task_embedding_text(doc["title"], doc.get("description")) for doc in documents]
+
+    if embedding_queue.running:
+        for doc, text in zip(documents, texts):
+            doc.update(await _embedding_fields(client, text))
+    else:
+        try:
+            vectors = await embedding_service.embed_many(db, texts)
+        except Exception as e:
+            print(f"Warning: Failed to generate embeddings: {e}")
+            vectors = [None] * len(texts)
+        for doc, text, vector in zip(documents, texts, vectors):
+            if vector is not None:
+                doc.update({
+                    "embedding": vector,
+                    "embedding_status": "ready",
+                    "embedding_source_hash": embedding_service.cache_key(text),
+                    "embedding_model": embedding_service.model
+                })
+
+    # One sync_seq for the whole write
+    stamp = _task_stamp()
+    for doc in documents:
+        doc.update(stamp)
+
+    operations = [
+        UpdateOne({"email": doc["email"], "task_client_id": doc["task_client_id"]}, {"$set": doc}, upsert=True)
+        for doc in documents
+    ]
+    upserted: Dict[int, Any] = {}
+    errors: Dict[int, str] = {}
+    stopped_at: Optional[int] = None
+    try:
+        result = await collection.bulk_write(operations, ordered=ordered)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        details = e.details
+        upserted = {u["index"]: u["_id"] for u in details.get("upserted", [])}
+        errors = {err["index"]: err.get("errmsg", "write error") for err in details.get("writeErrors", [])}
+        if ordered and errors:
+            stopped_at = min(errors)
+
+    results = []
+    for index, doc in enumerate(documents):
+        item = {"index": index, "task_client_id": doc["task_client_id"]}
+        if index in errors:
+            item.update(status="error", error=errors[index])
+        elif stopped_at is not None and index > stopped_at:
+            item["status"] = "skipped"
+        elif index in upserted:
+            item["status"] = "created"
+        else:
+            item["status"] = "updated"
+        results.append(item)
+
+    written: Dict[str, List[str]] = {}
+    for doc, item in zip(documents, results):
+        if item["status"] in ("created", "updated"):
+            written.setdefault(doc["email"], []).append(doc["task_client_id"])
+    for email in {doc["email"] for doc in documents}:
+        _forget_task_titles(email=email)
+    if written:
+        query = {"$or": [{"email": email, "task_client_id": {"$in": ids}} for email, ids in written.items()]}
+        await _task_written(client, await collection.find(query, _ROLLUP_PROJECTION).to_list(length=None), stamp)
+    for doc, text, item in zip(documents, texts, results):
+        if item["status"] in ("created", "updated"):
+            _enqueue_embedding("tasks", {"email": doc["email"], "task_client_id": doc["task_client_id"]}, text)
+    return results
+
+
+async def update_task_fields(client: AsyncIOMotorClient, task_id: str, updates: Dict[str, Any]) -> bool:
     """
     Updates specific fields of a task using its _id.
     """
@@ -439,191 +1162,280 @@ def update_task_fields(client: MongoClient, task_id: str, updates: Dict[str, Any
     except Exception:
         query = {"task_client_id": task_id}
 
-    result = collection.update_one(
+    stamp = _task_stamp()
+    if "title" not in updates and "description" not in updates:
+        task = await collection.find_one_and_update(
+            query,
+            {"$set": {**updates, **stamp}},
+            projection=_ROLLUP_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if task is not None:
+            await _task_written(client, [task], stamp)
+        return task is not None
+
+    # Title/description feed the embedding, so re-embed if the text changed
+    task = await collection.find_one_and_update(
         query,
-        {"$set": updates}
+        {"$set": {**updates, **stamp}},
+        projection={**_TASK_EMBEDDING_PROJECTION, **_ROLLUP_PROJECTION},
+        return_document=ReturnDocument.AFTER
     )
-    return result.acknowledged
+    if task is not None:
+        _forget_task_titles(task_id=task["_id"])
+        await _task_written(client, [task], stamp)
+        await _refresh_task_embedding(client, task)
+    return task is not None
 
 
-def delete_task_by_id(client: MongoClient, task_id: str) -> bool:
+async def delete_task_by_id(client: AsyncIOMotorClient, task_id: str) -> bool:
     """
     Deletes a task by its _id.
     """
     from bson import ObjectId
     db = client[DB_NAME]
     collection = db["tasks"]
-    result = collection.delete_one({"_id": ObjectId(task_id)})
-    return result.deleted_count > 0
+    task = await collection.find_one_and_delete({"_id": ObjectId(task_id)}, projection={"email": 1, "task_client_id": 1, "rollup": 1})
+    _forget_task_titles(task_id=ObjectId(task_id))
+    if task is None:
+        return False
+    await _tombstone_task(client, task)
+    await _remove_from_rollups(client, task)
+    return True
 
 
-def set_task_description(client: MongoClient, email: str, identifier: str, description: str) -> bool:
+async def set_task_description(client: AsyncIOMotorClient, email: str, identifier: str, description: str) -> bool:
     """
     Sets or updates only the description for a task by ID or Title.
+    Regenerates the task embedding if the title/description text changed.
     """
     db = client[DB_NAME]
     collection = db["tasks"]
-    
-    update_data = {"description": description}
-    
-    # Regenerate embedding since description changed
-    embedding_text = description
-    embedding = _generate_embedding(embedding_text)
-    if embedding is not None:
-        update_data["embedding"] = embedding
-
-    try:
-        # Try as ObjectId first
-        result = collection.update_one(
-            {"email": email, "_id": ObjectId(identifier)},
-            {"$set": {"description": description}}
-        )
-        if result.acknowledged and result.matched_count > 0:
-            return True
-    except Exception:
-        pass
-        
-    # Fallback to Title
-    try:
-        result = collection.update_one(
-            {"email": email, "title": identifier},
-            {"$set": update_data}
+    stamp = _task_stamp()
+    task = await _resolve_task(
+        email, identifier,
+        lambda query: collection.find_one_and_update(
+            query,
+            {"$set": {"description": description, **stamp}},
+            projection={**_TASK_EMBEDDING_PROJECTION, **_ROLLUP_PROJECTION},
+            return_document=ReturnDocument.AFTER
         )
-        return result.acknowledged
-    except Exception:
+    )
+    if task is None:
         return False
+    await _task_written(client, [task], stamp)
+    # Regenerate embedding since description changed
+    await _refresh_task_embedding(client, task)
+    return True
 
 
-def set_task_tags(client: MongoClient, email: str, identifier: str, tag_names: List[str]) -> bool:
+async def set_task_tags(client: AsyncIOMotorClient, email: str, identifier: str, tag_names: List[str]) -> bool:
     """
     Sets or updates the tag_names list for a task by ID or Title.
     """
     db = client[DB_NAME]
     collection = db["tasks"]
-    
-    try:
-        # Try as ObjectId first
-        result = collection.update_one(
-            {"email": email, "_id": ObjectId(identifier)},
-            {"$set": {"tag_names": tag_names}}
-        )
-        if result.acknowledged and result.matched_count > 0:
-            return True
-    except Exception:
-        pass
-        
-    # Fallback to Title
-    try:
-        result = collection.update_one(
-            {"email": email, "title": identifier},
-            {"$set": {"tag_names": tag_names}}
+    stamp = _task_stamp()
+    task = await _resolve_task(
+        email, identifier,
+        lambda query: collection.find_one_and_update(
+            query, {"$set": {"tag_names": tag_names, **stamp}},
+            projection={**_ROLLUP_PROJECTION, "title": 1}, return_document=ReturnDocument.AFTER
         )
-        return result.acknowledged
-    except Exception:
+    )
+    if task is None:
         return False
+    await _task_written(client, [task], stamp)
+    return True
 
 
-def add_tag_to_task(client: MongoClient, email: str, identifier: str, tag_name: str) -> bool:
+async def add_tag_to_task(client: AsyncIOMotorClient, email: str, identifier: str, tag_name: str) -> bool:
     """
     Adds a single tag to a task's tag_names list (avoids duplicates) by ID or Title.
     """
     db = client[DB_NAME]
     collection = db["tasks"]
-    
-    try:
-        # Try as ObjectId first
-        result = collection.update_one(
-            {"email": email, "_id": ObjectId(identifier)},
-            {"$addToSet": {"tag_names": tag_name}}
+    stamp = _task_stamp()
+    task = await _resolve_task(
+        email, identifier,
+        lambda query: collection.find_one_and_update(
+            query, {"$addToSet": {"tag_names": tag_name}, "$set": stamp},
+            projection={**_ROLLUP_PROJECTION, "title": 1}, return_document=ReturnDocument.AFTER
         )
-        if result.acknowledged and result.matched_count > 0:
-            return True
-    except Exception:
-        pass
-        
-    # Fallback to Title
-    try:
-        result = collection.update_one(
-            {"email": email, "title": identifier},
-            {"$addToSet": {"tag_names": tag_name}}
-        )
-        return result.acknowledged
-    except Exception:
+    )
+    if task is None:
         return False
+    await _task_written(client, [task], stamp)
+    return True
 
 
-def remove_tag_from_task(client: MongoClient, email: str, identifier: str, tag_name: str) -> bool:
+async def remove_tag_from_task(client: AsyncIOMotorClient, email: str, identifier: str, tag_name: str) -> bool:
     """
     Removes a single tag from a task's tag_names list by ID or Title.
     """
     db = client[DB_NAME]
     collection = db["tasks"]
-    
-    try:
-        # Try as ObjectId first
-        result = collection.update_one(
-            {"email": email, "_id": ObjectId(identifier)},
-            {"$pull": {"tag_names": tag_name}}
+    stamp = _task_stamp()
+    task = await _resolve_task(
+        email, identifier,
+        lambda query: collection.find_one_and_update(
+            query, {"$pull": {"tag_names": tag_name}, "$set": stamp},
+            projection={**_ROLLUP_PROJECTION, "title": 1}, return_document=ReturnDocument.AFTER
         )
-        if result.acknowledged and result.matched_count > 0:
-            return True
-    except Exception:
-        pass
-        
-    # Fallback to Title
-    try:
-        result = collection.update_one(
-            {"email": email, "title": identifier},
-            {"$pull": {"tag_names": tag_name}}
-        )
-        return result.acknowledged
-    except Exception:
+    )
+    if task is None:
         return False
+    await _task_written(client, [task], stamp)
+    return True
 
 
-def delete_task(client: MongoClient, email: str, identifier: str) -> bool:
+async def delete_task(client: AsyncIOMotorClient, email: str, identifier: str) -> bool:
     """Deletes a specific task by ID or Title."""
     db = client[DB_NAME]
     collection = db["tasks"]
-    try:
-        # Try as ObjectId first
-        result = collection.delete_one({"email": email, "_id": ObjectId(identifier)})
-        if result.deleted_count > 0:
-            return True
-    except Exception:
-        pass
-    
-    # Fallback to Title
-    result = collection.delete_one({"email": email, "title": identifier})
-    return result.deleted_count > 0
+    task = await _resolve_task(
+        email, identifier,
+        lambda query: collection.find_one_and_delete(query, projection={"title": 1, "email": 1, "task_client_id": 1, "rollup": 1})
+    )
+    _forget_task_titles(email=email)
+    if task is None:
+        return False
+    await _tombstone_task(client, task)
+    await _remove_from_rollups(client, task)
+    return True
+
+
+def iter_tasks_for_user(client: AsyncIOMotorClient, email: str, fields: Optional[List[str]] = None, after: Optional[str] = None, limit: Optional[int] = None):
+    """Cursor over a user's tasks in _id order (without embeddings)."""
+    db = client[DB_NAME]
+    collection = db["tasks"]
+    return _listing_cursor(collection, {"email": email}, fields, after, limit)
+
 
+async def get_all_tasks_for_user(client: AsyncIOMotorClient, email: str, fields: Optional[List[str]] = None, after: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Retrieves all tasks for a specific user (without embeddings), or one page when after/limit are given."""
+    return await iter_tasks_for_user(client, email, fields, after, limit).to_list(length=None)
 
-def get_all_tasks_for_user(client: MongoClient, email: str) -> List[Dict[str, Any]]:
-    """Retrieves all tasks for a specific user."""
+
+async def get_tasks_by_tag(client: AsyncIOMotorClient, email: str, tag_name: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Retrieves all tasks for a user that have a specific tag (without embeddings)."""
     db = client[DB_NAME]
     collection = db["tasks"]
-    return list(collection.find({"email": email}))
+    return await collection.find({"email": email, "tag_names": tag_name}, _listing_projection(fields)).to_list(length=None)
 
 
-def get_tasks_by_tag(client: MongoClient, email: str, tag_name: str) -> List[Dict[str, Any]]:
-    """Retrieves all tasks for a user that have a specific tag."""
+async def get_tasks_in_range(
+    client: AsyncIOMotorClient,
+    email: str,
+    start: datetime,
+    end: datetime,
+    fields: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Retrieves a user's tasks that overlap [start, end), sorted by start_time.
+    A task overlaps if it starts before end and start_time + duration (minutes)
+    is after start, so tasks that began before the window but run into it are included.
+    The {email, start_time} scan is bounded below by the user's longest task duration
+    (one index probe on {email, duration}), so old history is never read.
+    Recurring tasks are expanded into one document per occurrence in the window
+    (with a synthetic _id and the series' series_id, see recurrence.py) and merged
+    with the one-off tasks.
+    """
     db = client[DB_NAME]
     collection = db["tasks"]
-    return list(collection.find({"email": email, "tag_names": tag_name}))
+    start, end = to_naive_utc(start), to_naive_utc(end)
+
+    longest = await collection.find_one(
+        {"email": email, "duration": {"$gt": 0}},
+        {"duration": 1},
+        sort=[("duration", DESCENDING)]
+    )
+    lookback = timedelta(minutes=longest["duration"]) if longest else timedelta(0)
+
+    query = {
+        "email": email,
+        "recurrence": {"$in": list(NON_RECURRING)},
+        "start_time": {"$gte": start - lookback, "$lt": end},
+        "$expr": {"$or": [
+            {"$gte": ["$start_time", start]},
+            {"$gt": [
+                {"$add": ["$start_time", {"$multiply": [{"$ifNull": ["$duration", 0]}, 60000]}]},
+                start
+            ]}
+        ]}
+    }
+    projection = _listing_projection(fields)
+    if projection is not DEFAULT_LISTING_PROJECTION:
+        # Results are merged by start_time, so it is always returned
+        projection = {**projection, "start_time": 1}
+    cursor = collection.find(query, projection).sort("start_time", ASCENDING)
+    tasks = await cursor.to_list(length=None)
+
+    # Series that started before the window ends; expansion needs their schedule fields
+    if projection is not DEFAULT_LISTING_PROJECTION:
+        projection = {**projection, **{field: 1 for field in RECURRENCE_FIELDS}}
+    series = await collection.find({
+        "email": email,
+        "recurrence": {"$exists": True, "$nin": list(NON_RECURRING)},
+        "start_time": {"$lt": end}
+    }, projection).to_list(length=None)
+    for task in series:
+        if is_recurring(task):
+            tasks.extend(expand_task(task, expansion_cache.occurrences(task, start, end)))
+
+    if series:
+        tasks.sort(key=lambda task: task["start_time"])
+    return tasks
+
 
+async def add_recurrence_exception(client: AsyncIOMotorClient, task_id: str, occurrence: datetime) -> bool:
+    """Removes one occurrence from a recurring task's series."""
+    return await _set_recurrence_exception(client, task_id, {"$addToSet": {"recurrence_exceptions": to_naive_utc(occurrence)}})
 
-def get_all_tasks(client: MongoClient) -> List[Dict[str, Any]]:
-    """Retrieves all tasks in the database."""
+
+async def remove_recurrence_exception(client: AsyncIOMotorClient, task_id: str, occurrence: datetime) -> bool:
+    """Restores an occurrence previously removed with add_recurrence_exception."""
+    return await _set_recurrence_exception(client, task_id, {"$pull": {"recurrence_exceptions": to_naive_utc(occurrence)}})
+
+
+async def _set_recurrence_exception(client: AsyncIOMotorClient, task_id: str, update: Dict[str, Any]) -> bool:
     db = client[DB_NAME]
     collection = db["tasks"]
-    return list(collection.find())
+
+    if not ObjectId.is_valid(task_id):
+        return False
+    _id = ObjectId(task_id)
+    stamp = _task_stamp()
+    task = await collection.find_one_and_update(
+        {"_id": _id, "recurrence": {"$exists": True, "$nin": list(NON_RECURRING)}},
+        {**update, "$set": {**update.get("$set", {}), **stamp}},
+        projection=_ROLLUP_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    if not task:
+        return False
+    await _task_written(client, [task], stamp)
+    expansion_cache.invalidate(_id)
+    return True
+
+
+def iter_all_tasks(client: AsyncIOMotorClient, fields: Optional[List[str]] = None, after: Optional[str] = None, limit: Optional[int] = None):
+    """Cursor over all tasks in _id order (without embeddings)."""
+    db = client[DB_NAME]
+    collection = db["tasks"]
+    return _listing_cursor(collection, {}, fields, after, limit)
+
+
+async def get_all_tasks(client: AsyncIOMotorClient, fields: Optional[List[str]] = None, after: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Retrieves all tasks in the database (without embeddings), or one page when after/limit are given."""
+    return await iter_all_tasks(client, fields, after, limit).to_list(length=None)
 
 
 # =============================================================================
 # MAIN - VERIFICATION METHODS
 # =============================================================================
 
-def seed_tags(client: MongoClient):
+async def seed_tags(client: AsyncIOMotorClient):
     """
     Seeds persistent tags into the database for verification.
     Tags: cs3663, cleaning, coding-personal
@@ -642,12 +1454,12 @@ def seed_tags(client: MongoClient):
     ]
     
     for tag_name, tag_description in tags_to_create:
-        result = set_tag(client, email, tag_name, tag_description)
+        result = await set_tag(client, email, tag_name, tag_description)
         print(f"  Created tag '{tag_name}': {'SUCCESS' if result else 'FAILED'}")
     
     # Verify tags were created
     print("\n--- Verifying Tags ---")
-    all_tags = get_all_tags_for_user(client, email)
+    all_tags = await get_all_tags_for_user(client, email)
     print(f"Total tags for {email}: {len(all_tags)}")
     for t in all_tags:
         print(f"  - {t.get('tag_name')}: {t.get('tag_description', 'No description')}")
@@ -657,7 +1469,7 @@ def seed_tags(client: MongoClient):
     print("=" * 60)
 
 
-def run_full_verification(client: MongoClient):
+async def run_full_verification(client: AsyncIOMotorClient):
     """
     Full verification test that creates and cleans up test data.
     Call this if you want to run the complete test suite.
@@ -673,20 +1485,20 @@ def run_full_verification(client: MongoClient):
     
     # Create user
     print(f"Creating user: {test_email}")
-    result = set_user(client, test_email, description="Test user for verification")
+    result = await set_user(client, test_email, description="Test user for verification")
     print(f"  set_user: {'SUCCESS' if result else 'FAILED'}")
     
     # Get user
-    user = get_user(client, test_email)
+    user = await get_user(client, test_email)
     print(f"  get_user: {user}")
     
     # Get user description
-    desc = get_user_description(client, test_email)
+    desc = await get_user_description(client, test_email)
     print(f"  get_user_description: {desc}")
     
     # Update description only
-    set_user_description(client, test_email, "Updated description")
-    desc = get_user_description(client, test_email)
+    await set_user_description(client, test_email, "Updated description")
+    desc = await get_user_description(client, test_email)
     print(f"  Updated description: {desc}")
     
     # --- TAGS TESTS ---
@@ -694,21 +1506,21 @@ def run_full_verification(client: MongoClient):
     
     # Create tags
     print(f"Creating tags for: {test_email}")
-    set_tag(client, test_email, "work", "Work related tasks")
-    set_tag(client, test_email, "personal", "Personal tasks")
-    set_tag(client, test_email, "urgent")  # No description
+    await set_tag(client, test_email, "work", "Work related tasks")
+    await set_tag(client, test_email, "personal", "Personal tasks")
+    await set_tag(client, test_email, "urgent")  # No description
     print("  set_tag: Created 3 tags")
     
     # Get specific tag
-    tag = get_tag(client, test_email, "work")
+    tag = await get_tag(client, test_email, "work")
     print(f"  get_tag('work'): {tag}")
     
     # Get tag description
-    tag_desc = get_tag_description(client, test_email, "work")
+    tag_desc = await get_tag_description(client, test_email, "work")
     print(f"  get_tag_description('work'): {tag_desc}")
     
     # Get all tags for user
-    all_tags = get_all_tags_for_user(client, test_email)
+    all_tags = await get_all_tags_for_user(client, test_email)
     print(f"  get_all_tags_for_user: {len(all_tags)} tags found")
     for t in all_tags:
         print(f"    - {t.get('tag_name')}: {t.get('tag_description', 'No description')}")
@@ -718,43 +1530,43 @@ def run_full_verification(client: MongoClient):
     
     # Create tasks
     print(f"Creating tasks for: {test_email}")
-    set_task(client, test_email, "Complete project", 
+    await set_task(client, test_email, "Complete project", 
              description="Finish the FlowState project", 
              tag_names=["work", "urgent"])
-    set_task(client, test_email, "Buy groceries", 
+    await set_task(client, test_email, "Buy groceries", 
              description="Weekly shopping",
              tag_names=["personal"])
-    set_task(client, test_email, "Quick note")  # Minimal task
+    await set_task(client, test_email, "Quick note")  # Minimal task
     print("  set_task: Created 3 tasks")
     
     # Get specific task
-    task = get_task(client, test_email, "Complete project")
+    task = await get_task(client, test_email, "Complete project")
     print(f"  get_task('Complete project'): {task}")
     
     # Get task description
-    task_desc = get_task_description(client, test_email, "Complete project")
+    task_desc = await get_task_description(client, test_email, "Complete project")
     print(f"  get_task_description: {task_desc}")
     
     # Get task tags
-    task_tags = get_task_tags(client, test_email, "Complete project")
+    task_tags = await get_task_tags(client, test_email, "Complete project")
     print(f"  get_task_tags: {task_tags}")
     
     # Add a tag to task
-    add_tag_to_task(client, test_email, "Complete project", "important")
-    task_tags = get_task_tags(client, test_email, "Complete project")
+    await add_tag_to_task(client, test_email, "Complete project", "important")
+    task_tags = await get_task_tags(client, test_email, "Complete project")
     print(f"  After add_tag_to_task('important'): {task_tags}")
     
     # Remove a tag from task
-    remove_tag_from_task(client, test_email, "Complete project", "urgent")
-    task_tags = get_task_tags(client, test_email, "Complete project")
+    await remove_tag_from_task(client, test_email, "Complete project", "urgent")
+    task_tags = await get_task_tags(client, test_email, "Complete project")
     print(f"  After remove_tag_from_task('urgent'): {task_tags}")
     
     # Get all tasks for user
-    all_tasks = get_all_tasks_for_user(client, test_email)
+    all_tasks = await get_all_tasks_for_user(client, test_email)
     print(f"  get_all_tasks_for_user: {len(all_tasks)} tasks found")
     
     # Get tasks by tag
-    work_tasks = get_tasks_by_tag(client, test_email, "work")
+    work_tasks = await get_tasks_by_tag(client, test_email, "work")
     print(f"  get_tasks_by_tag('work'): {len(work_tasks)} tasks")
     
     # --- CLEANUP ---
@@ -775,7 +1587,7 @@ def run_full_verification(client: MongoClient):
     # print("  Deleted test user")
     
     # Verify cleanup
-    user = get_user(client, test_email)
+    user = await get_user(client, test_email)
     print(f"\n  Verification - User exists: {user is not None}")
     
     print("\n" + "=" * 60)
@@ -789,66 +1601,72 @@ if __name__ == "__main__":
     """
     load_dotenv()
     MONGO_URI = os.getenv("MONGO_URI")
-    client = MongoClient(MONGO_URI)
-    
-    # Run seed_tags to create persistent tags for verification
-    # seed_tags(client)
-    
-    # Uncomment below to run full verification (creates and cleans up test data)
-    # Run a simple test
-    set_task(
-        client, 
-        "test@mulino.com", 
-        "Implement authentication system", 
-        "test-auth-1",
-        "Build JWT-based authentication with refresh tokens and role-based access control", 
-        ["work"]
-    )
-    client.close()
+
+    async def _verify():
+        client = AsyncIOMotorClient(MONGO_URI)
+        
+        # Run seed_tags to create persistent tags for verification
+        # await seed_tags(client)
+        
+        # Uncomment below to run full verification (creates and cleans up test data)
+        # Run a simple test
+        await set_task(
+            client, 
+            "test@mulino.com", 
+            "Implement authentication system", 
+            "test-auth-1",
+            "Build JWT-based authentication with refresh tokens and role-based access control", 
+            ["work"]
+        )
+        client.close()
+
+    asyncio.run(_verify())
     
 # =============================================================================
 # PAD OPERATIONS
 # =============================================================================
 
-def set_pad(client: MongoClient, email: str, pad_id: str, information: str) -> bool:
+async def set_pad(client: AsyncIOMotorClient, email: str, pad_id: str, information: str) -> bool:
     """
     Creates or updates a pad for a given user.
     """
     db = client[DB_NAME]
     collection = db["pads"]
     
-    result = collection.update_one(
+    result = await collection.update_one(
         {"email": email, "pad_id": pad_id},
         {"$set": {"email": email, "pad_id": pad_id, "information": information}},
         upsert=True
     )
+    await _touch(client, email, "pad", "upsert", pad_id)
     return result.acknowledged
 
 
-def get_pads(client: MongoClient, email: str) -> List[Dict[str, Any]]:
+async def get_pads(client: AsyncIOMotorClient, email: str) -> List[Dict[str, Any]]:
     """Retrieves all pads for a specific user."""
     db = client[DB_NAME]
     collection = db["pads"]
-    return list(collection.find({"email": email}))
+    return await collection.find({"email": email}).to_list(length=None)
 
 
-def get_pad(client: MongoClient, email: str, pad_id: str) -> Optional[Dict[str, Any]]:
+async def get_pad(client: AsyncIOMotorClient, email: str, pad_id: str) -> Optional[Dict[str, Any]]:
     """Retrieves a specific pad by email and pad_id."""
     db = client[DB_NAME]
     collection = db["pads"]
-    return collection.find_one({"email": email, "pad_id": pad_id})
+    return await collection.find_one({"email": email, "pad_id": pad_id})
 
 
-def delete_pad(client: MongoClient, email: str, pad_id: str) -> bool:
+async def delete_pad(client: AsyncIOMotorClient, email: str, pad_id: str) -> bool:
     """Deletes a specific pad. Returns True if a pad was deleted."""
     db = client[DB_NAME]
     collection = db["pads"]
-    result = collection.delete_one({"email": email, "pad_id": pad_id})
+    result = await collection.delete_one({"email": email, "pad_id": pad_id})
+    await _touch(client, email, "pad", "delete", pad_id)
     return result.deleted_count > 0
 
 
-def update_task_ai_estimation(
-    client: MongoClient,
+async def update_task_ai_estimation(
+    client: AsyncIOMotorClient,
     task_client_id: str,
     ai_estimation_status: str,
     ai_time_estimation: Optional[int] = None,
@@ -879,19 +1697,23 @@ def update_task_ai_estimation(
     if ai_confidence is not None:
         update_data["ai_confidence"] = ai_confidence
         
-    result = collection.update_one(
+    stamp = _task_stamp()
+    task = await collection.find_one_and_update(
         {"task_client_id": task_client_id},
-        {"$set": update_data}
+        {"$set": {**update_data, **stamp}},
+        projection=_ROLLUP_PROJECTION,
+        return_document=ReturnDocument.AFTER
     )
-    
-    return result.acknowledged
+    if task is not None:
+        await _task_written(client, [task], stamp)
+    return task is not None
 
 
 # =============================================================================
 # PROJECT OPERATIONS
 # =============================================================================
 
-def set_project(client: MongoClient, email: str, project_id: str, title: str, tasks: List[Dict[str, Any]], starting_date: Optional[str] = None, cost: Optional[str] = None, description: Optional[str] = None) -> bool:
+async def set_project(client: AsyncIOMotorClient, email: str, project_id: str, title: str, tasks: List[Dict[str, Any]], starting_date: Optional[str] = None, cost: Optional[str] = None, description: Optional[str] = None) -> bool:
     """
     Creates or updates a project grid environment.
     """
@@ -908,28 +1730,30 @@ def set_project(client: MongoClient, email: str, project_id: str, title: str, ta
         "description": description
     }
     
-    result = collection.update_one(
+    result = await collection.update_one(
         {"email": email, "project_id": project_id},
         {"$set": update_data},
         upsert=True
     )
+    await _touch(client, email, "project", "upsert", project_id)
     return result.acknowledged
 
-def get_project(client: MongoClient, email: str, project_id: str) -> Optional[Dict[str, Any]]:
+async def get_project(client: AsyncIOMotorClient, email: str, project_id: str) -> Optional[Dict[str, Any]]:
     """Retrieves a specific project."""
     db = client[DB_NAME]
     collection = db["projects"]
-    return collection.find_one({"email": email, "project_id": project_id})
+    return await collection.find_one({"email": email, "project_id": project_id})
 
-def delete_project(client: MongoClient, email: str, project_id: str) -> bool:
+async def delete_project(client: AsyncIOMotorClient, email: str, project_id: str) -> bool:
     """Deletes a specific project."""
     db = client[DB_NAME]
     collection = db["projects"]
-    result = collection.delete_one({"email": email, "project_id": project_id})
+    result = await collection.delete_one({"email": email, "project_id": project_id})
+    await _touch(client, email, "project", "delete", project_id)
     return result.deleted_count > 0
 
-def get_all_projects_for_user(client: MongoClient, email: str) -> List[Dict[str, Any]]:
+async def get_all_projects_for_user(client: AsyncIOMotorClient, email: str) -> List[Dict[str, Any]]:
     """Retrieves all projects for a specific user."""
     db = client[DB_NAME]
     collection = db["projects"]
-    return list(collection.find({"email": email}))
\ No newline at end of file
+    return await collection.find({"email": email}).to_list(length=None)
\ No newline at end of file
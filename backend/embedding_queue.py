@@ -0,0 +1,197 @@
+"""
+Background embedding queue for FlowState.
+
+Writes in db.py persist immediately with embedding_status "pending" and enqueue
+their embedding text here. A single worker task micro-batches pending texts
+into embed_documents calls through the shared embedding service, writes the
+vectors back and retries failed batches with exponential backoff.
+
+Repeated writes to the same document before its embedding is stored are
+coalesced: only the latest text is embedded, and a vector computed for an
+older text is never written over a newer one (the write is guarded by
+embedding_pending_hash). Stored vectors record embedding_source_hash and
+embedding_model so stale vectors can be found later (see reembed.py).
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from embedding_service import embedding_service
+
+
+@dataclass
+class EmbeddingJob:
+    collection: str
+    query: Dict[str, Any]
+    text: str
+    text_hash: str
+    attempts: int = 0
+    not_before: float = 0.0
+
+
+class EmbeddingQueue:
+    def __init__(self, batch_size: int = 64, batch_window: float = 0.05, max_attempts: int = 5, retry_delay: float = 1.0):
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # (collection, query) -> latest job for that document
+        self._pending: "OrderedDict[Tuple, EmbeddingJob]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._database: Optional[AsyncIOMotorDatabase] = None
+        # _mark_failed writes in flight, referenced so they aren't garbage collected
+        self._marking: set = set()
+        self.counters: Dict[str, int] = {"enqueued": 0, "coalesced": 0, "embedded": 0, "retried": 0, "failed": 0, "batches": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @staticmethod
+    def _key(collection: str, query: Dict[str, Any]) -> Tuple:
+        return (collection, tuple(sorted(query.items())))
+
+    def enqueue(self, collection: str, query: Dict[str, Any], text: str):
+        """Schedules (or replaces) the embedding for the document matched by query."""
+        if not text or not text.strip():
+            return
+        key = self._key(collection, query)
+        if key in self._pending:
+            self.counters["coalesced"] += 1
+        self._pending[key] = EmbeddingJob(collection, dict(query), text, embedding_service.cache_key(text))
+        self.counters["enqueued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self, database: AsyncIOMotorDatabase):
+        """Starts the worker task on the running loop."""
+        if self.running:
+            return
+        self._database = database
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        if self._pending:
+            self._wakeup.set()
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Flushes what is ready to go (bounded by drain_timeout) and stops the worker."""
+        if self._marking:
+            await asyncio.gather(*self._marking)
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _drain(self):
+        while self._ready_batch(peek=True):
+            await asyncio.sleep(self.batch_window)
+
+    def _ready_batch(self, peek: bool = False) -> List[EmbeddingJob]:
+        now = asyncio.get_running_loop().time()
+        batch = []
+        for key, job in list(self._pending.items()):
+            if job.not_before > now:
+                continue
+            batch.append(job)
+            if not peek:
+                del self._pending[key]
+            if len(batch) >= self.batch_size:
+                break
+        return batch
+
+    def _next_retry_in(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        now = asyncio.get_running_loop().time()
+        return max(0.0, min(job.not_before for job in self._pending.values()) - now)
+
+    async def _run(self):
+        while True:
+            wait = self._next_retry_in()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Give bursts of writes a moment to accumulate into one batch
+            await asyncio.sleep(self.batch_window)
+
+            batch = self._ready_batch()
+            while batch:
+                try:
+                    await self._process(batch)
+                except Exception as e:
+                    print(f"[ERROR] Embedding batch failed: {e}")
+                    for job in batch:
+                        self._retry(job)
+                batch = self._ready_batch()
+
+    async def _process(self, batch: List[EmbeddingJob]):
+        self.counters["batches"] += 1
+        vectors = await embedding_service.embed_many(self._database, [job.text for job in batch])
+
+        writes: Dict[str, List[UpdateOne]] = {}
+        for job, vector in zip(batch, vectors):
+            if vector is None:
+                continue
+            writes.setdefault(job.collection, []).append(UpdateOne(
+                {**job.query, "embedding_pending_hash": job.text_hash},
+                {
+                    "$set": {
+                        "embedding": vector,
+                        "embedding_status": "ready",
+                        "embedding_source_hash": job.text_hash,
+                        "embedding_model": embedding_service.model
+                    },
+                    "$unset": {"embedding_pending_hash": ""}
+                }
+            ))
+        for collection, operations in writes.items():
+            await self._database[collection].bulk_write(operations, ordered=False)
+        self.counters["embedded"] += sum(len(ops) for ops in writes.values())
+
+    def _retry(self, job: EmbeddingJob):
+        key = self._key(job.collection, job.query)
+        if key in self._pending:
+            # A newer write superseded this job while it was in flight
+            return
+        job.attempts += 1
+        if job.attempts >= self.max_attempts:
+            self.counters["failed"] += 1
+            marking = asyncio.create_task(self._mark_failed(job))
+            self._marking.add(marking)
+            marking.add_done_callback(self._marking.discard)
+            return
+        self.counters["retried"] += 1
+        job.not_before = asyncio.get_running_loop().time() + self.retry_delay * (2 ** (job.attempts - 1))
+        self._pending[key] = job
+
+    async def _mark_failed(self, job: EmbeddingJob):
+        try:
+            await self._database[job.collection].update_one(
+                {**job.query, "embedding_pending_hash": job.text_hash},
+                # Dropping the pending hash lets reembed.py see the document as stale
+                {"$set": {"embedding_status": "failed"}, "$unset": {"embedding_pending_hash": ""}}
+            )
+        except Exception as e:
+            print(f"[ERROR] Failed to mark embedding as failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "pending": len(self._pending), "running": self.running}
+
+
+embedding_queue = EmbeddingQueue()
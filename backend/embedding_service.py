@@ -0,0 +1,184 @@
+"""
+Process-wide embedding service for FlowState.
+
+Holds one reused Gemini embeddings client and two cache layers in front of it:
+- an in-memory LRU keyed by sha256(model + text)
+- a persistent Mongo collection (embedding_cache) shared by restarts and workers
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+EMBEDDING_MODEL = "models/gemini-embedding-001"
+CACHE_COLLECTION = "embedding_cache"
+
+
+class EmbeddingService:
+    def __init__(self, model: str = EMBEDDING_MODEL, max_entries: int = 2048):
+        self.model = model
+        self.max_entries = max_entries
+        self._client = None
+        # cache key -> vector, most recently used last
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        # cache key -> future for misses already being embedded
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.counters: Dict[str, int] = {"memory_hits": 0, "store_hits": 0, "misses": 0, "errors": 0}
+
+    def _get_client(self):
+        """Creates the Gemini embeddings client once and reuses it."""
+        if self._client is None:
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            self._client = GoogleGenerativeAIEmbeddings(model=self.model)
+        return self._client
+
+    def cache_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def embed(self, database: Optional[AsyncIOMotorDatabase], text: str) -> Optional[List[float]]:
+        """
+        Returns the embedding for text, or None if text is empty or generation fails.
+        Pass database=None to skip the persistent cache layer.
+        """
+        if not text or not text.strip():
+            return None
+
+        key = self.cache_key(text)
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return self._lru[key]
+
+        # Identical concurrent misses share a single lookup/embedding call
+        if key in self._in_flight:
+            return await asyncio.shield(self._in_flight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            vector = await self._load_or_generate(database, key, text)
+            future.set_result(vector)
+            return vector
+        except Exception as e:
+            future.set_result(None)
+            self.counters["errors"] += 1
+            print(f"Warning: Failed to generate embedding: {e}")
+            return None
+        except BaseException:
+            # Cancelled: callers sharing the lookup would otherwise wait forever
+            future.cancel()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def _load_or_generate(self, database: Optional[AsyncIOMotorDatabase], key: str, text: str) -> List[float]:
+        collection = database[CACHE_COLLECTION] if database is not None else None
+
+        if collection is not None:
+            cached = await collection.find_one({"_id": key}, {"embedding": 1})
+            if cached and cached.get("embedding"):
+                self.counters["store_hits"] += 1
+                self._remember(key, cached["embedding"])
+                return cached["embedding"]
+
+        self.counters["misses"] += 1
+        vector = await asyncio.to_thread(self._get_client().embed_query, text)
+        self._remember(key, vector)
+
+        if collection is not None:
+            await collection.update_one(
+                {"_id": key},
+                {"$set": {"model": self.model, "embedding": vector, "created_at": datetime.utcnow()}},
+                upsert=True
+            )
+        return vector
+
+    async def embed_many(self, database: Optional[AsyncIOMotorDatabase], texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Batch variant of embed. Cache misses are sent in a single embed_documents call.
+        Unlike embed, failures are raised so the caller can retry the batch.
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        # cache key -> indexes in texts that need it
+        missing: "OrderedDict[str, List[int]]" = OrderedDict()
+
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            key = self.cache_key(text)
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                results[i] = self._lru[key]
+            else:
+                missing.setdefault(key, []).append(i)
+
+        collection = database[CACHE_COLLECTION] if database is not None else None
+
+        if missing and collection is not None:
+            cursor = collection.find({"_id": {"$in": list(missing)}}, {"embedding": 1})
+            async for cached in cursor:
+                if not cached.get("embedding"):
+                    continue
+                self.counters["store_hits"] += 1
+                self._remember(cached["_id"], cached["embedding"])
+                for i in missing.pop(cached["_id"]):
+                    results[i] = cached["embedding"]
+
+        if not missing:
+            return results
+
+        self.counters["misses"] += len(missing)
+        keys = list(missing)
+        try:
+            vectors = await asyncio.to_thread(
+                self._get_client().embed_documents,
+                [texts[missing[key][0]] for key in keys]
+            )
+        except Exception:
+            self.counters["errors"] += 1
+            raise
+
+        now = datetime.utcnow()
+        for key, vector in zip(keys, vectors):
+            self._remember(key, vector)
+            for i in missing[key]:
+                results[i] = vector
+
+        if collection is not None:
+            await collection.bulk_write([
+                UpdateOne(
+                    {"_id": key},
+                    {"$set": {"model": self.model, "embedding": vector, "created_at": now}},
+                    upsert=True
+                )
+                for key, vector in zip(keys, vectors)
+            ], ordered=False)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns cache counters plus the overall and in-memory hit rates."""
+        hits = self.counters["memory_hits"] + self.counters["store_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "lookups": lookups,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_hit_rate": self.counters["memory_hits"] / lookups if lookups else 0.0,
+            "memory_entries": len(self._lru),
+            "model": self.model,
+        }
+
+
+embedding_service = EmbeddingService()
@@ -0,0 +1,44 @@
+"""
+Fast JSON encoding for MongoDB documents.
+
+Endpoints return documents straight from Motor in a MongoJSONResponse instead
+of stringifying _id and formatting datetimes per document in Python and then
+going through FastAPI's jsonable_encoder + json.dumps. orjson writes
+datetimes natively and ObjectId through `default`.
+
+Mongo hands back naive UTC datetimes; they are written as
+"2024-01-01T09:00:00Z", the format the frontend already parses.
+"""
+
+from datetime import datetime, timezone
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_OMIT_MICROSECONDS | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        # Subclasses only; orjson writes plain datetimes itself, in the same format
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+    # Anything else is a bug in the caller, not something to stringify silently
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serializes documents (ObjectId, datetime, nested lists/dicts) to JSON bytes."""
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class MongoJSONResponse(JSONResponse):
+    """JSONResponse that encodes Mongo documents without a jsonable_encoder pass."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
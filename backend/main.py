@@ -1,17 +1,26 @@
-from fastapi import FastAPI, HTTPException, status, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi import FastAPI, HTTPException, status, WebSocket, WebSocketDisconnect, BackgroundTasks, Query, Response, Header
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
-from datetime import datetime
-from pymongo import MongoClient
+from datetime import date, datetime
+from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 import os
 import json
 import asyncio
+import hashlib
 
 # Import all db functions
 import db
+from change_events import TOPIC_PREFIX, change_feed, user_topic
+from embedding_queue import embedding_queue
+from mongo_clients import mongo_clients
+from response_cache import response_cache
+from task_commands import task_commands
+from recurrence import expansion_cache
+from json_response import MongoJSONResponse, dumps
 import yfinance as yf
 import time
 
@@ -19,11 +28,10 @@ import time
 load_dotenv()
 
 # Configuration
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:3000,http://127.0.0.1:5173")
 
-# Global MongoDB client
-mongo_client: Optional[MongoClient] = None
+# Global MongoDB client (the "api" workload of the shared registry)
+mongo_client: Optional[AsyncIOMotorClient] = None
 # Global cache for stocks: { "data": [...], "timestamp": 0 }
 stock_cache: Dict[str, Any] = {"data": None, "timestamp": 0}
 CACHE_DURATION = 300  # 5 minutes in seconds
@@ -83,6 +91,11 @@ class TaskCreate(BaseModel):
     socket_id: Optional[str] = None
 
 
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate] = Field(..., max_length=1000)
+    ordered: bool = False
+
+
 class TaskUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -121,6 +134,10 @@ class TaskTagRemove(BaseModel):
     tag_name: str
 
 
+class TaskRecurrenceException(BaseModel):
+    occurrence_start: datetime
+
+
 class AgentChatRequest(BaseModel):
     message: str
     user_id: str
@@ -167,20 +184,47 @@ async def lifespan(app: FastAPI):
     """Manage MongoDB connection lifecycle"""
     global mongo_client
     # Startup
-    print(f"Connecting to MongoDB: {MONGO_URI[:20]}...")
-    mongo_client = MongoClient(MONGO_URI)
+    print(f"Connecting to MongoDB: {mongo_clients.uri[:20]}...")
+    mongo_client = mongo_clients.get("api")
     # Test connection
     try:
-        mongo_client.admin.command('ping')
+        await mongo_client.admin.command('ping')
         print("✓ MongoDB connected successfully")
     except Exception as e:
         print(f"✗ MongoDB connection failed: {e}")
+
+    try:
+        await db.ensure_indexes(mongo_client)
+        print("✓ MongoDB indexes ensured")
+    except Exception as e:
+        print(f"✗ MongoDB index creation failed: {e}")
+
+    # Background embedding worker: writes return before Gemini answers
+    await embedding_queue.start(mongo_clients.get("background")[db.DB_NAME])
+    await manager.start()
+    print(f"✓ WebSocket broker started ({manager.broker.stats()['backend']})")
+    # Change events for subscribed sockets, collected per user for a short window
+    background_client = mongo_clients.get("background")
+    await change_feed.start(manager.publish, lambda email, since: db.get_task_changes(background_client, email, since))
+    # Debounced task moves/resizes/completions sent as rpc frames on the socket
+    task_commands.start(lambda task_id, updates: db.update_task_fields(mongo_client, task_id, updates))
+    try:
+        requeued = await db.requeue_pending_embeddings(mongo_client)
+        if requeued:
+            print(f"✓ Re-queued {requeued} pending embeddings")
+    except Exception as e:
+        print(f"✗ Failed to re-queue pending embeddings: {e}")
     
     yield
     
     # Shutdown
+    await task_commands.stop()
+    await change_feed.stop()
+    await manager.stop()
+    await embedding_queue.stop()
     if mongo_client:
-        mongo_client.close()
+        mongo_clients.close()
+        mongo_client = None
         print("✓ MongoDB connection closed")
 
 
@@ -204,6 +248,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-After", "ETag"],
 )
 
 
@@ -211,26 +256,61 @@ app.add_middleware(
 # WEBSOCKET MANAGEMENT
 # ============================================================================
 
-from websocket_manager import manager
+from websocket_manager import Connection, manager
+
+# rpc commands in flight, referenced so they aren't garbage collected mid-write
+_rpc_calls: set = set()
+
+
+async def answer_rpc(connection: Connection, frame: Dict[str, Any]):
+    """Runs a task command and answers on the connection that sent it."""
+    reply = await task_commands.handle(frame)
+    connection.enqueue(dumps(reply).decode())
 
 
 @app.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    await manager.connect(websocket, client_id)
+async def websocket_endpoint(websocket: WebSocket, client_id: str, last_seq: Optional[int] = Query(None, ge=0)):
+    if client_id.startswith(TOPIC_PREFIX):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    # last_seq: the highest message seq the client has seen; newer buffered messages are replayed.
+    # A first connection (no last_seq, or 0) starts from now
+    connection = await manager.connect(websocket, client_id, last_seq)
     try:
         while True:
-            # Keep connection alive
+            # Any frame (including the pong answering a heartbeat ping) keeps the connection alive
             data = await websocket.receive_text()
-            # Handle incoming client messages if needed
-    except WebSocketDisconnect:
-        manager.disconnect(client_id)
+            connection.touch()
+            try:
+                frame = json.loads(data)
+            except ValueError:
+                continue
+            if not isinstance(frame, dict):
+                continue
+            # Commands run alongside the read loop so a burst of moves can coalesce
+            if frame.get("type") == "rpc":
+                call = asyncio.create_task(answer_rpc(connection, frame))
+                _rpc_calls.add(call)
+                call.add_done_callback(_rpc_calls.discard)
+            # {"type": "subscribe", "email": ...} joins the user's change events
+            elif frame.get("type") in ("subscribe", "unsubscribe") and frame.get("email"):
+                topic = user_topic(frame["email"])
+                if frame["type"] == "subscribe":
+                    manager.subscribe(connection, topic)
+                else:
+                    manager.unsubscribe(connection, topic)
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the writer already closed a socket that fell behind or went idle
+        pass
+    finally:
+        manager.disconnect(connection)
 
 
 # ============================================================================
 # HELPER FUNCTION
 # ============================================================================
 
-def get_client() -> MongoClient:
+def get_client() -> AsyncIOMotorClient:
     """Get MongoDB client or raise error if not connected"""
     if mongo_client is None:
         raise HTTPException(
@@ -240,28 +320,99 @@ def get_client() -> MongoClient:
     return mongo_client
 
 
-def serialize_task(task: Dict[str, Any]) -> Dict[str, Any]:
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
     """
-    Serialize task dictionary for JSON response.
-    - Converts ObjectId to string
-    - Converts datetime objects to ISO strings with 'Z' suffix (UTC)
+    Parses the comma separated ?fields= query parameter used by listing endpoints.
+    Returns None when no fields were requested (default projection).
     """
-    if not task:
-        return task
-        
-    # Convert _id
-    if "_id" in task:
-        task["_id"] = str(task["_id"])
-        
-    # Convert start_time to ISO string with Z
-    if "start_time" in task and isinstance(task["start_time"], datetime):
-        # Assume UTC if naive, as we store UTC
-        dt = task["start_time"]
-        # .isoformat() might return '2023-01-01T12:00:00' (no Z)
-        # We want '2023-01-01T12:00:00Z'
-        task["start_time"] = dt.strftime('%Y-%m-%dT%H:%M:%SZ')
-        
-    return task
+    if not fields:
+        return None
+    parsed = [f.strip() for f in fields.split(",") if f.strip()]
+    return parsed or None
+
+
+def parse_start_time(value: Optional[str]) -> Optional[datetime]:
+    """Parses an ISO start_time string (with optional Z suffix). Returns None if missing or invalid."""
+    if value is None:
+        return None
+    try:
+        # Handle ISO string with potential Z suffix
+        clean_time = str(value).replace('Z', '+00:00')
+        return datetime.fromisoformat(clean_time)
+    except Exception as e:
+        print(f"Error parsing start_time: {e}")
+        return None
+
+
+def task_create_kwargs(task: TaskCreate) -> Dict[str, Any]:
+    """Maps a TaskCreate payload onto db.set_task keyword arguments."""
+    data = task.dict(exclude={"socket_id"})
+    data["start_time"] = parse_start_time(task.start_time)
+    return data
+
+
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+
+async def listing_response(cursor, limit: Optional[int], stream: bool):
+    """
+    Returns a listing cursor either as an NDJSON stream (?stream=true), written
+    as the cursor produces documents, or as a JSON list.
+    For a full page of a paginated list, the next page's ?after= value is sent
+    in the X-Next-After header.
+    """
+    if stream:
+        async def ndjson():
+            lines: List[bytes] = []
+            size = 0
+            async for doc in cursor:
+                line = dumps(doc)
+                lines.append(line)
+                size += len(line)
+                if size >= NDJSON_CHUNK_BYTES:
+                    yield b"\n".join(lines) + b"\n"
+                    lines, size = [], 0
+            if lines:
+                yield b"\n".join(lines) + b"\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    items = await cursor.to_list(length=None)
+    headers = {}
+    if limit and len(items) == limit:
+        headers["X-Next-After"] = str(items[-1]["_id"])
+    return MongoJSONResponse(items, headers=headers)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak If-None-Match comparison against our ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+async def cached_listing(email: str, listing: str, variant: str, if_none_match: Optional[str], load) -> Response:
+    """
+    Serves a per-user listing with an ETag derived from the user's data version.
+    Answers a matching If-None-Match with 304 and otherwise reuses the serialized
+    body from the response cache while the version is unchanged.
+    """
+    client = get_client()
+    version = await db.get_data_version(client, email)
+    variant_hash = hashlib.sha1(f"{listing}\0{variant}".encode("utf-8")).hexdigest()[:12]
+    etag = f'"{version}-{variant_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    async def build() -> bytes:
+        return dumps(await load())
+
+    body = await response_cache.get_or_build(email, listing, variant, version, build)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 # ============================================================================
@@ -282,34 +433,35 @@ async def root():
 # ============================================================================
 
 @app.get("/api/users")
-async def get_all_users():
-    """Get all users"""
+async def get_all_users(
+    after: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    stream: bool = Query(False)
+):
+    """Get all users. Supports ?after=<_id>&limit= paging and ?stream=true NDJSON output."""
     client = get_client()
-    users = db.get_all_users(client)
-    # Convert ObjectId to string for JSON serialization
-    for user in users:
-        if "_id" in user:
-            user["_id"] = str(user["_id"])
-    return users
+    try:
+        cursor = db.iter_all_users(client, after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await listing_response(cursor, limit, stream)
 
 
 @app.get("/api/users/{email}")
 async def get_user(email: str):
     """Get a specific user by email"""
     client = get_client()
-    user = db.get_user(client, email)
+    user = await db.get_user(client, email)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    if "_id" in user:
-        user["_id"] = str(user["_id"])
-    return user
+    return MongoJSONResponse(user)
 
 
 @app.get("/api/users/{email}/description")
 async def get_user_description(email: str):
     """Get user description"""
     client = get_client()
-    description = db.get_user_description(client, email)
+    description = await db.get_user_description(client, email)
     if description is None:
         raise HTTPException(status_code=404, detail="User not found or no description")
     return {"description": description}
@@ -321,11 +473,11 @@ async def create_user(user: UserCreate):
     client = get_client()
     
     # Check if user already exists
-    existing_user = db.get_user(client, user.email)
+    existing_user = await db.get_user(client, user.email)
     is_new_user = existing_user is None
     
     # Create or update the user
-    result = db.set_user(client, user.email, user.description)
+    result = await db.set_user(client, user.email, user.description)
     if not result:
         raise HTTPException(status_code=500, detail="Failed to create user")
     
@@ -338,7 +490,7 @@ async def create_user(user: UserCreate):
         ]
         
         for tag_name, tag_description in default_tags:
-            db.set_tag(client, user.email, tag_name, tag_description)
+            await db.set_tag(client, user.email, tag_name, tag_description)
     
     return {"message": "User created successfully", "email": user.email}
 
@@ -347,7 +499,7 @@ async def create_user(user: UserCreate):
 async def update_user_description(email: str, update: UserDescriptionUpdate):
     """Update user description"""
     client = get_client()
-    result = db.set_user_description(client, email, update.description)
+    result = await db.set_user_description(client, email, update.description)
     if not result:
         raise HTTPException(status_code=500, detail="Failed to update description")
     return {"message": "Description updated successfully"}
@@ -357,7 +509,7 @@ async def update_user_description(email: str, update: UserDescriptionUpdate):
 async def delete_user(email: str):
     """Delete a user"""
     client = get_client()
-    result = db.delete_user(client, email)
+    result = await db.delete_user(client, email)
     if not result:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted successfully"}
@@ -368,44 +520,57 @@ async def delete_user(email: str):
 # ============================================================================
 
 @app.get("/api/tags")
-async def get_all_tags():
-    """Get all tags"""
+async def get_all_tags(
+    fields: Optional[str] = Query(None),
+    after: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    stream: bool = Query(False)
+):
+    """
+    Get all tags. Optional ?fields=a,b limits the returned columns.
+    Supports ?after=<_id>&limit= paging and ?stream=true NDJSON output.
+    """
     client = get_client()
-    tags = db.get_all_tags(client)
-    for tag in tags:
-        if "_id" in tag:
-            tag["_id"] = str(tag["_id"])
-    return tags
+    try:
+        cursor = db.iter_all_tags(client, parse_fields(fields), after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await listing_response(cursor, limit, stream)
 
 
 @app.get("/api/tags/{email}")
-async def get_all_tags_for_user(email: str):
-    """Get all tags for a specific user"""
+async def get_all_tags_for_user(
+    email: str,
+    fields: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Get all tags for a specific user. Optional ?fields=a,b limits the returned columns.
+    Returns an ETag and answers If-None-Match with 304 when nothing changed.
+    """
     client = get_client()
-    tags = db.get_all_tags_for_user(client, email)
-    for tag in tags:
-        if "_id" in tag:
-            tag["_id"] = str(tag["_id"])
-    return tags
+    parsed = parse_fields(fields)
+    return await cached_listing(
+        email, "tags", ",".join(parsed or []), if_none_match,
+        lambda: db.get_all_tags_for_user(client, email, parsed)
+    )
 
 
 @app.get("/api/tags/{email}/{tag_name}")
 async def get_tag(email: str, tag_name: str):
     """Get a specific tag"""
     client = get_client()
-    tag = db.get_tag(client, email, tag_name)
+    tag = await db.get_tag(client, email, tag_name)
     if tag is None:
         raise HTTPException(status_code=404, detail="Tag not found")
-    if "_id" in tag:
-        tag["_id"] = str(tag["_id"])
-    return tag
+    return MongoJSONResponse(tag)
 
 
 @app.get("/api/tags/{email}/{tag_name}/description")
 async def get_tag_description(email: str, tag_name: str):
     """Get tag description"""
     client = get_client()
-    description = db.get_tag_description(client, email, tag_name)
+    description = await db.get_tag_description(client, email, tag_name)
     if description is None:
         raise HTTPException(status_code=404, detail="Tag not found or no description")
     return {"tag_description": description}
@@ -415,7 +580,7 @@ async def get_tag_description(email: str, tag_name: str):
 async def create_tag(tag: TagCreate):
     """Create or update a tag"""
     client = get_client()
-    result = db.set_tag(client, tag.email, tag.tag_name, tag.tag_description)
+    result = await db.set_tag(client, tag.email, tag.tag_name, tag.tag_description)
     if not result:
         raise HTTPException(status_code=500, detail="Failed to create tag")
     return {"message": "Tag created successfully", "tag_name": tag.tag_name}
@@ -425,7 +590,7 @@ async def create_tag(tag: TagCreate):
 async def update_tag_description(email: str, tag_name: str, update: TagDescriptionUpdate):
     """Update tag description"""
     client = get_client()
-    result = db.set_tag_description(client, email, tag_name, update.tag_description)
+    result = await db.set_tag_description(client, email, tag_name, update.tag_description)
     if not result:
         raise HTTPException(status_code=500, detail="Failed to update tag description")
     return {"message": "Tag description updated successfully"}
@@ -435,7 +600,7 @@ async def update_tag_description(email: str, tag_name: str, update: TagDescripti
 async def delete_tag(email: str, tag_name: str):
     """Delete a tag"""
     client = get_client()
-    result = db.delete_tag(client, email, tag_name)
+    result = await db.delete_tag(client, email, tag_name)
     if not result:
         raise HTTPException(status_code=404, detail="Tag not found")
     return {"message": "Tag deleted successfully"}
@@ -505,22 +670,18 @@ async def get_stocks():
 async def get_pad(email: str, pad_id: str):
     """Get a specific pad by email and pad_id"""
     client = get_client()
-    pad = db.get_pad(client, email, pad_id)
+    pad = await db.get_pad(client, email, pad_id)
     if pad is None:
         # Default empty pad if it doesn't exist yet
         return {"email": email, "pad_id": pad_id, "information": ""}
-    
-    # ensure we don't return the raw ObjectId
-    if "_id" in pad:
-        pad["_id"] = str(pad["_id"])
-    return pad
+    return MongoJSONResponse(pad)
 
 
 @app.post("/api/pads")
 async def set_pad(pad: Pad):
     """Create or update a pad"""
     client = get_client()
-    success = db.set_pad(client, pad.email, pad.pad_id, pad.information)
+    success = await db.set_pad(client, pad.email, pad.pad_id, pad.information)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to save pad")
     return {"message": "Pad saved successfully"}
@@ -531,33 +692,29 @@ async def set_pad(pad: Pad):
 # =============================================================================
 
 @app.get("/api/projects/{email}")
-async def get_projects(email: str):
-    """Get all projects for a user"""
+async def get_projects(email: str, if_none_match: Optional[str] = Header(None)):
+    """Get all projects for a user (ETag / If-None-Match aware)"""
     client = get_client()
-    projects = db.get_all_projects_for_user(client, email)
-    # Serialize MongoDB objects
-    for proj in projects:
-        if "_id" in proj:
-            proj["_id"] = str(proj["_id"])
-    return projects
+    return await cached_listing(
+        email, "projects", "", if_none_match,
+        lambda: db.get_all_projects_for_user(client, email)
+    )
 
 @app.get("/api/projects/{email}/{project_id}")
 async def get_project(email: str, project_id: str):
     """Get a specific project by ID"""
     client = get_client()
-    project = db.get_project(client, email, project_id)
+    project = await db.get_project(client, email, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    if "_id" in project:
-        project["_id"] = str(project["_id"])
-    return project
+    return MongoJSONResponse(project)
 
 @app.post("/api/projects")
 async def set_project(project: ProjectCreate):
     """Create or update a project"""
     client = get_client()
     tasks_dict = [t.dict() for t in project.tasks]
-    success = db.set_project(
+    success = await db.set_project(
         client, 
         project.email, 
         project.project_id, 
@@ -575,7 +732,7 @@ async def set_project(project: ProjectCreate):
 async def delete_project(email: str, project_id: str):
     """Delete a project"""
     client = get_client()
-    success = db.delete_project(client, email, project_id)
+    success = await db.delete_project(client, email, project_id)
     if not success:
         raise HTTPException(status_code=404, detail="Project not found or already deleted")
     return {"message": "Project deleted successfully"}
@@ -651,7 +808,7 @@ Return only the structured task list."""
 async def get_settings(email: str):
     """Get user settings"""
     client = get_client()
-    settings = db.get_settings(client, email)
+    settings = await db.get_settings(client, email)
     return settings
 
 
@@ -663,7 +820,7 @@ async def set_settings(settings: Dict[str, Any]):
     if not email:
         raise HTTPException(status_code=400, detail="Email is required")
     
-    success = db.set_settings(client, email, settings)
+    success = await db.set_settings(client, email, settings)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to save settings")
     return {"message": "Settings saved successfully"}
@@ -674,29 +831,89 @@ async def set_settings(settings: Dict[str, Any]):
 # ============================================================================
 
 @app.get("/api/tasks")
-async def get_all_tasks():
-    """Get all tasks"""
+async def get_all_tasks(
+    fields: Optional[str] = Query(None),
+    after: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    stream: bool = Query(False)
+):
+    """
+    Get all tasks. Optional ?fields=a,b limits the returned columns.
+    Supports ?after=<_id>&limit= paging and ?stream=true NDJSON output.
+    """
     client = get_client()
-    tasks = db.get_all_tasks(client)
-    return [serialize_task(task) for task in tasks]
+    try:
+        cursor = db.iter_all_tasks(client, parse_fields(fields), after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await listing_response(cursor, limit, stream)
 
 
 @app.get("/api/tasks/{email}")
-async def get_all_tasks_for_user(email: str):
-    """Get all tasks for a specific user"""
+async def get_all_tasks_for_user(
+    email: str,
+    fields: Optional[str] = Query(None),
+    after: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    stream: bool = Query(False),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Get all tasks for a specific user. Optional ?fields=a,b limits the returned columns.
+    Supports ?after=<_id>&limit= paging and ?stream=true NDJSON output.
+    The full (unpaged) list carries an ETag and answers If-None-Match with 304.
+    """
     client = get_client()
-    tasks = db.get_all_tasks_for_user(client, email)
-    return [serialize_task(task) for task in tasks]
+    if not (after or limit or stream):
+        parsed = parse_fields(fields)
+        return await cached_listing(
+            email, "tasks", ",".join(parsed or []), if_none_match,
+            lambda: db.get_all_tasks_for_user(client, email, parsed)
+        )
+    try:
+        cursor = db.iter_tasks_for_user(client, email, parse_fields(fields), after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await listing_response(cursor, limit, stream)
+
+
+# Registered before /api/tasks/{email}/{title} so "changes" and "range" aren't taken as titles
+@app.get("/api/tasks/{email}/changes")
+async def get_task_changes(email: str, since: int = Query(0, ge=0)):
+    """
+    Delta sync: tasks created/updated since the cursor plus tombstones for deleted ones.
+    Start with since=0 (a full sync) and pass the returned cursor on the next call;
+    call again straight away while has_more is true.
+    """
+    client = get_client()
+    return MongoJSONResponse(await db.get_task_changes(client, email, since))
+
+
+@app.get("/api/tasks/{email}/range")
+async def get_tasks_in_range(
+    email: str,
+    start: datetime = Query(...),
+    end: datetime = Query(...),
+    fields: Optional[str] = Query(None)
+):
+    """
+    Get a user's tasks overlapping the [start, end) window (calendar views).
+    Optional ?fields=a,b limits the returned columns.
+    """
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    client = get_client()
+    return MongoJSONResponse(await db.get_tasks_in_range(client, email, start, end, parse_fields(fields)))
 
 
 @app.get("/api/tasks/{email}/{title}")
 async def get_task(email: str, title: str):
     """Get a specific task by Title (Legacy)"""
     client = get_client()
-    task = db.get_task_by_title(client, email, title)
+    task = await db.get_task_by_title(client, email, title)
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    return serialize_task(task)
+    return MongoJSONResponse(task)
 
 
 @app.get("/api/tasks/by-id/{task_id}")
@@ -704,10 +921,10 @@ async def get_task_by_id(task_id: str):
     """Get a task by MongoDB ObjectId"""
     client = get_client()
     try:
-        task = db.get_task_by_id(client, task_id)
+        task = await db.get_task_by_id(client, task_id)
         if task is None:
             raise HTTPException(status_code=404, detail="Task not found")
-        return serialize_task(task)
+        return MongoJSONResponse(task)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid task ID: {str(e)}")
 
@@ -720,7 +937,7 @@ async def get_task_description(email: str, title: str):
     # Actually, get_task_description wasn't updated in previous step to check title? Let's check db.py
     # Ah, I missed updating get_task_description, get_task_tags in db.py in the previous step...
     # I should update main.py assuming db.py handles it, and verify db.py later.
-    description = db.get_task_description(client, email, title)
+    description = await db.get_task_description(client, email, title)
     if description is None:
         raise HTTPException(status_code=404, detail="Task not found or no description")
     return {"description": description}
@@ -730,18 +947,17 @@ async def get_task_description(email: str, title: str):
 async def get_task_tags(email: str, title: str):
     """Get task tags by title"""
     client = get_client()
-    tags = db.get_task_tags(client, email, title)
+    tags = await db.get_task_tags(client, email, title)
     if tags is None:
         raise HTTPException(status_code=404, detail="Task not found")
     return {"tag_names": tags}
 
 
 @app.get("/api/tasks/by-tag/{email}/{tag_name}")
-async def get_tasks_by_tag(email: str, tag_name: str):
-    """Get all tasks for a user with a specific tag"""
+async def get_tasks_by_tag(email: str, tag_name: str, fields: Optional[str] = Query(None)):
+    """Get all tasks for a user with a specific tag. Optional ?fields=a,b limits the returned columns."""
     client = get_client()
-    tasks = db.get_tasks_by_tag(client, email, tag_name)
-    return [serialize_task(task) for task in tasks]
+    return MongoJSONResponse(await db.get_tasks_by_tag(client, email, tag_name, parse_fields(fields)))
 
 
 
@@ -755,44 +971,8 @@ async def create_task(task: TaskCreate, background_tasks: BackgroundTasks):
     #     delta = task.end_time - task.start_time
     #     task.duration = int(delta.total_seconds() / 60) # minutes
 
-    # Parse start_time string to datetime if provided
-    start_time_dt = None
-    if task.start_time is not None:
-        try:
-            # Handle ISO string with potential Z suffix
-            clean_time = str(task.start_time).replace('Z', '+00:00')
-            start_time_dt = datetime.fromisoformat(clean_time)
-        except Exception as e:
-            print(f"Error parsing start_time: {e}")
-            # Fallback to current time or keep as None? 
-            # If user sent bad time, maybe None is better or error.
-            # For now, let's allow it to fail to None if critical
-            pass
-
-    success = db.set_task(
-        client, 
-        task.email, 
-        task.title, 
-        task.task_client_id,
-        task.description, 
-        task.tag_names, 
-        start_time_dt, 
-        task.duration,
-        task.estimated_cost,
-        task.recurrence,
-        task.is_completed,
-        flowbot_suggest_duration=task.flowbot_suggest_duration,
-        flowbot_suggest_cost=task.flowbot_suggest_cost,
-        actual_duration=task.actual_duration,
-        actual_cost=task.actual_cost,
-        color=task.color,
-        ai_estimation_status=task.ai_estimation_status,
-        ai_time_estimation=task.ai_time_estimation,
-        ai_cost_estimation=task.ai_cost_estimation,
-        ai_recommendation=task.ai_recommendation,
-        ai_reasoning=task.ai_reasoning,
-        ai_confidence=task.ai_confidence
-    )
+    # A bad start_time is dropped (None) rather than rejected
+    success = await db.set_task(client, **task_create_kwargs(task))
     if not success:
         raise HTTPException(status_code=500, detail="Failed to create task")
     
@@ -814,6 +994,41 @@ async def create_task(task: TaskCreate, background_tasks: BackgroundTasks):
     return {"message": "Task created successfully", "title": task.title}
 
 
+@app.post("/api/tasks/bulk")
+async def create_tasks_bulk(payload: TaskBulkCreate, background_tasks: BackgroundTasks):
+    """
+    Create or update many tasks in one bulk write (imports, project conversions, multi-select drags).
+    Returns a per-item status: created, updated, error or skipped (ordered writes stop at the first error).
+    """
+    client = get_client()
+    results = await db.set_tasks_bulk(
+        client,
+        [task_create_kwargs(task) for task in payload.tasks],
+        ordered=payload.ordered
+    )
+
+    # Run AI estimation in background for written tasks that asked for it
+    for task, result in zip(payload.tasks, results):
+        if task.socket_id and result["status"] in ("created", "updated"):
+            from agent_utils import run_agent_background
+            background_tasks.add_task(
+                run_agent_background,
+                task.socket_id,
+                task.task_client_id,
+                task.email,
+                task.title,
+                task.description,
+                task.tag_names or [],
+                task.duration or 30,
+                task.estimated_cost or 0
+            )
+
+    counts = {status_name: 0 for status_name in ("created", "updated", "error", "skipped")}
+    for result in results:
+        counts[result["status"]] += 1
+    return {"message": "Bulk task write complete", **counts, "results": results}
+
+
 @app.patch("/api/tasks/{task_id}")
 async def update_task(task_id: str, updates: TaskUpdate):
     """Update specific fields of a task"""
@@ -835,7 +1050,7 @@ async def update_task(task_id: str, updates: TaskUpdate):
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
         
-    result = db.update_task_fields(client, task_id, update_data)
+    result = await db.update_task_fields(client, task_id, update_data)
     if not result:
         raise HTTPException(status_code=404, detail="Task not found or update failed")
     return {"message": "Task updated successfully"}
@@ -845,7 +1060,7 @@ async def update_task(task_id: str, updates: TaskUpdate):
 async def update_task_description(email: str, title: str, update: TaskDescriptionUpdate):
     """Update task description by title"""
     client = get_client()
-    result = db.set_task_description(client, email, title, update.description)
+    result = await db.set_task_description(client, email, title, update.description)
     if not result:
         raise HTTPException(status_code=500, detail="Failed to update task description")
     return {"message": "Task description updated successfully"}
@@ -855,7 +1070,7 @@ async def update_task_description(email: str, title: str, update: TaskDescriptio
 async def update_task_tags(email: str, title: str, update: TaskTagsUpdate):
     """Update task tags by title (replaces entire tag list)"""
     client = get_client()
-    result = db.set_task_tags(client, email, title, update.tag_names)
+    result = await db.set_task_tags(client, email, title, update.tag_names)
     if not result:
         raise HTTPException(status_code=500, detail="Failed to update task tags")
     return {"message": "Task tags updated successfully"}
@@ -865,7 +1080,7 @@ async def update_task_tags(email: str, title: str, update: TaskTagsUpdate):
 async def add_tag_to_task(email: str, title: str, tag: TaskTagAdd):
     """Add a single tag to a task by title"""
     client = get_client()
-    result = db.add_tag_to_task(client, email, title, tag.tag_name)
+    result = await db.add_tag_to_task(client, email, title, tag.tag_name)
     if not result:
         raise HTTPException(status_code=500, detail="Failed to add tag to task")
     return {"message": "Tag added to task successfully"}
@@ -875,17 +1090,37 @@ async def add_tag_to_task(email: str, title: str, tag: TaskTagAdd):
 async def remove_tag_from_task(email: str, title: str, tag: TaskTagRemove):
     """Remove a single tag from a task by title"""
     client = get_client()
-    result = db.remove_tag_from_task(client, email, title, tag.tag_name)
+    result = await db.remove_tag_from_task(client, email, title, tag.tag_name)
     if not result:
         raise HTTPException(status_code=500, detail="Failed to remove tag from task")
     return {"message": "Tag removed from task successfully"}
 
 
+@app.post("/api/tasks/{task_id}/exceptions/add")
+async def add_recurrence_exception(task_id: str, exception: TaskRecurrenceException):
+    """Skip one occurrence of a recurring task (series_id and occurrence_start from the range read)"""
+    client = get_client()
+    result = await db.add_recurrence_exception(client, task_id, exception.occurrence_start)
+    if not result:
+        raise HTTPException(status_code=404, detail="Recurring task not found")
+    return {"message": "Occurrence removed from series"}
+
+
+@app.delete("/api/tasks/{task_id}/exceptions/remove")
+async def remove_recurrence_exception(task_id: str, exception: TaskRecurrenceException):
+    """Restore a skipped occurrence of a recurring task"""
+    client = get_client()
+    result = await db.remove_recurrence_exception(client, task_id, exception.occurrence_start)
+    if not result:
+        raise HTTPException(status_code=404, detail="Recurring task not found")
+    return {"message": "Occurrence restored to series"}
+
+
 @app.delete("/api/tasks/{email}/{title}")
 async def delete_task(email: str, title: str):
     """Delete a task by title"""
     client = get_client()
-    result = db.delete_task(client, email, title)
+    result = await db.delete_task(client, email, title)
     if not result:
         raise HTTPException(status_code=404, detail="Task not found or update failed")
     return {"message": "Task updated successfully"}
@@ -895,7 +1130,7 @@ async def delete_task(email: str, title: str):
 async def delete_task_by_id(task_id: str):
     """Delete a task by ID"""
     client = get_client()
-    result = db.delete_task_by_id(client, task_id)
+    result = await db.delete_task_by_id(client, task_id)
     if not result:
         raise HTTPException(status_code=404, detail="Task not found")
     return {"message": "Task deleted successfully"}
@@ -969,6 +1204,62 @@ async def agent_retrieve(request: AgentRetrieveRequest):
     }
 
 
+# ============================================================================
+# ANALYTICS
+# ============================================================================
+
+@app.get("/api/analytics/{email}")
+async def get_task_analytics(
+    email: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    tag: Optional[str] = None
+):
+    """
+    Per-tag estimate accuracy (duration / AI estimate / cost) and completion rate for
+    task days in [start, end), read from the incrementally kept rollups.
+    With tag, also returns that tag's per-day series.
+    """
+    if start and end and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    client = get_client()
+    return MongoJSONResponse(await db.get_task_analytics(
+        client, email,
+        start.isoformat() if start else None,
+        end.isoformat() if end else None,
+        tag
+    ))
+
+
+# ============================================================================
+# EMBEDDING CACHE STATS
+# ============================================================================
+
+@app.get("/api/embeddings/stats")
+async def get_embedding_stats():
+    """Hit/miss counters for the shared embedding cache and background queue"""
+    from embedding_service import embedding_service
+    return {**embedding_service.stats(), "queue": embedding_queue.stats()}
+
+
+@app.get("/api/cache/stats")
+async def get_response_cache_stats():
+    """Hit/miss counters for the per-user listing response cache and recurrence expansions"""
+    return {**response_cache.stats(), "recurrence_expansions": expansion_cache.stats()}
+
+
+@app.get("/api/ws/stats")
+async def get_websocket_stats():
+    """Open WebSocket connections, queued/sent/dropped messages, pruned connections, change events and task commands"""
+    return {**manager.stats(), "change_events": change_feed.stats(), "task_commands": task_commands.stats()}
+
+
+@app.get("/api/db/pools")
+async def get_pool_stats():
+    """Connection pool sizes and checkout wait times per MongoDB workload"""
+    return mongo_clients.stats()
+
+
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
@@ -978,7 +1269,7 @@ async def health_check():
     """Health check endpoint"""
     try:
         client = get_client()
-        client.admin.command('ping')
+        await client.admin.command('ping')
         return {
             "status": "healthy",
             "database": "connected"
@@ -0,0 +1,260 @@
+"""
+Shared MongoDB client registry for FlowState.
+
+Every module (API handlers, AI agents, the embedding queue, CLI jobs) gets its
+client from here instead of constructing MongoClient/AsyncIOMotorClient
+itself, so server discovery and the TCP/TLS handshakes happen once per
+process rather than per call.
+
+Clients are kept per workload ("api", "agents", "background", "broker"). Each workload
+has its own connection pool and maxPoolSize, so a burst of agent runs or a
+backfill can't take every connection the API needs. Sync code (the langchain
+vector store, which runs in worker threads) gets its own pymongo client per
+workload, with the same settings, rather than reaching into Motor's.
+
+Pool settings come from the environment and can be overridden per workload:
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS, MONGO_MAX_IDLE_TIME_MS
+    e.g. MONGO_AGENTS_MAX_POOL_SIZE=5 only changes the agents pool.
+
+stats() reports per-workload checkout wait times (how long an operation
+waited for a pooled connection) for sizing the pools under load.
+"""
+
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, fields
+from typing import Any, Deque, Dict, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+
+# Maps PoolSettings fields to MongoClient keyword arguments
+_CLIENT_OPTIONS = {
+    "max_pool_size": "maxPoolSize",
+    "min_pool_size": "minPoolSize",
+    "wait_queue_timeout_ms": "waitQueueTimeoutMS",
+    "server_selection_timeout_ms": "serverSelectionTimeoutMS",
+    "connect_timeout_ms": "connectTimeoutMS",
+    "socket_timeout_ms": "socketTimeoutMS",
+    "max_idle_time_ms": "maxIdleTimeMS",
+}
+
+
+@dataclass
+class PoolSettings:
+    max_pool_size: int = 50
+    min_pool_size: int = 0
+    wait_queue_timeout_ms: Optional[int] = 5000
+    server_selection_timeout_ms: int = 5000
+    connect_timeout_ms: int = 5000
+    socket_timeout_ms: Optional[int] = None
+    max_idle_time_ms: Optional[int] = 300000
+
+    def client_options(self) -> Dict[str, Any]:
+        return {_CLIENT_OPTIONS[name]: value for name, value in self.__dict__.items() if value is not None}
+
+
+# Defaults per workload before environment overrides
+DEFAULT_WORKLOADS: Dict[str, PoolSettings] = {
+    "api": PoolSettings(max_pool_size=100, min_pool_size=5),
+    "agents": PoolSettings(max_pool_size=10, wait_queue_timeout_ms=10000, socket_timeout_ms=60000),
+    "background": PoolSettings(max_pool_size=10, wait_queue_timeout_ms=30000),
+    # The WebSocket broker's tailing cursor holds one connection; the rest are for publishes
+    "broker": PoolSettings(max_pool_size=10),
+}
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+def settings_from_env(workload: str, defaults: PoolSettings) -> PoolSettings:
+    """Applies MONGO_<SETTING> then MONGO_<WORKLOAD>_<SETTING> on top of defaults."""
+    settings = PoolSettings(**defaults.__dict__)
+    for f in fields(PoolSettings):
+        for name in (f"MONGO_{f.name.upper()}", f"MONGO_{workload.upper()}_{f.name.upper()}"):
+            value = _env_int(name)
+            if value is not None:
+                setattr(settings, f.name, value)
+    return settings
+
+
+class PoolMetrics(ConnectionPoolListener):
+    """Connection pool events for one workload's client."""
+
+    def __init__(self, samples: int = 1024):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_timeouts = 0
+        self.checked_out = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.pool_clears = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.recent_waits_ms: Deque[float] = deque(maxlen=samples)
+
+    def _record_wait(self, event):
+        # ConnectionCheckedOutEvent.duration is the time spent in checkout (seconds)
+        duration = getattr(event, "duration", None)
+        if duration is None:
+            return
+        wait_ms = duration * 1000
+        self.wait_total_ms += wait_ms
+        self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+        self.recent_waits_ms.append(wait_ms)
+
+    def connection_checked_out(self, event):
+        with self.lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self._record_wait(event)
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self.checkout_failures += 1
+            if event.reason == "timeout":
+                self.checkout_timeouts += 1
+            self._record_wait(event)
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def connection_created(self, event):
+        with self.lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.connections_closed += 1
+
+    def pool_cleared(self, event):
+        with self.lock:
+            self.pool_clears += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            waits = sorted(self.recent_waits_ms)
+            checkouts = self.checkouts
+
+            def percentile(p: float) -> float:
+                if not waits:
+                    return 0.0
+                return round(waits[min(len(waits) - 1, int(p * len(waits)))], 3)
+
+            return {
+                "checkouts": checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_timeouts": self.checkout_timeouts,
+                "in_use": self.checked_out,
+                "connections_open": self.connections_created - self.connections_closed,
+                "connections_created": self.connections_created,
+                "pool_clears": self.pool_clears,
+                "wait_ms": {
+                    "mean": round(self.wait_total_ms / checkouts, 3) if checkouts else 0.0,
+                    "p50": percentile(0.50),
+                    "p99": percentile(0.99),
+                    "max": round(self.wait_max_ms, 3),
+                },
+            }
+
+
+class MongoClientRegistry:
+    def __init__(self, uri: str = MONGO_URI, workloads: Optional[Dict[str, PoolSettings]] = None):
+        self.uri = uri
+        self.workloads = {
+            name: settings_from_env(name, defaults)
+            for name, defaults in (workloads or DEFAULT_WORKLOADS).items()
+        }
+        self._clients: Dict[str, AsyncIOMotorClient] = {}
+        self._sync_clients: Dict[str, MongoClient] = {}
+        # Per workload, shared by its async and sync clients
+        self._metrics: Dict[str, PoolMetrics] = {}
+        self._lock = threading.Lock()
+
+    def get(self, workload: str = "api") -> AsyncIOMotorClient:
+        """Returns the shared async client for a workload, creating it on first use."""
+        client = self._clients.get(workload)
+        if client is not None:
+            return client
+        if workload not in self.workloads:
+            raise KeyError(f"Unknown MongoDB workload '{workload}'")
+        with self._lock:
+            client = self._clients.get(workload)
+            if client is None:
+                client = self._clients[workload] = self._create(AsyncIOMotorClient, workload)
+        return client
+
+    def get_sync(self, workload: str = "agents") -> MongoClient:
+        """
+        Returns the shared blocking pymongo client for a workload (for worker
+        threads), creating it on first use. It has its own pool with the workload's settings.
+        """
+        client = self._sync_clients.get(workload)
+        if client is not None:
+            return client
+        if workload not in self.workloads:
+            raise KeyError(f"Unknown MongoDB workload '{workload}'")
+        with self._lock:
+            client = self._sync_clients.get(workload)
+            if client is None:
+                client = self._sync_clients[workload] = self._create(MongoClient, workload)
+        return client
+
+    def _create(self, client_class, workload: str):
+        metrics = self._metrics.setdefault(workload, PoolMetrics())
+        return client_class(
+            self.uri,
+            appname=f"flowstate-{workload}",
+            event_listeners=[metrics],
+            **self.workloads[workload].client_options()
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            workload: {
+                "max_pool_size": self.workloads[workload].max_pool_size,
+                "wait_queue_timeout_ms": self.workloads[workload].wait_queue_timeout_ms,
+                **metrics.snapshot(),
+            }
+            for workload, metrics in self._metrics.items()
+        }
+
+    def close(self):
+        with self._lock:
+            for client in [*self._clients.values(), *self._sync_clients.values()]:
+                client.close()
+            self._clients.clear()
+            self._sync_clients.clear()
+            self._metrics.clear()
+
+
+mongo_clients = MongoClientRegistry()
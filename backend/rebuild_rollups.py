@@ -0,0 +1,40 @@
+"""
+Rebuild command for the task analytics rollups.
+
+Task writes keep task_rollups current incrementally; this regenerates them from
+the tasks themselves (see db.rebuild_task_rollups) after a backfill, a bulk
+import that bypassed db.py, or a change to the metrics in rollups.py.
+
+Usage (from backend/):
+    python rebuild_rollups.py                     # every user
+    python rebuild_rollups.py --email a@b.c       # one user
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+
+import db
+from mongo_clients import mongo_clients
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Regenerate task analytics rollups from tasks.")
+    parser.add_argument("--email", help="Only rebuild this user's rollups")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    client = mongo_clients.get("background")
+    started = time.perf_counter()
+    try:
+        await db.ensure_indexes(client)
+        written = await db.rebuild_task_rollups(client, args.email, args.batch_size)
+    finally:
+        mongo_clients.close()
+    print(f"✓ Rebuilt {written} rollup documents in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
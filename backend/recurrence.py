@@ -0,0 +1,167 @@
+"""
+Recurrence expansion for FlowState tasks.
+
+A task's `recurrence` is either one of the shorthands the calendar UI stores
+("daily", "weekly", "monthly", "yearly") or an RFC 5545 rule such as
+"RRULE:FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20260601T000000Z" (EXDATE/RDATE lines
+are allowed too). The task's start_time is the DTSTART of the series and its
+duration applies to every occurrence. `recurrence_exceptions` lists occurrence
+start times that were removed from the series.
+
+Occurrences are produced lazily by iter_occurrences() for a [start, end)
+window; expanded windows are memoized per (task, window) by ExpansionCache.
+Cached windows are checked against the task's schedule fields on every read,
+so an edit is never served stale, and db drops them when exceptions change.
+All datetimes are naive UTC, like the ones Motor returns.
+"""
+
+from collections import OrderedDict
+from itertools import islice
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dateutil.rrule import rruleset, rrulestr
+
+SHORTHANDS = {
+    "daily": "FREQ=DAILY",
+    "weekly": "FREQ=WEEKLY",
+    "monthly": "FREQ=MONTHLY",
+    "yearly": "FREQ=YEARLY",
+}
+NON_RECURRING = (None, "", "none")
+# Fields a series document needs for expansion
+RECURRENCE_FIELDS = ("start_time", "duration", "recurrence", "recurrence_exceptions")
+# Per task and window, so a minutely rule over a year can't blow up a response
+MAX_OCCURRENCES = 1000
+
+
+def is_recurring(task: Dict[str, Any]) -> bool:
+    return task.get("recurrence") not in NON_RECURRING and isinstance(task.get("start_time"), datetime)
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_rule(recurrence: str, dtstart: datetime, exceptions: Optional[List[datetime]] = None) -> Tuple[rruleset, bool]:
+    """
+    Builds the rule set for a recurrence string starting at dtstart.
+    Returns (rules, aware): aware rule sets take and yield UTC-aware datetimes.
+    Raises ValueError if the string isn't a shorthand or a valid RRULE.
+    """
+    text = SHORTHANDS.get(recurrence.strip().lower(), recurrence.strip())
+    dtstart = to_naive_utc(dtstart)
+    try:
+        try:
+            # Rules written in UTC (UNTIL=...Z, EXDATE:...Z) need an aware DTSTART
+            rules, aware = rrulestr(text, dtstart=dtstart.replace(tzinfo=timezone.utc), forceset=True), True
+        except ValueError:
+            # Floating times (UNTIL without Z) need a naive one
+            rules, aware = rrulestr(text, dtstart=dtstart, forceset=True), False
+    except Exception as e:
+        raise ValueError(f"Invalid recurrence rule {recurrence!r}: {e}") from e
+    for exception in exceptions or []:
+        exception = to_naive_utc(exception)
+        rules.exdate(exception.replace(tzinfo=timezone.utc) if aware else exception)
+    return rules, aware
+
+
+def iter_occurrences(task: Dict[str, Any], start: datetime, end: datetime) -> Iterator[datetime]:
+    """
+    Lazily yields the start times of a task's occurrences that overlap [start, end),
+    in order. A task whose rule can't be parsed yields its single start_time.
+    """
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    dtstart = to_naive_utc(task["start_time"])
+    duration = timedelta(minutes=task.get("duration") or 0)
+    try:
+        rules, aware = parse_rule(task["recurrence"], dtstart, task.get("recurrence_exceptions"))
+    except ValueError as e:
+        print(f"Warning: {e}; treating task {task.get('_id')} as a one-off")
+        if dtstart < end and (dtstart >= start or dtstart + duration > start):
+            yield dtstart
+        return
+
+    # First occurrence that can still overlap the window
+    first = start - duration
+    if aware:
+        first = first.replace(tzinfo=timezone.utc)
+    for occurrence in rules.xafter(first, inc=duration == timedelta(0)):
+        occurrence = to_naive_utc(occurrence)
+        if occurrence >= end:
+            return
+        yield occurrence
+
+
+def _signature(task: Dict[str, Any]) -> Tuple:
+    """Everything the expansion depends on; any edit to these invalidates cached windows."""
+    return (
+        task.get("recurrence"),
+        task.get("start_time"),
+        task.get("duration") or 0,
+        tuple(task.get("recurrence_exceptions") or ()),
+    )
+
+
+class ExpansionCache:
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        # (task _id, start, end) -> (signature, occurrence starts), most recently used last
+        self._entries: "OrderedDict[Tuple, Tuple[Tuple, List[datetime]]]" = OrderedDict()
+        self.counters: Dict[str, int] = {"hits": 0, "misses": 0}
+
+    def occurrences(self, task: Dict[str, Any], start: datetime, end: datetime) -> List[datetime]:
+        """Returns iter_occurrences() for the window, reusing it while the task's schedule is unchanged."""
+        key = (task["_id"], to_naive_utc(start), to_naive_utc(end))
+        signature = _signature(task)
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] == signature:
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return cached[1]
+
+        self.counters["misses"] += 1
+        occurrences = list(islice(iter_occurrences(task, start, end), MAX_OCCURRENCES))
+        self._entries[key] = (signature, occurrences)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return occurrences
+
+    def invalidate(self, task_id: Any = None):
+        """Drops cached windows for one task (or all tasks)."""
+        if task_id is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[0] == task_id]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "entries": len(self._entries)}
+
+
+def occurrence_id(series_id: Any, occurrence: datetime) -> str:
+    """Synthetic _id of one occurrence: "<series id>:<occurrence start, as sent in JSON>"."""
+    return f"{series_id}:{occurrence.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+
+
+def expand_task(task: Dict[str, Any], occurrences: List[datetime]) -> Iterator[Dict[str, Any]]:
+    """
+    Yields one document per occurrence: the series document with start_time set
+    to the occurrence and its own _id (occurrence_id), so clients keying on _id
+    see each occurrence. series_id is the series document's _id (for edits), and
+    occurrence_start identifies the occurrence (e.g. to add it to recurrence_exceptions).
+    """
+    for occurrence in occurrences:
+        yield {
+            **task,
+            "_id": occurrence_id(task["_id"], occurrence),
+            "series_id": task["_id"],
+            "start_time": occurrence,
+            "occurrence_start": occurrence,
+        }
+
+
+expansion_cache = ExpansionCache()
@@ -0,0 +1,196 @@
+"""
+Bulk re-embed / backfill command for FlowState.
+
+Streams through tasks and tags in _id order, finds vectors that are missing or
+stale (embedding_source_hash/embedding_model don't match the current text and
+model) and re-embeds them in large batches with bounded concurrency.
+Progress is checkpointed per collection so an interrupted run resumes where it
+stopped.
+
+Usage (from backend/):
+    python reembed.py                       # tasks and tags
+    python reembed.py --collections tags --batch-size 500 --concurrency 8
+    python reembed.py --dry-run             # only count stale vectors
+    python reembed.py --reset               # ignore the saved checkpoint
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+import db
+from embedding_service import embedding_service
+from mongo_clients import mongo_clients
+
+DEFAULT_CHECKPOINT = "reembed_checkpoint.json"
+
+# Fields that feed the embedding text, used to guard writes against concurrent edits
+SOURCE_FIELDS = {
+    "tasks": ["title", "description"],
+    "tags": ["tag_description"],
+}
+FRESHNESS_FIELDS = ["embedding_source_hash", "embedding_model", "embedding_pending_hash"]
+
+
+def load_checkpoint(path: str) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, str]):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+class CollectionReembedder:
+    """Re-embeds one collection, advancing the checkpoint only past fully written batches."""
+
+    def __init__(self, client: AsyncIOMotorClient, collection_name: str, args: argparse.Namespace, checkpoint: Dict[str, str]):
+        self.database = client[db.DB_NAME]
+        self.collection_name = collection_name
+        self.collection = self.database[collection_name]
+        self.args = args
+        self.checkpoint = checkpoint
+        self.semaphore = asyncio.Semaphore(args.concurrency)
+        # Batches in dispatch order: [last_id, done]
+        self.in_order: List[List[Any]] = []
+        self.scanned = 0
+        self.stale = 0
+        self.written = 0
+        self.failed = 0
+
+    def _advance_checkpoint(self):
+        advanced = False
+        while self.in_order and self.in_order[0][1]:
+            last_id, _ = self.in_order.pop(0)
+            self.checkpoint[self.collection_name] = str(last_id)
+            advanced = True
+        if advanced and not self.args.dry_run:
+            save_checkpoint(self.args.checkpoint, self.checkpoint)
+
+    async def _embed_batch(self, docs: List[Dict[str, Any]], texts: List[str], marker: List[Any]):
+        try:
+            vectors = await embedding_service.embed_many(self.database, texts)
+            operations = []
+            for doc, text, vector in zip(docs, texts, vectors):
+                if vector is None:
+                    continue
+                guard = {"_id": doc["_id"]}
+                for field in SOURCE_FIELDS[self.collection_name]:
+                    guard[field] = doc.get(field)
+                operations.append(UpdateOne(guard, {
+                    "$set": {
+                        "embedding": vector,
+                        "embedding_status": "ready",
+                        "embedding_source_hash": embedding_service.cache_key(text),
+                        "embedding_model": embedding_service.model
+                    },
+                    "$unset": {"embedding_pending_hash": ""}
+                }))
+            if operations:
+                result = await self.collection.bulk_write(operations, ordered=False)
+                self.written += result.modified_count
+        except Exception as e:
+            self.failed += len(docs)
+            print(f"  [{self.collection_name}] batch ending {marker[0]} failed: {e}")
+            raise
+        finally:
+            self.semaphore.release()
+        marker[1] = True
+        self._advance_checkpoint()
+
+    async def run(self):
+        query: Dict[str, Any] = {}
+        resume_from = None if self.args.reset else self.checkpoint.get(self.collection_name)
+        if resume_from:
+            query["_id"] = {"$gt": ObjectId(resume_from)}
+            print(f"[{self.collection_name}] resuming after {resume_from}")
+
+        projection = {field: 1 for field in SOURCE_FIELDS[self.collection_name] + FRESHNESS_FIELDS}
+        cursor = self.collection.find(query, projection).sort("_id", 1).batch_size(self.args.batch_size)
+
+        pending_tasks = []
+        docs: List[Dict[str, Any]] = []
+        texts: List[str] = []
+
+        async def flush(last_id):
+            marker = [last_id, False]
+            self.in_order.append(marker)
+            if self.args.dry_run or not docs:
+                marker[1] = True
+                self._advance_checkpoint()
+                return
+            await self.semaphore.acquire()
+            pending_tasks.append(asyncio.create_task(self._embed_batch(list(docs), list(texts), marker)))
+
+        scanned_in_batch = 0
+        last_id = None
+        async for doc in cursor:
+            self.scanned += 1
+            scanned_in_batch += 1
+            last_id = doc["_id"]
+            text = db.embedding_text_for(self.collection_name, doc)
+            if not db.embedding_is_fresh(doc, text):
+                self.stale += 1
+                docs.append(doc)
+                texts.append(text)
+            if len(docs) >= self.args.batch_size or scanned_in_batch >= self.args.batch_size * 10:
+                await flush(last_id)
+                docs.clear()
+                texts.clear()
+                scanned_in_batch = 0
+        if last_id is not None and (docs or scanned_in_batch):
+            await flush(last_id)
+
+        results = await asyncio.gather(*pending_tasks, return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        print(
+            f"[{self.collection_name}] scanned={self.scanned} stale={self.stale} "
+            f"written={self.written} failed={self.failed}"
+        )
+        return not errors
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-embed missing or stale task/tag vectors.")
+    parser.add_argument("--collections", default="tasks,tags", help="Comma separated: tasks,tags")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=4, help="Embedding batches in flight at once")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--reset", action="store_true", help="Start from the beginning")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many vectors are stale")
+    args = parser.parse_args(argv)
+
+    collections = [c.strip() for c in args.collections.split(",") if c.strip()]
+    unknown = [c for c in collections if c not in SOURCE_FIELDS]
+    if unknown:
+        parser.error(f"Unknown collections: {', '.join(unknown)}")
+
+    checkpoint = {} if args.reset else load_checkpoint(args.checkpoint)
+    client = mongo_clients.get("background")
+    ok = True
+    try:
+        for collection_name in collections:
+            ok = await CollectionReembedder(client, collection_name, args, checkpoint).run() and ok
+    finally:
+        mongo_clients.close()
+
+    if ok and not args.dry_run and os.path.exists(args.checkpoint):
+        # Completed cleanly; the next run starts over
+        os.remove(args.checkpoint)
+    print(f"Embedding cache: {embedding_service.stats()}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,92 @@
+"""
+In-process cache of serialized per-user listing responses.
+
+Entries are keyed by (email, listing, variant) and remember the user's data
+version (db.get_data_version) they were built at, so a body is only reused
+while nothing the user owns has changed. Only the newest version of each
+listing is kept, and the cache is bounded by entry count and total bytes.
+
+Identical concurrent misses (same key and version) share one build, so a burst
+of refetches after a write costs a single Mongo query.
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # (email, listing, variant) -> (version, body), most recently used last
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[int, bytes]]" = OrderedDict()
+        self._bytes = 0
+        # (email, listing, variant, version) -> future for builds already running
+        self._in_flight: Dict[Tuple[str, str, str, int], asyncio.Future] = {}
+        self.counters: Dict[str, int] = {"hits": 0, "misses": 0, "collapsed": 0, "evictions": 0}
+
+    def _store(self, key: Tuple[str, str, str], version: int, body: bytes):
+        current = self._entries.get(key)
+        if current is not None:
+            if current[0] > version:
+                # A newer build already landed
+                return
+            self._bytes -= len(current[1])
+        if len(body) > self.max_bytes:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (version, body)
+        self._entries.move_to_end(key)
+        self._bytes += len(body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.counters["evictions"] += 1
+
+    async def get_or_build(
+        self,
+        email: str,
+        listing: str,
+        variant: str,
+        version: int,
+        build: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        """Returns the cached body for this version, or builds (and caches) it once."""
+        key = (email, listing, variant)
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] == version:
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return cached[1]
+
+        flight_key = (*key, version)
+        if flight_key in self._in_flight:
+            self.counters["collapsed"] += 1
+            return await asyncio.shield(self._in_flight[flight_key])
+
+        self.counters["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[flight_key] = future
+        try:
+            body = await build()
+            self._store(key, version, body)
+            future.set_result(body)
+            return body
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a build nobody else waited on doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[flight_key]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "entries": len(self._entries), "bytes": self._bytes}
+
+
+response_cache = ResponseCache()
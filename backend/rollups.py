@@ -0,0 +1,142 @@
+"""
+Per-user, per-tag, per-day task rollups for FlowState analytics.
+
+Every task carries a `rollup` snapshot of what it last contributed:
+{email, tags, day, metrics}. After a write, db compares the task's current
+snapshot with the stored one and applies the difference to the task_rollups
+documents keyed by (email, tag, day) with $inc, so analytics reads never scan
+tasks. A task with several tags counts once under each of them; untagged tasks
+roll up under tag None and tasks without a start_time under day None.
+
+Metrics (all sums, so they can be $inc'd and added across days):
+- tasks, completed, duration (planned minutes)
+- timed, timed_duration, timed_actual, duration_error: tasks with an
+  actual_duration, their planned and actual minutes and sum |actual - planned|
+- ai_timed, ai_estimate, ai_actual, ai_error: the same for ai_time_estimation
+- estimated_cost, actual_cost, cost_error
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+METRICS = (
+    "tasks", "completed", "duration",
+    "timed", "timed_duration", "timed_actual", "duration_error",
+    "ai_timed", "ai_estimate", "ai_actual", "ai_error",
+    "estimated_cost", "actual_cost", "cost_error",
+)
+
+# Task fields a snapshot is computed from
+SOURCE_FIELDS = (
+    "email", "tag_names", "start_time", "duration", "is_completed",
+    "actual_duration", "ai_time_estimation", "estimated_cost", "actual_cost",
+)
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def task_metrics(task: Dict[str, Any]) -> Dict[str, float]:
+    """What one task adds to each of its rollups (zero metrics are left out)."""
+    duration = _number(task.get("duration")) or 0
+    actual = _number(task.get("actual_duration"))
+    ai = _number(task.get("ai_time_estimation"))
+    estimated_cost = _number(task.get("estimated_cost")) or 0
+    actual_cost = _number(task.get("actual_cost")) or 0
+
+    metrics = {
+        "tasks": 1,
+        "completed": 1 if task.get("is_completed") else 0,
+        "duration": duration,
+        "estimated_cost": estimated_cost,
+        "actual_cost": actual_cost,
+        "cost_error": abs(actual_cost - estimated_cost),
+    }
+    if actual is not None:
+        metrics.update(timed=1, timed_duration=duration, timed_actual=actual, duration_error=abs(actual - duration))
+        if ai is not None:
+            metrics.update(ai_timed=1, ai_estimate=ai, ai_actual=actual, ai_error=abs(actual - ai))
+    # Fixed key order: snapshots are compared as embedded documents
+    return {name: metrics[name] for name in METRICS if metrics.get(name)}
+
+
+def task_day(task: Dict[str, Any]) -> Optional[str]:
+    start_time = task.get("start_time")
+    return start_time.strftime("%Y-%m-%d") if isinstance(start_time, datetime) else None
+
+
+def snapshot(task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The rollup snapshot for a task's current fields, or None if it has no owner."""
+    if not task.get("email"):
+        return None
+    tags = sorted({tag for tag in task.get("tag_names") or [] if tag})
+    return {
+        "email": task["email"],
+        "tags": tags or [None],
+        "day": task_day(task),
+        "metrics": task_metrics(task),
+    }
+
+
+RollupKey = Tuple[str, Optional[str], Optional[str]]
+
+
+def delta(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[RollupKey, Dict[str, float]]:
+    """$inc amounts per (email, tag, day) that move the rollups from old to new."""
+    changes: Dict[RollupKey, Dict[str, float]] = {}
+    for sign, snap in ((-1, old), (1, new)):
+        if not snap:
+            continue
+        for tag in snap["tags"]:
+            amounts = changes.setdefault((snap["email"], tag, snap["day"]), {})
+            for name, value in snap["metrics"].items():
+                amounts[name] = amounts.get(name, 0) + sign * value
+    return {
+        key: {name: value for name, value in amounts.items() if value}
+        for key, amounts in changes.items()
+        if any(amounts.values())
+    }
+
+
+def merge(into: Dict[RollupKey, Dict[str, float]], changes: Dict[RollupKey, Dict[str, float]]) -> Dict[RollupKey, Dict[str, float]]:
+    """Adds the delta changes into into (in place), so several tasks' deltas go out as one batch."""
+    for key, amounts in changes.items():
+        total = into.setdefault(key, {})
+        for name, value in amounts.items():
+            total[name] = total.get(name, 0) + value
+    return into
+
+
+def _ratio(numerator: float, denominator: float) -> Optional[float]:
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def summarize(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Adds up rollup rows and derives completion rate and estimate accuracy."""
+    totals = {name: 0 for name in METRICS}
+    for row in rows:
+        for name in METRICS:
+            totals[name] += row.get(name) or 0
+    return {
+        **totals,
+        "completion_rate": _ratio(totals["completed"], totals["tasks"]),
+        # Mean absolute error (minutes) and actual/planned ratio over tasks with an actual_duration
+        "duration_mae": _ratio(totals["duration_error"], totals["timed"]),
+        "duration_ratio": _ratio(totals["timed_actual"], totals["timed_duration"]),
+        "ai_mae": _ratio(totals["ai_error"], totals["ai_timed"]),
+        "ai_ratio": _ratio(totals["ai_actual"], totals["ai_estimate"]),
+        "cost_mae": _ratio(totals["cost_error"], totals["tasks"]),
+        "cost_ratio": _ratio(totals["actual_cost"], totals["estimated_cost"]),
+    }
+
+
+def group_rows(rows: List[Dict[str, Any]], field: str) -> List[Dict[str, Any]]:
+    """Summaries per value of field ("tag" or "day"), in order of that value."""
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(row.get(field), []).append(row)
+    ordered = sorted(groups, key=lambda value: (value is None, value or ""))
+    return [{field: value, **summarize(groups[value])} for value in ordered]
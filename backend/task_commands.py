@@ -0,0 +1,163 @@
+"""
+Task commands over the WebSocket (request/response RPC).
+
+Calendar drags and resizes send a burst of updates for one task. Over REST
+each one is a PATCH and a full update_task_fields write; over the open
+socket they are frames:
+
+    -> {"type": "rpc", "id": "<correlation id>", "method": "task.move",
+        "params": {"task_id": ..., "start_time": "2024-01-01T09:00:00Z", "tag_names": [...]}}
+    <- {"type": "rpc_result", "id": "<correlation id>", "ok": true,
+        "result": {"task_id": ..., "coalesced": 3}}
+    <- {"type": "rpc_result", "id": ..., "ok": false, "error": {"code": "invalid_params", "message": ...}}
+
+Methods: task.move (start_time, optional tag_names), task.resize (duration)
+and task.complete (is_completed).
+
+Commands for the same task are merged for a debounce window (from the first
+one, WS_COMMAND_DEBOUNCE_MS): later fields win and one write stores the final
+state. Every command in the window is answered when that write completes,
+with how many commands it covered.
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type
+
+from pydantic import BaseModel, Field, ValidationError
+
+DEBOUNCE = float(os.getenv("WS_COMMAND_DEBOUNCE_MS", "150")) / 1000
+
+# write(task_id, updates) -> whether the task was written
+Write = Callable[[str, Dict[str, Any]], Awaitable[bool]]
+
+
+class TaskMove(BaseModel):
+    task_id: str
+    start_time: datetime
+    tag_names: Optional[List[str]] = None
+
+
+class TaskResize(BaseModel):
+    task_id: str
+    duration: int = Field(..., gt=0)
+
+
+class TaskComplete(BaseModel):
+    task_id: str
+    is_completed: bool
+
+
+METHODS: Dict[str, Type[BaseModel]] = {
+    "task.move": TaskMove,
+    "task.resize": TaskResize,
+    "task.complete": TaskComplete,
+}
+
+
+class CommandError(Exception):
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+@dataclass
+class PendingWrite:
+    future: asyncio.Future
+    updates: Dict[str, Any] = field(default_factory=dict)
+    commands: int = 0
+
+
+class TaskCommands:
+    def __init__(self, debounce: float = DEBOUNCE):
+        self.debounce = debounce
+        self._write: Optional[Write] = None
+        # task_id -> updates waiting for the end of its window
+        self._pending: Dict[str, PendingWrite] = {}
+        self._flushes: set = set()
+        self.counters: Dict[str, int] = {"commands": 0, "writes": 0, "coalesced": 0, "errors": 0}
+
+    def start(self, write: Write):
+        self._write = write
+
+    async def stop(self):
+        """Writes whatever is still waiting for its window."""
+        for task_id in list(self._pending):
+            await self._flush(task_id)
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def handle(self, frame: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs one rpc frame and returns its rpc_result reply."""
+        reply: Dict[str, Any] = {"type": "rpc_result", "id": frame.get("id")}
+        try:
+            result = await self.call(frame.get("method"), frame.get("params") or {})
+        except CommandError as e:
+            self.counters["errors"] += 1
+            return {**reply, "ok": False, "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:
+            self.counters["errors"] += 1
+            print(f"✗ Task command {frame.get('method')} failed: {e}")
+            return {**reply, "ok": False, "error": {"code": "internal", "message": "Command failed"}}
+        return {**reply, "ok": True, "result": result}
+
+    async def call(self, method: Optional[str], params: Dict[str, Any]) -> Dict[str, Any]:
+        model = METHODS.get(method)
+        if model is None:
+            raise CommandError("unknown_method", f"Unknown method '{method}'")
+        if self._write is None:
+            raise CommandError("unavailable", "Task commands are not available")
+        try:
+            command = model(**params)
+        except (TypeError, ValidationError) as e:
+            raise CommandError("invalid_params", str(e))
+        self.counters["commands"] += 1
+        updates = command.model_dump(exclude={"task_id"}, exclude_none=True)
+        return await self.submit(command.task_id, updates)
+
+    async def submit(self, task_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Merges updates into the task's pending write and waits for that write."""
+        pending = self._pending.get(task_id)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = self._pending[task_id] = PendingWrite(loop.create_future())
+            loop.call_later(self.debounce, self._schedule_flush, task_id, pending)
+        else:
+            self.counters["coalesced"] += 1
+        pending.updates.update(updates)
+        pending.commands += 1
+        # shield: a client going away mustn't cancel the write others are waiting on
+        return await asyncio.shield(pending.future)
+
+    def _schedule_flush(self, task_id: str, pending: PendingWrite):
+        if self._pending.get(task_id) is not pending:
+            return
+        flush = asyncio.ensure_future(self._flush(task_id))
+        self._flushes.add(flush)
+        flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, task_id: str):
+        pending = self._pending.pop(task_id, None)
+        if pending is None:
+            return
+        try:
+            written = await self._write(task_id, dict(pending.updates))
+        except Exception as e:
+            pending.future.set_exception(e)
+        else:
+            self.counters["writes"] += 1
+            if written:
+                pending.future.set_result({"task_id": task_id, "coalesced": pending.commands})
+            else:
+                pending.future.set_exception(CommandError("not_found", "Task not found"))
+        # Retrieve the exception so a window nobody waits on anymore doesn't log it
+        if pending.future.done() and not pending.future.cancelled():
+            pending.future.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "pending": len(self._pending)}
+
+
+task_commands = TaskCommands()
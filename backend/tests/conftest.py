@@ -0,0 +1,109 @@
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+import db
+from app import database as app_database
+from embedding_service import embedding_service
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+TEST_DB = "flowstate_test"
+APP_TEST_DB = "chronoheight_test"
+
+
+def _make_task(**overrides):
+    task = {
+        "_id": "t1",
+        "email": "a@b.c",
+        "title": "Write report",
+        "tag_names": ["work", "deep"],
+        "start_time": datetime(2026, 3, 2, 9),
+        "duration": 60,
+        "actual_duration": 90,
+        "ai_time_estimation": 80,
+    }
+    task.update(overrides)
+    return task
+
+
+@pytest.fixture
+def make_task():
+    """Builds a task document as db.py stores it; keyword arguments replace fields."""
+    return _make_task
+
+
+def _mongod_available() -> bool:
+    try:
+        MongoClient(MONGO_URI, serverSelectionTimeoutMS=500).admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture
+def run_db(monkeypatch):
+    """
+    Runs a test coroutine, called with a Motor client, against a scratch database
+    with db.py's indexes. Skipped when no mongod is reachable at MONGO_URI.
+    Embeddings come from a fake instead of the Gemini API.
+    """
+    if not _mongod_available():
+        pytest.skip("no local mongod")
+    monkeypatch.setattr(db, "DB_NAME", TEST_DB)
+    monkeypatch.setattr(embedding_service, "_client", FakeEmbeddings())
+    db._title_cache.clear()
+
+    def run(test):
+        async def scratch():
+            client = AsyncIOMotorClient(MONGO_URI)
+            try:
+                await client.drop_database(TEST_DB)
+                await db.ensure_indexes(client)
+                return await test(client)
+            finally:
+                await client.drop_database(TEST_DB)
+                client.close()
+
+        return asyncio.run(scratch())
+
+    return run
+
+
+@pytest.fixture
+def run_app_db(monkeypatch):
+    """
+    run_db for the ChronoHeight app package: the test coroutine runs with
+    app.database connected to a scratch database that has TASK_INDEXES.
+    """
+    if not _mongod_available():
+        pytest.skip("no local mongod")
+    monkeypatch.setattr(app_database.settings, "DATABASE_NAME", APP_TEST_DB)
+
+    def run(test):
+        async def scratch():
+            client = AsyncIOMotorClient(MONGO_URI)
+            monkeypatch.setattr(app_database.db, "client", client)
+            try:
+                await client.drop_database(APP_TEST_DB)
+                await client[APP_TEST_DB]["tasks"].create_indexes(app_database.TASK_INDEXES)
+                return await test()
+            finally:
+                await client.drop_database(APP_TEST_DB)
+                client.close()
+
+        return asyncio.run(scratch())
+
+    return run
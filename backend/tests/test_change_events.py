@@ -0,0 +1,44 @@
+import asyncio
+
+from change_events import ChangeFeed
+
+
+def test_writes_in_a_window_are_published_as_one_message():
+    async def run():
+        published = []
+        loads = []
+
+        async def publish(topic, message):
+            published.append((topic, message))
+            return 1
+
+        async def load_task_changes(email, since):
+            loads.append((email, since))
+            return {"changed": [{"title": "A"}], "deleted": [], "cursor": since, "has_more": False}
+
+        feed = ChangeFeed(window=0.02)
+        feed.record("a@x", "task", version=7, seq=1700)
+        assert feed.stats()["recorded"] == 0  # not running yet
+
+        await feed.start(publish, load_task_changes)
+        feed.record("a@x", "task", version=7, seq=1700)
+        feed.record("a@x", "task", version=9, seq=1900)
+        feed.record("a@x", "tag", "upsert", "work", version=8)
+        feed.record("a@x", "tag", "delete", "work", version=10)
+        await asyncio.sleep(0.1)
+        await feed.stop()
+        return published, loads
+
+    published, loads = asyncio.run(run())
+    # One delta read from before the window's first task write
+    assert loads == [("a@x", 1699)]
+    assert published == [(
+        "user:a@x",
+        {
+            "type": "changes",
+            "email": "a@x",
+            "version": 10,
+            "tasks": {"changed": [{"title": "A"}], "deleted": []},
+            "changes": [{"entity": "tag", "op": "delete", "key": "work"}],
+        },
+    )]
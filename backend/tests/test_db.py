@@ -0,0 +1,30 @@
+import asyncio
+
+import db
+
+
+def test_task_round_trip(run_db):
+    async def test(client):
+        await db.set_user(client, "a@b.c", "Tester")
+        await db.set_task(client, "a@b.c", "Write report", "c1", duration=30)
+        task_id = str((await db.get_all_tasks_for_user(client, "a@b.c"))[0]["_id"])
+        # Independent reads share the client's pool and run concurrently
+        user, task = await asyncio.gather(db.get_user(client, "a@b.c"), db.get_task(client, "a@b.c", task_id))
+        updated = await db.update_task_fields(client, task_id, {"duration": 45})
+        edited = await db.get_task(client, "a@b.c", task_id)
+        deleted = await db.delete_task_by_id(client, task_id)
+        return user, task, updated, edited, deleted, await db.delete_task_by_id(client, task_id)
+
+    user, task, updated, edited, deleted, deleted_again = run_db(test)
+    assert user["description"] == "Tester"
+    assert task["title"] == "Write report" and task["duration"] == 30
+    assert updated and edited["duration"] == 45
+    assert deleted and not deleted_again
+
+
+def test_updating_a_missing_task_reports_it(run_db):
+    assert run_db(lambda client: db.update_task_fields(client, "64b7f0c2a1b2c3d4e5f60718", {"duration": 45})) is False
+
+
+def test_estimating_a_missing_task_reports_it(run_db):
+    assert run_db(lambda client: db.update_task_ai_estimation(client, "no-such-task", "completed")) is False
@@ -0,0 +1,121 @@
+import asyncio
+
+from pymongo import UpdateOne
+
+import db
+from embedding_queue import EmbeddingJob, EmbeddingQueue
+from embedding_service import embedding_service
+
+
+class FakeCollection:
+    def __init__(self):
+        self.updates = []
+        self.bulk_writes = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+    async def bulk_write(self, operations, ordered=True):
+        self.bulk_writes.append(operations)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+
+class FakeEmbedder:
+    """Stands in for embedding_service.embed_many; fails the first `failures` calls."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = []
+
+    async def __call__(self, database, texts):
+        self.calls.append(list(texts))
+        if len(self.calls) <= self.failures:
+            raise RuntimeError("quota exceeded")
+        return [[float(len(text))] for text in texts]
+
+
+def _stored(text):
+    """The write the queue makes once text's vector is ready."""
+    text_hash = embedding_service.cache_key(text)
+    return UpdateOne(
+        {"_id": 1, "embedding_pending_hash": text_hash},
+        {
+            "$set": {
+                "embedding": [float(len(text))],
+                "embedding_status": "ready",
+                "embedding_source_hash": text_hash,
+                "embedding_model": embedding_service.model
+            },
+            "$unset": {"embedding_pending_hash": ""}
+        }
+    )
+
+
+def test_repeated_writes_embed_only_the_latest_text(monkeypatch):
+    embedder = FakeEmbedder()
+    monkeypatch.setattr(embedding_service, "embed_many", embedder)
+
+    async def run():
+        queue = EmbeddingQueue(batch_window=0.01)
+        for text in ("Write", "Write rep", "Write report"):
+            queue.enqueue("tasks", {"_id": 1}, text)
+        queue.enqueue("tasks", {"_id": 1}, "   ")
+        database = FakeDatabase()
+        await queue.start(database)
+        await queue.stop()
+        return queue, database
+
+    queue, database = asyncio.run(run())
+    assert embedder.calls == [["Write report"]]
+    assert database["tasks"].bulk_writes == [[_stored("Write report")]]
+    assert queue.counters["coalesced"] == 2 and queue.counters["embedded"] == 1
+
+
+def test_failed_batch_is_retried_with_backoff(monkeypatch):
+    embedder = FakeEmbedder(failures=1)
+    monkeypatch.setattr(embedding_service, "embed_many", embedder)
+
+    async def run():
+        queue = EmbeddingQueue(batch_window=0.01, retry_delay=0.02)
+        database = FakeDatabase()
+        await queue.start(database)
+        queue.enqueue("tasks", {"_id": 1}, "Write report")
+        await asyncio.sleep(0.1)
+        await queue.stop()
+        return queue, database
+
+    queue, database = asyncio.run(run())
+    assert embedder.calls == [["Write report"], ["Write report"]]
+    assert database["tasks"].bulk_writes == [[_stored("Write report")]]
+    assert queue.counters["retried"] == 1 and queue.counters["failed"] == 0
+
+
+def test_failed_embedding_is_not_fresh():
+    text = "Write report"
+    text_hash = embedding_service.cache_key(text)
+    assert db.embedding_is_fresh({"embedding_pending_hash": text_hash, "embedding_status": "pending"}, text)
+    assert not db.embedding_is_fresh({"embedding_pending_hash": text_hash, "embedding_status": "failed"}, text)
+
+
+def test_giving_up_marks_failed_and_clears_pending_hash():
+    async def run():
+        queue = EmbeddingQueue(max_attempts=1)
+        queue._database = FakeDatabase()
+        job = EmbeddingJob("tasks", {"_id": 1}, "Write report", "hash")
+        queue._retry(job)
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(run())
+    assert queue.counters["failed"] == 1
+    assert queue._database["tasks"].updates == [(
+        {"_id": 1, "embedding_pending_hash": "hash"},
+        {"$set": {"embedding_status": "failed"}, "$unset": {"embedding_pending_hash": ""}},
+    )]
@@ -0,0 +1,87 @@
+import asyncio
+
+from embedding_service import EmbeddingService
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_query(self, text):
+        self.calls.append(text)
+        return [float(len(text))]
+
+
+def make_service(max_entries=2048):
+    service = EmbeddingService(max_entries=max_entries)
+    service._client = FakeEmbeddings()
+    return service
+
+
+def test_repeated_text_hits_memory_cache():
+    service = make_service()
+
+    async def run():
+        first = await service.embed(None, "Write report")
+        second = await service.embed(None, "Write report")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == [12.0]
+    assert service._client.calls == ["Write report"]
+    stats = service.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_empty_text_is_not_embedded():
+    service = make_service()
+    assert asyncio.run(service.embed(None, "   ")) is None
+    assert service._client.calls == []
+
+
+def test_lru_evicts_oldest_entry():
+    service = make_service(max_entries=2)
+
+    async def run():
+        for text in ("a", "b", "c", "a"):
+            await service.embed(None, text)
+
+    asyncio.run(run())
+    assert service._client.calls == ["a", "b", "c", "a"]
+
+
+def test_concurrent_identical_misses_are_collapsed():
+    service = make_service()
+
+    async def run():
+        return await asyncio.gather(*(service.embed(None, "same text") for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert all(r == [9.0] for r in results)
+    assert service._client.calls == ["same text"]
+
+
+def test_cancelled_miss_releases_callers_sharing_it():
+    service = make_service()
+    started = asyncio.Event()
+
+    async def load_forever(database, key, text):
+        started.set()
+        await asyncio.Event().wait()
+
+    service._load_or_generate = load_forever
+
+    async def run():
+        owner = asyncio.create_task(service.embed(None, "same text"))
+        await started.wait()
+        sharer = asyncio.create_task(service.embed(None, "same text"))
+        await asyncio.sleep(0)
+        owner.cancel()
+        results = await asyncio.wait_for(asyncio.gather(owner, sharer, return_exceptions=True), 1)
+        return results, dict(service._in_flight)
+
+    results, in_flight = asyncio.run(run())
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert in_flight == {}
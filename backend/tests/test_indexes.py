@@ -0,0 +1,78 @@
+"""
+Runs explain() for every query shape in db.py against a local mongod and fails
+if any of them falls back to a collection scan.
+Skipped when no mongod is reachable at MONGO_URI.
+"""
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import db
+
+WEEK_START, WEEK_END = datetime(2024, 1, 1), datetime(2024, 1, 8)
+
+# (collection, filter) for each query shape db.py issues
+QUERY_SHAPES = [
+    ("users", {"email": "a@b.c"}),
+    ("tags", {"email": "a@b.c", "tag_name": "work"}),
+    ("tags", {"email": "a@b.c"}),
+    ("tags", {"embedding_status": "pending"}),
+    ("tasks", {"email": "a@b.c", "_id": ObjectId()}),
+    ("tasks", {"_id": ObjectId()}),
+    ("tasks", {"_id": ObjectId(), "rollup": None}),
+    ("tasks", {"email": "a@b.c", "title": "Write report"}),
+    ("tasks", {"email": "a@b.c", "$or": [{"_id": ObjectId()}, {"title": "Write report"}]}),
+    ("tasks", {"email": "a@b.c", "_id": ObjectId(), "title": "Write report"}),
+    ("tasks", {"email": "a@b.c", "task_client_id": "c1"}),
+    ("tasks", {"task_client_id": "c1"}),
+    ("tasks", {"email": "a@b.c", "tag_names": "work"}),
+    ("tasks", {"email": "a@b.c"}),
+    ("tasks", {"embedding_status": "pending"}),
+    ("tasks", {"email": "a@b.c", "duration": {"$gt": 0}}),
+    ("tasks", {"email": "a@b.c", "start_time": {"$gte": WEEK_START, "$lt": WEEK_END}}),
+    ("tasks", {
+        "email": "a@b.c",
+        "recurrence": {"$in": [None, "", "none"]},
+        "start_time": {"$gte": WEEK_START, "$lt": WEEK_END},
+        "$expr": {"$or": [
+            {"$gte": ["$start_time", WEEK_START]},
+            {"$gt": [{"$add": ["$start_time", {"$multiply": [{"$ifNull": ["$duration", 0]}, 60000]}]}, WEEK_START]}
+        ]}
+    }),
+    ("tasks", {"email": "a@b.c", "recurrence": {"$exists": True, "$nin": [None, "", "none"]}, "start_time": {"$lt": WEEK_END}}),
+    ("tasks", {"email": "a@b.c", "sync_seq": {"$gt": 5}}),
+    ("task_tombstones", {"email": "a@b.c", "sync_seq": {"$gt": 5}}),
+    ("task_rollups", {"email": "a@b.c", "tag": "work", "day": "2024-01-01"}),
+    ("task_rollups", {
+        "$or": [{"email": "a@b.c", "tag": "work", "day": "2024-01-01"}, {"email": "a@b.c", "tag": "deep", "day": "2024-01-02"}],
+        "tasks": {"$lte": 0}
+    }),
+    ("task_rollups", {"email": "a@b.c", "day": {"$gte": "2024-01-01", "$lt": "2024-02-01"}}),
+    ("pads", {"email": "a@b.c", "pad_id": "p1"}),
+    ("pads", {"email": "a@b.c"}),
+    ("projects", {"email": "a@b.c", "project_id": "p1"}),
+    ("projects", {"email": "a@b.c"}),
+]
+
+
+def _stages(plan):
+    """Yields every stage name in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+@pytest.mark.parametrize("collection_name, query", QUERY_SHAPES, ids=[f"{c}:{sorted(q)}" for c, q in QUERY_SHAPES])
+def test_query_shape_uses_index(run_db, collection_name, query):
+    async def explain(client):
+        explained = await client[db.DB_NAME][collection_name].find(query).explain()
+        return explained["queryPlanner"]["winningPlan"]
+
+    stages = set(_stages(run_db(explain)))
+    assert "COLLSCAN" not in stages, f"{query} falls back to COLLSCAN: {stages}"
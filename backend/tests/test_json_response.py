@@ -0,0 +1,22 @@
+import json
+from datetime import datetime
+
+import orjson
+import pytest
+from bson import Decimal128, ObjectId
+
+from json_response import dumps
+
+
+def test_encodes_object_ids_and_naive_utc_datetimes():
+    task_id = ObjectId()
+    body = dumps([{"_id": task_id, "start_time": datetime(2024, 1, 1, 9, 30, 0, 123000), "tag_names": ["work"]}])
+
+    assert json.loads(body) == [{"_id": str(task_id), "start_time": "2024-01-01T09:30:00Z", "tag_names": ["work"]}]
+
+
+def test_unknown_types_are_rejected():
+    with pytest.raises(TypeError):
+        dumps({"amount": Decimal128("1.5")})
+    with pytest.raises(orjson.JSONEncodeError):
+        dumps({"tags": {"work"}})
@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+
+import db
+from main import listing_response, parse_fields
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+async def _body(response) -> bytes:
+    if hasattr(response, "body_iterator"):
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return response.body
+
+
+def test_pages_walk_every_task_once(run_db):
+    async def test(client):
+        for n in range(5):
+            await db.set_task(client, "a@b.c", f"Task {n}", f"c{n}")
+        pages, after = [], None
+        while True:
+            page = await db.get_all_tasks(client, after=after, limit=2)
+            pages.append(page)
+            if len(page) < 2:
+                return pages
+            after = str(page[-1]["_id"])
+
+    pages = run_db(test)
+    ids = [task["_id"] for page in pages for task in page]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert ids == sorted(ids) and len(set(ids)) == 5
+
+
+def test_invalid_cursor_is_rejected(run_db):
+    with pytest.raises(ValueError):
+        run_db(lambda client: db.get_all_tasks(client, after="not-an-id", limit=2))
+
+
+def test_full_page_links_to_the_next_one():
+    docs = [{"_id": ObjectId()} for _ in range(2)]
+
+    full = asyncio.run(listing_response(FakeCursor(docs), 2, stream=False))
+    last = asyncio.run(listing_response(FakeCursor(docs[:1]), 2, stream=False))
+    assert full.headers["X-Next-After"] == str(docs[-1]["_id"])
+    assert "X-Next-After" not in last.headers
+
+
+def test_stream_writes_one_document_per_line():
+    docs = [{"_id": ObjectId(), "title": f"Task {n}"} for n in range(3)]
+
+    response = asyncio.run(listing_response(FakeCursor(docs), None, stream=True))
+    lines = asyncio.run(_body(response)).decode().splitlines()
+    assert response.media_type == "application/x-ndjson"
+    assert [json.loads(line)["title"] for line in lines] == ["Task 0", "Task 1", "Task 2"]
+
+
+def test_listings_leave_out_embeddings(run_db):
+    async def test(client):
+        await db.set_task(client, "a@b.c", "Write report", "c1", description="Quarterly numbers")
+        await db.set_tag(client, "a@b.c", "work", "Paid work")
+        stored = await client[db.DB_NAME]["tasks"].find_one({"task_client_id": "c1"})
+        tasks = await db.get_all_tasks_for_user(client, "a@b.c")
+        titles = await db.get_all_tasks_for_user(client, "a@b.c", fields=["title", "embedding"])
+        tags = await db.get_all_tags_for_user(client, "a@b.c")
+        return stored, tasks, titles, tags
+
+    stored, tasks, titles, tags = run_db(test)
+    assert "embedding" in stored
+    assert tasks[0]["description"] == "Quarterly numbers"
+    assert not any(field.startswith("embedding") for field in tasks[0])
+    assert not any(field.startswith("embedding") for field in tags[0])
+    assert set(titles[0]) == {"_id", "title"}
+
+
+def test_fields_parameter():
+    assert parse_fields(None) is None
+    assert parse_fields(" , ") is None
+    assert parse_fields("title, start_time,") == ["title", "start_time"]
+    # Asking only for excluded fields falls back to the default listing
+    assert db._listing_projection(["embedding"]) is db.DEFAULT_LISTING_PROJECTION
@@ -0,0 +1,30 @@
+from mongo_clients import MongoClientRegistry, PoolSettings, settings_from_env
+
+
+def test_workload_env_overrides_global(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "40")
+    monkeypatch.setenv("MONGO_AGENTS_MAX_POOL_SIZE", "4")
+
+    agents = settings_from_env("agents", PoolSettings(max_pool_size=10))
+    api = settings_from_env("api", PoolSettings(max_pool_size=100))
+
+    assert agents.max_pool_size == 4
+    assert api.max_pool_size == 40
+    assert agents.client_options()["maxPoolSize"] == 4
+
+
+def test_clients_are_shared_per_workload():
+    registry = MongoClientRegistry(
+        "mongodb://localhost:27017/",
+        {"api": PoolSettings(), "agents": PoolSettings(max_pool_size=2)}
+    )
+    try:
+        assert registry.get("api") is registry.get("api")
+        assert registry.get("agents") is not registry.get("api")
+        assert registry.get_sync("agents") is registry.get_sync("agents")
+        assert registry.get_sync("agents") is not registry.get("agents").delegate
+        assert registry.get_sync("agents").options.pool_options.max_pool_size == 2
+        assert registry.get("agents").options.pool_options.max_pool_size == 2
+        assert set(registry.stats()) == {"api", "agents"}
+    finally:
+        registry.close()
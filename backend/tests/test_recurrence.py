@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from recurrence import ExpansionCache, expand_task, iter_occurrences
+
+
+# Mondays and Wednesdays at 18:00 from Monday 2026-01-05
+WEEKLY = {"start_time": datetime(2026, 1, 5, 18), "recurrence": "RRULE:FREQ=WEEKLY;BYDAY=MO,WE"}
+
+
+def test_window_includes_overlap_and_skips_exceptions(make_task):
+    task = make_task(**WEEKLY, recurrence_exceptions=[datetime(2026, 3, 9, 18)])
+    # The window opens halfway through the 4th's occurrence, so that one still overlaps
+    occurrences = list(iter_occurrences(task, datetime(2026, 3, 4, 18, 30), datetime(2026, 3, 12)))
+    assert occurrences == [datetime(2026, 3, 4, 18), datetime(2026, 3, 11, 18)]
+
+
+def test_shorthand_and_utc_until(make_task):
+    daily_task = make_task(start_time=WEEKLY["start_time"], recurrence="daily", duration=0)
+    daily = list(iter_occurrences(daily_task, datetime(2026, 1, 5), datetime(2026, 1, 8)))
+    assert daily == [datetime(2026, 1, 5, 18), datetime(2026, 1, 6, 18), datetime(2026, 1, 7, 18)]
+
+    until = make_task(start_time=WEEKLY["start_time"], recurrence="RRULE:FREQ=DAILY;UNTIL=20260107T180000Z")
+    assert len(list(iter_occurrences(until, datetime(2026, 1, 1), datetime(2026, 2, 1)))) == 3
+
+
+def test_cache_reuses_window_until_schedule_changes(make_task):
+    cache = ExpansionCache()
+    task = make_task(**WEEKLY)
+    window = (datetime(2026, 3, 1), datetime(2026, 3, 8))
+    first = cache.occurrences(task, *window)
+    assert cache.occurrences(task, *window) == first
+    assert cache.counters == {"hits": 1, "misses": 1}
+
+    edited = make_task(**WEEKLY, recurrence_exceptions=[first[0]])
+    assert cache.occurrences(edited, *window) == first[1:]
+    assert cache.counters["misses"] == 2
+
+
+def test_expanded_occurrences_have_their_own_ids(make_task):
+    task = make_task(**WEEKLY)
+    occurrences = list(iter_occurrences(task, datetime(2026, 3, 1), datetime(2026, 3, 8)))
+    expanded = list(expand_task(task, occurrences))
+    assert [doc["_id"] for doc in expanded] == ["t1:2026-03-02T18:00:00Z", "t1:2026-03-04T18:00:00Z"]
+    assert all(doc["series_id"] == "t1" for doc in expanded)
+    assert [doc["occurrence_start"] for doc in expanded] == occurrences
@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+
+from bson import ObjectId
+
+import reembed
+from embedding_service import embedding_service
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+        self.written = []
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        after = query.get("_id", {}).get("$gt")
+        return FakeCursor([doc for doc in self.docs if after is None or doc["_id"] > after])
+
+    async def bulk_write(self, operations, ordered=True):
+        self.written.extend(operation._filter["_id"] for operation in operations)
+        return argparse.Namespace(modified_count=len(operations))
+
+
+class FakeClient:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getitem__(self, name):
+        # client[DB_NAME] is a database holding the one collection
+        return {"tasks": self.collection}
+
+
+def _args(tmp_path, **overrides):
+    args = dict(batch_size=2, concurrency=2, checkpoint=str(tmp_path / "checkpoint.json"), reset=False, dry_run=False)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def test_checkpoint_only_advances_past_finished_batches(tmp_path):
+    args = _args(tmp_path)
+    reembedder = reembed.CollectionReembedder(FakeClient(None), "tasks", args, {})
+    first, second = ["a", False], ["b", False]
+    reembedder.in_order = [first, second]
+
+    # The later batch finishing first must not move the checkpoint past the earlier one
+    second[1] = True
+    reembedder._advance_checkpoint()
+    assert reembed.load_checkpoint(args.checkpoint) == {}
+
+    first[1] = True
+    reembedder._advance_checkpoint()
+    assert reembed.load_checkpoint(args.checkpoint) == {"tasks": "b"}
+    assert reembedder.in_order == []
+
+
+def test_run_resumes_after_checkpoint_and_skips_fresh_docs(tmp_path, monkeypatch):
+    async def embed_many(database, texts):
+        return [[1.0] for _ in texts]
+
+    monkeypatch.setattr(embedding_service, "embed_many", embed_many)
+    ids = sorted(ObjectId() for _ in range(5))
+    fresh_hash = embedding_service.cache_key("Done")
+    docs = [{"_id": _id, "title": f"Task {n}"} for n, _id in enumerate(ids)]
+    docs[3].update(title="Done", embedding_source_hash=fresh_hash, embedding_model=embedding_service.model)
+    collection = FakeCollection(docs)
+    args = _args(tmp_path)
+    reembed.save_checkpoint(args.checkpoint, {"tasks": str(ids[0])})
+
+    reembedder = reembed.CollectionReembedder(FakeClient(collection), "tasks", args, reembed.load_checkpoint(args.checkpoint))
+    ok = asyncio.run(reembedder.run())
+
+    assert ok
+    assert collection.queries == [{"_id": {"$gt": ids[0]}}]
+    assert collection.written == [ids[1], ids[2], ids[4]]
+    assert (reembedder.scanned, reembedder.stale) == (4, 3)
+    assert reembed.load_checkpoint(args.checkpoint) == {"tasks": str(ids[4])}
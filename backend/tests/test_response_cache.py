@@ -0,0 +1,58 @@
+import asyncio
+
+from response_cache import ResponseCache
+
+
+def test_concurrent_misses_share_one_build():
+    cache = ResponseCache()
+    builds = []
+
+    async def build():
+        builds.append(1)
+        await asyncio.sleep(0.01)
+        return b"[]"
+
+    async def run():
+        return await asyncio.gather(*[
+            cache.get_or_build("a@b.c", "tasks", "", 1, build) for _ in range(10)
+        ])
+
+    bodies = asyncio.run(run())
+    assert bodies == [b"[]"] * 10
+    assert len(builds) == 1
+    assert cache.counters["collapsed"] == 9
+
+
+def test_new_version_replaces_cached_body():
+    cache = ResponseCache()
+
+    async def run():
+        async def old():
+            return b"old"
+
+        async def new():
+            return b"new"
+
+        first = await cache.get_or_build("a@b.c", "tasks", "", 1, old)
+        again = await cache.get_or_build("a@b.c", "tasks", "", 1, new)
+        bumped = await cache.get_or_build("a@b.c", "tasks", "", 2, new)
+        return first, again, bumped
+
+    assert asyncio.run(run()) == (b"old", b"old", b"new")
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 3
+
+
+def test_bounded_by_bytes():
+    cache = ResponseCache(max_bytes=10)
+
+    async def build():
+        return b"x" * 6
+
+    async def run():
+        await cache.get_or_build("a@b.c", "tasks", "", 1, build)
+        await cache.get_or_build("d@e.f", "tasks", "", 1, build)
+
+    asyncio.run(run())
+    assert cache.stats()["entries"] == 1
+    assert cache.counters["evictions"] == 1
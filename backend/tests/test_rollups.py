@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import rollups
+
+
+def test_create_then_delete_cancels_out(make_task):
+    created = rollups.delta(None, rollups.snapshot(make_task()))
+    assert set(created) == {("a@b.c", "deep", "2026-03-02"), ("a@b.c", "work", "2026-03-02")}
+    assert created[("a@b.c", "work", "2026-03-02")]["duration_error"] == 30
+    assert created[("a@b.c", "work", "2026-03-02")]["ai_error"] == 10
+
+    snap = rollups.snapshot(make_task())
+    assert rollups.delta(snap, snap) == {}
+    removed = rollups.delta(snap, None)
+    assert all(amounts["tasks"] == -1 for amounts in removed.values())
+
+
+def test_retag_and_reschedule_move_the_task(make_task):
+    old = rollups.snapshot(make_task())
+    new = rollups.snapshot(make_task(tag_names=["work"], start_time=datetime(2026, 3, 3, 9)))
+    changes = rollups.delta(old, new)
+    assert changes[("a@b.c", "work", "2026-03-02")]["tasks"] == -1
+    assert changes[("a@b.c", "deep", "2026-03-02")]["tasks"] == -1
+    assert changes[("a@b.c", "work", "2026-03-03")]["tasks"] == 1
+
+
+def test_summary_ratios(make_task):
+    rows = [rollups.task_metrics(make_task()), rollups.task_metrics(make_task(actual_duration=None))]
+    summary = rollups.summarize(rows)
+    assert summary["tasks"] == 2 and summary["timed"] == 1
+    assert summary["duration_mae"] == 30 and summary["duration_ratio"] == 1.5
+    assert summary["completion_rate"] == 0
+    assert summary["cost_ratio"] is None
+
+
+def test_merge_batches_deltas(make_task):
+    first = rollups.delta(None, rollups.snapshot(make_task()))
+    second = rollups.delta(None, rollups.snapshot(make_task(tag_names=["work"], duration=30)))
+    merged = rollups.merge(rollups.merge({}, first), second)
+    assert merged[("a@b.c", "work", "2026-03-02")]["tasks"] == 2
+    assert merged[("a@b.c", "deep", "2026-03-02")]["tasks"] == 1
+    assert merged[("a@b.c", "work", "2026-03-02")]["duration_error"] == 30 + 60
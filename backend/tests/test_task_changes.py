@@ -0,0 +1,48 @@
+import db
+
+
+def test_changes_since_cursor_include_updates_and_tombstones(run_db, monkeypatch):
+    # Treat every write as settled so the cursor moves right away
+    monkeypatch.setattr(db, "SYNC_SETTLE_SECONDS", -1)
+
+    async def test(client):
+        for client_id in ("c1", "c2", "c3"):
+            await db.set_task(client, "a@b.c", f"Task {client_id}", client_id)
+        await db.set_task(client, "z@b.c", "Someone else's", "z1")
+        full = await db.get_task_changes(client, "a@b.c")
+        await db.set_task(client, "a@b.c", "Task c2 edited", "c2")
+        await db.delete_task(client, "a@b.c", "Task c3")
+        delta = await db.get_task_changes(client, "a@b.c", full["cursor"])
+        idle = await db.get_task_changes(client, "a@b.c", delta["cursor"])
+        return full, delta, idle
+
+    full, delta, idle = run_db(test)
+    assert sorted(task["task_client_id"] for task in full["changed"]) == ["c1", "c2", "c3"]
+    assert full["deleted"] == [] and full["cursor"] > 0
+    assert [task["title"] for task in delta["changed"]] == ["Task c2 edited"]
+    assert [tombstone["task_client_id"] for tombstone in delta["deleted"]] == ["c3"]
+    assert delta["cursor"] > full["cursor"] and not delta["has_more"]
+    assert idle == {"changed": [], "deleted": [], "cursor": delta["cursor"], "has_more": False}
+
+
+def test_cursor_waits_for_recent_writes_to_settle(run_db):
+    async def test(client):
+        await db.set_task(client, "a@b.c", "Task", "c1")
+        return await db.get_task_changes(client, "a@b.c")
+
+    changes = run_db(test)
+    # Sent, but the cursor stays put so a write stamped out of order isn't skipped
+    assert [task["task_client_id"] for task in changes["changed"]] == ["c1"]
+    assert changes["cursor"] == 0
+
+
+def test_write_to_a_missing_task_leaves_the_version_alone(run_db):
+    async def test(client):
+        await db.set_task(client, "a@b.c", "Task", "c1")
+        version = await db.get_data_version(client, "a@b.c")
+        assert not await db.set_task_description(client, "a@b.c", "No such task", "text")
+        assert not await db.add_tag_to_task(client, "a@b.c", "No such task", "work")
+        return version, await db.get_data_version(client, "a@b.c")
+
+    before, after = run_db(test)
+    assert after == before
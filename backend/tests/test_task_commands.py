@@ -0,0 +1,55 @@
+import asyncio
+
+import db
+from task_commands import TaskCommands
+
+
+def test_burst_of_moves_is_written_once():
+    async def run():
+        writes = []
+
+        async def write(task_id, updates):
+            writes.append((task_id, updates))
+            return True
+
+        commands = TaskCommands(debounce=0.02)
+        commands.start(write)
+        frames = [
+            {"type": "rpc", "id": str(i), "method": "task.move",
+             "params": {"task_id": "t1", "start_time": f"2024-01-01T0{i}:00:00Z"}}
+            for i in range(3)
+        ]
+        frames.append({"type": "rpc", "id": "r", "method": "task.resize", "params": {"task_id": "t1", "duration": 45}})
+        frames.append({"type": "rpc", "id": "bad", "method": "task.resize", "params": {"task_id": "t1", "duration": -5}})
+        replies = await asyncio.gather(*(commands.handle(frame) for frame in frames))
+        return writes, replies
+
+    writes, replies = asyncio.run(run())
+    assert len(writes) == 1
+    task_id, updates = writes[0]
+    assert task_id == "t1"
+    assert updates["start_time"].hour == 2 and updates["duration"] == 45
+    assert [reply["id"] for reply in replies] == ["0", "1", "2", "r", "bad"]
+    assert all(reply["ok"] and reply["result"]["coalesced"] == 4 for reply in replies[:4])
+    assert replies[4]["ok"] is False and replies[4]["error"]["code"] == "invalid_params"
+
+
+class MissingTasks:
+    """A client whose tasks collection matches nothing."""
+
+    def __getitem__(self, name):
+        return self
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        return None
+
+
+def test_command_on_missing_task_is_not_found():
+    async def run():
+        commands = TaskCommands(debounce=0.01)
+        commands.start(lambda task_id, updates: db.update_task_fields(MissingTasks(), task_id, updates))
+        frame = {"type": "rpc", "id": "1", "method": "task.complete", "params": {"task_id": "64b7f0c2a1b2c3d4e5f60718", "is_completed": True}}
+        return await commands.handle(frame)
+
+    reply = asyncio.run(run())
+    assert reply["ok"] is False and reply["error"]["code"] == "not_found"
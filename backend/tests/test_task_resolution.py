@@ -0,0 +1,89 @@
+import asyncio
+from collections import OrderedDict
+
+import pytest
+from bson import ObjectId
+
+import db
+
+
+def _matches(doc, query):
+    for field, value in query.items():
+        if field == "$or":
+            if not any(_matches(doc, branch) for branch in value):
+                return False
+        elif doc.get(field) != value:
+            return False
+    return True
+
+
+class FakeTasks:
+    """find_one over a list of task documents, recording every query (one per round trip)."""
+
+    def __init__(self, *docs):
+        self.docs = list(docs)
+        self.queries = []
+
+    async def find_one(self, query):
+        self.queries.append(query)
+        return next((doc for doc in self.docs if _matches(doc, query)), None)
+
+
+@pytest.fixture(autouse=True)
+def empty_title_cache(monkeypatch):
+    monkeypatch.setattr(db, "_title_cache", OrderedDict())
+
+
+def _resolve(tasks, identifier):
+    return asyncio.run(db._resolve_task("a@b.c", identifier, tasks.find_one))
+
+
+def test_id_or_title_resolves_in_one_query():
+    report = {"_id": ObjectId(), "email": "a@b.c", "title": "Write report"}
+    # A title that happens to be a valid ObjectId string still matches by title
+    hex_title = {"_id": ObjectId(), "email": "a@b.c", "title": "0123456789abcdef01234567"}
+    tasks = FakeTasks(report, hex_title)
+
+    assert _resolve(tasks, str(report["_id"])) is report
+    assert _resolve(tasks, "0123456789abcdef01234567") is hex_title
+    assert _resolve(tasks, "missing") is None
+    assert tasks.queries[-1] == {"email": "a@b.c", "title": "missing"}
+    assert len(tasks.queries) == 3
+
+
+def test_title_lookups_are_cached_by_id():
+    report = {"_id": ObjectId(), "email": "a@b.c", "title": "Write report"}
+    tasks = FakeTasks(report)
+
+    assert _resolve(tasks, "Write report") is report
+    assert _resolve(tasks, "Write report") is report
+    assert tasks.queries == [
+        {"email": "a@b.c", "title": "Write report"},
+        {"email": "a@b.c", "_id": report["_id"], "title": "Write report"},
+    ]
+
+
+def test_stale_cache_entry_falls_back_to_title():
+    old = {"_id": ObjectId(), "email": "a@b.c", "title": "Write report"}
+    tasks = FakeTasks(old)
+    _resolve(tasks, "Write report")
+
+    # Renamed by another worker, and a new task took the title
+    old["title"] = "Old report"
+    new = {"_id": ObjectId(), "email": "a@b.c", "title": "Write report"}
+    tasks.docs.append(new)
+
+    assert _resolve(tasks, "Write report") is new
+    assert tasks.queries[-1] == {"email": "a@b.c", "title": "Write report"}
+    assert db._title_cache["a@b.c"] == {"Write report": new["_id"]}
+
+
+def test_writes_forget_cached_titles():
+    report = {"_id": ObjectId(), "email": "a@b.c", "title": "Write report"}
+    _resolve(FakeTasks(report), "Write report")
+
+    db._forget_task_titles(task_id=report["_id"])
+    assert db._title_cache["a@b.c"] == {}
+    _resolve(FakeTasks(report), "Write report")
+    db._forget_task_titles(email="a@b.c")
+    assert "a@b.c" not in db._title_cache
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.models.task import TaskCreate, TaskUpdate
+from app.database import get_database
+from app.main import app
+from app.services.task_service import CATEGORY_STATS, TaskService
+
+MONDAY = datetime(2024, 1, 15, 9)
+
+
+async def _create(title, start_time, category="work", duration=30):
+    return await TaskService.create_task(TaskCreate(title=title, category=category, start_time=start_time, duration=duration))
+
+
+def test_keyset_pages_cover_every_task_once(run_app_db):
+    async def test():
+        # Three tasks share a start_time, so pages have to break ties by _id
+        for n, hours in enumerate([0, 0, 0, 1, 2]):
+            await _create(f"Task {n}", MONDAY + timedelta(hours=hours))
+        await _create("Hobby", MONDAY, category="hobbies")
+        pages, after = [], {}
+        while True:
+            page = await TaskService.get_tasks(category="work", limit=2, **after)
+            pages.append(page)
+            if len(page) < 2:
+                return pages
+            after = {"after_start_time": page[-1].start_time, "after_id": page[-1].id}
+
+    pages = run_app_db(test)
+    tasks = [task for page in pages for task in page]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(task.title for task in tasks) == [f"Task {n}" for n in range(5)]
+    assert [(task.start_time, ObjectId(task.id)) for task in tasks] == sorted((task.start_time, ObjectId(task.id)) for task in tasks)
+
+
+def test_keyset_query_keeps_a_start_time_lower_bound():
+    after_id = str(ObjectId())
+    query = TaskService._list_query(start_date=MONDAY - timedelta(days=7), end_date=MONDAY + timedelta(days=7), after_start_time=MONDAY, after_id=after_id)
+    assert query["start_time"] == {"$gte": MONDAY, "$lt": MONDAY + timedelta(days=7)}
+    assert query["$or"] == [
+        {"start_time": {"$gt": MONDAY}},
+        {"start_time": MONDAY, "_id": {"$gt": ObjectId(after_id)}},
+    ]
+    # A range that starts later than the cursor keeps its own bound
+    later = TaskService._list_query(start_date=MONDAY + timedelta(days=1), after_start_time=MONDAY, after_id=after_id)
+    assert later["start_time"] == {"$gte": MONDAY + timedelta(days=1)}
+    # An offset-aware range with the naive cursor echoed from the headers: 10:00+02:00 is 08:00 UTC
+    aware = TaskService._list_query(start_date=MONDAY.replace(hour=10, tzinfo=timezone(timedelta(hours=2))), after_start_time=MONDAY, after_id=after_id)
+    assert aware["start_time"] == {"$gte": MONDAY}
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_malformed_cursor_is_a_bad_request(stream):
+    # Rejected before the listing (or the NDJSON response) starts
+    params = {"after_start_time": MONDAY.isoformat(), "after_id": "not-an-id", "stream": stream}
+    response = TestClient(app).get("/api/tasks/", params=params)
+    assert response.status_code == 400 and response.json()["detail"] == "after_id is not a valid id"
+
+
+def test_update_with_a_stale_version_conflicts(run_app_db):
+    async def test():
+        task = await _create("Task", MONDAY)
+        moved = await TaskService.update_task(task.id, TaskUpdate(duration=45, version=1))
+        with pytest.raises(HTTPException) as conflict:
+            await TaskService.update_task(task.id, TaskUpdate(duration=60, version=1))
+        unconditional = await TaskService.update_task(task.id, TaskUpdate(title="Renamed"))
+        missing = await TaskService.update_task(str(ObjectId()), TaskUpdate(title="Renamed", version=1))
+        return task, moved, conflict.value, unconditional, missing
+
+    task, moved, conflict, unconditional, missing = run_app_db(test)
+    assert task.version == 1
+    assert moved.version == 2 and moved.end_time == MONDAY + timedelta(minutes=45)
+    assert conflict.status_code == 409
+    assert unconditional.version == 3 and unconditional.duration == 45
+    assert missing is None
+
+
+def test_reconcile_repairs_drifted_category_stats(run_app_db):
+    async def test():
+        db = await get_database()
+        kept = await _create("Kept", MONDAY, duration=30)
+        drifted = await _create("Drifted", MONDAY, duration=60)
+        # Drift: a lost $inc, a stale snapshot and a task written before the counters existed
+        await db[CATEGORY_STATS].update_one({"_id": "work"}, {"$inc": {"count": 5}})
+        await db["tasks"].update_one({"_id": ObjectId(drifted.id)}, {"$set": {"stats_counted": {"category": "school", "duration": 5}}})
+        await db["tasks"].insert_one({"title": "Legacy", "category": "hobbies", "start_time": MONDAY, "duration": 15, "end_time": MONDAY})
+        before = await db["tasks"].find_one({"_id": ObjectId(kept.id)})
+
+        stats = await TaskService.reconcile_category_stats()
+        after = await db["tasks"].find_one({"_id": ObjectId(kept.id)})
+        # Counters stay current for the re-snapshotted legacy task afterwards
+        legacy = await db["tasks"].find_one({"title": "Legacy"})
+        await TaskService.update_task(str(legacy["_id"]), TaskUpdate(category="work"))
+        return stats, before, after, await TaskService.get_category_stats()
+
+    stats, before, after, moved = run_app_db(test)
+    assert {row["_id"]: (row["count"], row["total_duration"]) for row in stats} == {"work": (2, 90), "hobbies": (1, 15)}
+    assert after == before
+    assert {row["_id"]: (row["count"], row["total_duration"]) for row in moved} == {"work": (3, 105)}
+
+
+def test_backfill_counts_tasks_written_before_the_counters(run_app_db):
+    async def test():
+        db = await get_database()
+        await db["tasks"].insert_one({"title": "Legacy", "category": "work", "start_time": MONDAY, "duration": 15, "end_time": MONDAY})
+        ran = await TaskService.backfill_category_stats()
+        await _create("Counted", MONDAY, duration=30)
+        return ran, await TaskService.backfill_category_stats(), await TaskService.get_category_stats()
+
+    ran, ran_again, stats = run_app_db(test)
+    assert ran and not ran_again
+    assert [(row["_id"], row["count"], row["total_duration"]) for row in stats] == [("work", 2, 45)]
+
+
+def test_week_view_groups_by_day_and_category(run_app_db):
+    async def test():
+        db = await get_database()
+        late = await _create("Late", MONDAY + timedelta(hours=3))
+        await _create("Early", MONDAY)
+        await _create("Guitar", MONDAY + timedelta(days=1), category="hobbies")
+        await _create("Next week", MONDAY + timedelta(days=7))
+        await db["tasks"].update_one({"_id": ObjectId(late.id)}, {"$set": {"embedding": [0.1, 0.2]}})
+        return late, await TaskService.get_week_view(MONDAY.replace(hour=0))
+
+    late, week = run_app_db(test)
+    assert list(week) == ["2024-01-15", "2024-01-16"]
+    assert [task["title"] for task in week["2024-01-15"]["work"]] == ["Early", "Late"]
+    assert week["2024-01-15"]["hobbies"] == [] and week["2024-01-15"]["school"] == []
+    assert [task["title"] for task in week["2024-01-16"]["hobbies"]] == ["Guitar"]
+    sent = week["2024-01-15"]["work"][1]
+    assert sent["_id"] == late.id and sent["version"] == 1 and "embedding" not in sent
@@ -13,7 +13,7 @@ def test_read_main():
     assert response.status_code == 200
     assert response.json() == {"message": "Welcome to ChronoHeight Calendar API"}
 
-def test_create_task():
+def create_task():
     task_data = {
         "title": "Test Task",
         "description": "Test Description",
@@ -23,11 +23,13 @@ def test_create_task():
     }
     response = client.post("/api/tasks/", json=task_data)
     assert response.status_code == 201
-    data = response.json()
+    return response.json()
+
+def test_create_task():
+    data = create_task()
     assert data["title"] == "Test Task"
     assert "id" in data
     assert "end_time" in data
-    return data["id"]
 
 def test_list_tasks():
     response = client.get("/api/tasks/")
@@ -35,9 +37,13 @@ def test_list_tasks():
     assert isinstance(response.json(), list)
 
 def test_get_week_view():
+    created = create_task()["id"]
     response = client.get("/api/calendar/week")
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, dict)
+    tasks = [task for day in data.values() for category in day.values() for task in category]
+    # The calendar needs version to send with its moves and edits
+    assert any(task["_id"] == created and task["version"] == 1 for task in tasks)
     # Check structure
     # Keys should be dates, values should include categories
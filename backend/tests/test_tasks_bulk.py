@@ -0,0 +1,30 @@
+import db
+
+
+def _items(*specs):
+    return [{"email": "a@b.c", "title": title, "task_client_id": client_id} for client_id, title in specs]
+
+
+def test_bulk_write_reports_every_item(run_db):
+    async def test(client):
+        tasks = client[db.DB_NAME]["tasks"]
+        await db.set_task(client, "a@b.c", "Draft", "c0")
+        # Makes a repeated title fail, so one item errors without failing the write
+        await tasks.create_index([("title", -1)], unique=True, name="test_unique_title")
+
+        unordered = await db.set_tasks_bulk(client, _items(("c0", "Report"), ("c1", "Slides"), ("c2", "Slides"), ("c3", "Notes")))
+        ordered = await db.set_tasks_bulk(client, _items(("c4", "Review"), ("c5", "Notes"), ("c6", "Email")), ordered=True)
+        stored = sorted(doc["task_client_id"] for doc in await tasks.find({}, {"task_client_id": 1}).to_list(None))
+        return unordered, ordered, stored
+
+    unordered, ordered, stored = run_db(test)
+    assert [item["status"] for item in unordered] == ["updated", "created", "error", "created"]
+    assert [item["index"] for item in unordered] == [0, 1, 2, 3]
+    assert unordered[2]["task_client_id"] == "c2" and "duplicate key" in unordered[2]["error"]
+    # ordered stops at the first error; later items were never attempted
+    assert [item["status"] for item in ordered] == ["created", "error", "skipped"]
+    assert stored == ["c0", "c1", "c3", "c4"]
+
+
+def test_bulk_write_of_nothing_is_a_no_op(run_db):
+    assert run_db(lambda client: db.set_tasks_bulk(client, [])) == []
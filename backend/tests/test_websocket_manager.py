@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+from websocket_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self, blocked: bool = False):
+        self.sent = []
+        self.closed = False
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        self.sent.append(json.loads(text))
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+
+def test_every_tab_of_a_client_receives_messages():
+    async def run():
+        manager = ConnectionManager()
+        tabs = [FakeWebSocket(), FakeWebSocket()]
+        for tab in tabs:
+            await manager.connect(tab, "c1")
+        assert await manager.send_personal_message({"type": "agent_result"}, "c1") == 2
+        await asyncio.sleep(0.01)
+        await manager.stop()
+        return tabs
+
+    tabs = asyncio.run(run())
+    assert all(len(tab.sent) == 1 and tab.sent[0]["type"] == "agent_result" for tab in tabs)
+    assert tabs[0].sent[0]["seq"] == tabs[1].sent[0]["seq"]
+
+
+def test_slow_socket_coalesces_then_is_pruned_without_blocking_others():
+    async def run():
+        manager = ConnectionManager(max_queue=4)
+        slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+        await manager.connect(slow, "slow")
+        await manager.connect(fast, "fast")
+        # Nothing yields between these, so the three collapse into one queued message
+        for i in range(3):
+            await manager.broadcast({"type": "progress", "i": i}, coalesce_key="progress")
+        await asyncio.sleep(0.01)
+        slow_connection = next(iter(manager.active_connections["slow"]))
+        coalesced = slow_connection.counters["coalesced"]
+        for i in range(20):
+            await manager.send_personal_message({"type": "event", "i": i}, "slow")
+        await asyncio.sleep(0.01)
+        stats = manager.stats()
+        await manager.stop()
+        return fast, slow, coalesced, stats
+
+    fast, slow, coalesced, stats = asyncio.run(run())
+    assert fast.sent == [{"type": "progress", "i": 2}]
+    assert coalesced == 2
+    assert slow.closed and stats["pruned"] == 1 and stats["clients"] == 1
+
+
+def test_idle_connections_are_pruned_and_others_pinged():
+    async def run():
+        manager = ConnectionManager(idle_timeout=60)
+        idle, alive = FakeWebSocket(), FakeWebSocket()
+        idle_connection = await manager.connect(idle, "idle")
+        await manager.connect(alive, "alive")
+        idle_connection.last_seen -= 120
+        manager.check_heartbeats()
+        await asyncio.sleep(0.01)
+        clients = set(manager.active_connections)
+        await manager.stop()
+        return idle, alive, clients
+
+    idle, alive, clients = asyncio.run(run())
+    assert clients == {"alive"}
+    assert idle.closed and alive.sent == [{"type": "ping"}]
+
+
+def test_reconnect_replays_messages_after_last_seen_seq():
+    async def run():
+        manager = ConnectionManager()
+        first = FakeWebSocket()
+        connection = await manager.connect(first, "c1")
+        await manager.send_personal_message({"type": "agent_status"}, "c1")
+        await asyncio.sleep(0.01)
+        manager.disconnect(connection)
+        # Sent while the page reloads: nobody is connected
+        assert await manager.send_personal_message({"type": "agent_result"}, "c1") == 0
+        second = FakeWebSocket()
+        await manager.connect(second, "c1", last_seq=first.sent[-1]["seq"])
+        await asyncio.sleep(0.01)
+        await manager.stop()
+        return second
+
+    second = asyncio.run(run())
+    assert [message["type"] for message in second.sent] == ["agent_result"]
+
+
+def test_connecting_without_last_seq_replays_nothing():
+    async def run():
+        manager = ConnectionManager()
+        await manager.send_personal_message({"type": "agent_result"}, "c1")
+        fresh, zero = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(fresh, "c1")
+        await manager.connect(zero, "c1", last_seq=0)
+        await asyncio.sleep(0.01)
+        await manager.stop()
+        return fresh, zero
+
+    fresh, zero = asyncio.run(run())
+    assert fresh.sent == [] and zero.sent == []
+
+
+def test_topics_are_not_delivered_to_a_client_id_of_the_same_name():
+    async def run():
+        manager = ConnectionManager()
+        subscriber, impostor = FakeWebSocket(), FakeWebSocket()
+        connection = await manager.connect(subscriber, "tab")
+        manager.subscribe(connection, "user:a@x")
+        await manager.connect(impostor, "user:a@x")
+        assert await manager.publish("user:a@x", {"type": "changes"}) == 1
+        await asyncio.sleep(0.01)
+        await manager.stop()
+        return subscriber, impostor
+
+    subscriber, impostor = asyncio.run(run())
+    assert [message["type"] for message in subscriber.sent] == ["changes"]
+    assert impostor.sent == []
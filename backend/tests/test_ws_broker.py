@@ -0,0 +1,23 @@
+import time
+
+from bson import ObjectId
+
+from ws_broker import MongoBroker
+
+
+def test_mongo_broker_delivers_other_workers_messages_once():
+    broker = MongoBroker(database=object())
+    delivered = []
+    broker.bind(lambda client_id, text, coalesce_key, seq, topic: delivered.append((client_id, text, coalesce_key)) or 1)
+
+    now = time.time()
+    remote = {"_id": ObjectId(), "worker": "other", "client_id": "c1", "text": "{}", "coalesce_key": "k", "published_at": now}
+    own = {"_id": ObjectId(), "worker": broker.worker_id, "client_id": "c1", "text": "{}", "published_at": now}
+    marker = {"_id": ObjectId(), "worker": "other", "published_at": now}
+    for doc in (remote, own, marker, remote):
+        broker._receive(doc)
+
+    assert delivered == [("c1", "{}", "k")]
+    stats = broker.stats()
+    assert stats["received"] == 1
+    assert stats["latency_ms_p50"] is not None
@@ -15,7 +15,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmb
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langchain_core.messages import SystemMessage, HumanMessage
-from pymongo import MongoClient
+from mongo_clients import mongo_clients
 from langchain_mongodb import MongoDBAtlasVectorSearch
 from pydantic import BaseModel, Field
 
@@ -24,11 +24,16 @@ from pydantic import BaseModel, Field
 load_dotenv()
 
 # Configuration
-MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "flowstate_db"
-client = MongoClient(MONGO_URI)
-db = client["flowstate_db"]
-collection = db["tasks"]
+
+
+def _tasks_collection():
+    """
+    Tasks collection on the agents workload's blocking client (the vector store
+    runs in worker threads). Looked up per run, not at import, so a client
+    closed by mongo_clients.close() is replaced rather than reused.
+    """
+    return mongo_clients.get_sync("agents")[DB_NAME]["tasks"]
 
 
 # Initialize LLM (using Gemini 2.5 Flash as per user rules)
@@ -104,7 +109,7 @@ def find_similar_tasks_node(state: TimeEstimationState) -> Dict[str, Any]:
     
     # Initialize the vector store
     vector_store = MongoDBAtlasVectorSearch(
-        collection=collection,
+        collection=_tasks_collection(),
         embedding=embeddings,
         index_name="default",
         embedding_key="embedding",
@@ -1,30 +1,401 @@
+"""
+WebSocket fan-out for FlowState.
+
+A client_id (one per browser, shared by its tabs) can hold any number of
+connections. Each connection has a bounded outbound queue drained by its own
+writer task, so sending never awaits a socket: send_personal_message and
+broadcast only enqueue, and one slow or dead socket can't stall an agent
+coroutine or the rest of a broadcast. Messages are encoded once per send, not
+once per connection.
+
+Overflow policy: a message sent with a coalesce_key replaces the queued
+message with the same key (e.g. repeated progress updates); otherwise the
+oldest queued message is dropped. A connection that drops a whole queue's
+worth of messages without completing a send, or whose send hasn't finished
+after send_timeout (checked on each heartbeat), is closed and pruned.
+
+Heartbeats: every heartbeat_interval each connection is sent {"type": "ping"};
+connections that haven't sent anything (the client answers with a pong) for
+idle_timeout are closed and pruned.
+
+Sends go through a broker (ws_broker.py, picked by WS_BROKER) so that under
+several uvicorn workers a message reaches the client's sockets whichever
+worker holds them; deliver() is the local half every broker calls.
+
+Personal messages carry a "seq" and are kept in a per-client outbox (the
+last outbox_size for outbox_ttl seconds). A client reconnecting with
+?last_seq=N (the highest seq it has seen) gets the newer ones replayed, so a
+reload during an agent run doesn't lose the result. Without it (or with 0) the
+connection starts from now and nothing is replayed. Every worker fills its
+outbox from deliver(), so the reconnect can land on any of them.
+
+Besides its client_id, a connection can subscribe to topics (e.g.
+"user:<email>" for change events, see change_events.py); publish() sends to
+every connection subscribed to a topic. Topics have their own delivery path,
+so a client_id that happens to equal a topic name never receives it.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
 from fastapi import WebSocket
-from typing import Dict
+
+from json_response import dumps
+from ws_broker import broker_from_env
+
+QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "25"))
+IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "75"))
+OUTBOX_SIZE = int(os.getenv("WS_OUTBOX_SIZE", "64"))
+OUTBOX_TTL = float(os.getenv("WS_OUTBOX_TTL", "600"))
+OUTBOX_CLIENTS = int(os.getenv("WS_OUTBOX_CLIENTS", "10000"))
+
+PING = dumps({"type": "ping"}).decode()
+
+
+class Connection:
+    """One WebSocket plus its outbound queue and writer task."""
+
+    def __init__(self, websocket: WebSocket, client_id: str, max_queue: int = QUEUE_SIZE):
+        self.websocket = websocket
+        self.client_id = client_id
+        self.max_queue = max_queue
+        # [coalesce_key, text] entries, oldest first; _keyed points at the queued entry per key
+        self._queue: Deque[List[Any]] = deque()
+        self._keyed: Dict[str, List[Any]] = {}
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._closer: Optional[asyncio.Future] = None
+        self._drops_since_send = 0
+        # monotonic time the in-flight send started (None when idle)
+        self.sending_since: Optional[float] = None
+        self.topics: Set[str] = set()
+        self.closed = False
+        self.last_seen = time.monotonic()
+        self.counters: Dict[str, int] = {"sent": 0, "coalesced": 0, "dropped": 0}
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def touch(self):
+        """Records that the client sent something (any frame counts as alive)."""
+        self.last_seen = time.monotonic()
+
+    def enqueue(self, text: str, coalesce_key: Optional[str] = None) -> bool:
+        """Queues an encoded message. Returns False if the connection is (or just got) closed."""
+        if self.closed:
+            return False
+        if coalesce_key is not None and coalesce_key in self._keyed:
+            self._keyed[coalesce_key][1] = text
+            self.counters["coalesced"] += 1
+            return True
+        if len(self._queue) >= self.max_queue:
+            dropped_key, _ = self._queue.popleft()
+            self._keyed.pop(dropped_key, None)
+            self.counters["dropped"] += 1
+            self._drops_since_send += 1
+            if self._drops_since_send >= self.max_queue:
+                # The client hasn't taken a whole queue's worth; it's too slow to keep
+                self.abort()
+                return False
+        entry = [coalesce_key, text]
+        self._queue.append(entry)
+        if coalesce_key is not None:
+            self._keyed[coalesce_key] = entry
+        self._ready.set()
+        return True
+
+    def start(self, on_closed):
+        self._writer = asyncio.create_task(self._write_loop())
+        # A done callback also runs for a writer cancelled before it ever started
+        self._writer.add_done_callback(lambda _: self._finished(on_closed))
+
+    def _finished(self, on_closed):
+        self.closed = True
+        on_closed(self)
+        self._closer = asyncio.ensure_future(self._close_socket())
+
+    async def _write_loop(self):
+        try:
+            while True:
+                while not self._queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                key, text = self._queue.popleft()
+                if key is not None:
+                    self._keyed.pop(key, None)
+                self.sending_since = time.monotonic()
+                await self.websocket.send_text(text)
+                self.sending_since = None
+                self.counters["sent"] += 1
+                self._drops_since_send = 0
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"WebSocket send to {self.client_id} failed: {e!r}")
+
+    def abort(self):
+        """Stops the writer; its done callback closes the socket and prunes the connection."""
+        self.closed = True
+        if self._writer is not None and not self._writer.done():
+            self._writer.cancel()
+
+    async def wait_closed(self):
+        if self._writer is not None:
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+        # The writer's done callback has run by now and started the close
+        if self._closer is not None:
+            await self._closer
+
+    async def _close_socket(self):
+        try:
+            await asyncio.wait_for(self.websocket.close(), timeout=1.0)
+        except Exception:
+            pass
+
+
+class Outbox:
+    """Recent personal messages per client_id, for replay after a reconnect."""
+
+    def __init__(self, size: int = OUTBOX_SIZE, ttl: float = OUTBOX_TTL, max_clients: int = OUTBOX_CLIENTS):
+        self.size = size
+        self.ttl = ttl
+        self.max_clients = max_clients
+        # client_id -> (seq, buffered at, coalesce_key, text) entries, least recently used client first
+        self._clients: "OrderedDict[str, Deque[Tuple[int, float, Optional[str], str]]]" = OrderedDict()
+        self._last_seq = 0
+        self.counters: Dict[str, int] = {"buffered": 0, "replayed": 0, "expired": 0}
+
+    def next_seq(self) -> int:
+        # Microsecond timestamps: increasing on this worker and, up to clock skew, across workers
+        self._last_seq = max(time.time_ns() // 1000, self._last_seq + 1)
+        return self._last_seq
+
+    def add(self, client_id: str, seq: int, text: str, coalesce_key: Optional[str] = None):
+        entries = self._clients.get(client_id)
+        if entries is None:
+            entries = self._clients[client_id] = deque()
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client_id)
+        if coalesce_key is not None:
+            # Only the latest message per key is worth replaying
+            for entry in [entry for entry in entries if entry[2] == coalesce_key]:
+                entries.remove(entry)
+        entries.append((seq, time.monotonic(), coalesce_key, text))
+        if len(entries) > self.size:
+            entries.popleft()
+        self.counters["buffered"] += 1
+
+    def since(self, client_id: str, last_seq: int) -> List[str]:
+        """Messages for client_id newer than last_seq that haven't expired, oldest first."""
+        entries = self._clients.get(client_id)
+        if not entries:
+            return []
+        cutoff = time.monotonic() - self.ttl
+        while entries and entries[0][1] < cutoff:
+            entries.popleft()
+            self.counters["expired"] += 1
+        if not entries:
+            del self._clients[client_id]
+            return []
+        texts = [text for seq, _, _, text in sorted(entries, key=lambda entry: entry[0]) if seq > last_seq]
+        self.counters["replayed"] += len(texts)
+        return texts
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "clients": len(self._clients)}
+
 
 class ConnectionManager:
-    def __init__(self):
-        # client_id -> WebSocket
-        self.active_connections: Dict[str, WebSocket] = {}
+    def __init__(
+        self,
+        max_queue: int = QUEUE_SIZE,
+        send_timeout: float = SEND_TIMEOUT,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+        idle_timeout: float = IDLE_TIMEOUT,
+        broker=None,
+        outbox: Optional[Outbox] = None
+    ):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.outbox = outbox if outbox is not None else Outbox()
+        self.broker = broker if broker is not None else broker_from_env()
+        self.broker.bind(self.deliver)
+        # client_id -> open connections (one per tab / device)
+        self.active_connections: Dict[str, Set[Connection]] = {}
+        # topic -> subscribed connections
+        self.topics: Dict[str, Set[Connection]] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.counters: Dict[str, int] = {"connected": 0, "pruned": 0, "undeliverable": 0}
 
-    async def connect(self, websocket: WebSocket, client_id: str):
+    async def connect(self, websocket: WebSocket, client_id: str, last_seq: Optional[int] = None) -> Connection:
+        """Registers the socket and replays outbox messages newer than last_seq (none without one)."""
         await websocket.accept()
-        self.active_connections[client_id] = websocket
-        print(f"WebSocket connected: {client_id}")
-
-    def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-            print(f"WebSocket disconnected: {client_id}")
-
-    async def send_personal_message(self, message: dict, client_id: str):
-        if client_id in self.active_connections:
-            websocket = self.active_connections[client_id]
-            await websocket.send_json(message)
+        connection = Connection(websocket, client_id, self.max_queue)
+        self.active_connections.setdefault(client_id, set()).add(connection)
+        connection.start(self._prune)
+        # No await since registering: nothing was delivered live that is also replayed
+        replayed = self.outbox.since(client_id, last_seq) if last_seq else []
+        for text in replayed:
+            connection.enqueue(text)
+        self.counters["connected"] += 1
+        print(f"WebSocket connected: {client_id} ({len(self.active_connections[client_id])} open, {len(replayed)} replayed)")
+        return connection
+
+    def disconnect(self, connection: Connection):
+        """Called when the client went away; stops the connection's writer."""
+        if self._remove(connection):
+            print(f"WebSocket disconnected: {connection.client_id}")
+        connection.abort()
+
+    def _remove(self, connection: Connection) -> bool:
+        connections = self.active_connections.get(connection.client_id)
+        if connections is None or connection not in connections:
+            return False
+        connections.discard(connection)
+        if not connections:
+            del self.active_connections[connection.client_id]
+        for topic in list(connection.topics):
+            self.unsubscribe(connection, topic)
+        return True
+
+    def subscribe(self, connection: Connection, topic: str):
+        if connection.closed:
+            return
+        self.topics.setdefault(topic, set()).add(connection)
+        connection.topics.add(topic)
+
+    def unsubscribe(self, connection: Connection, topic: str):
+        connection.topics.discard(topic)
+        subscribers = self.topics.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(connection)
+        if not subscribers:
+            del self.topics[topic]
+
+    def _prune(self, connection: Connection):
+        """Writer cleanup: drops a connection that failed, fell behind or went idle."""
+        if self._remove(connection):
+            self.counters["pruned"] += 1
+
+    def _enqueue(self, connections, text: str, coalesce_key: Optional[str]) -> int:
+        return sum(connection.enqueue(text, coalesce_key) for connection in list(connections))
+
+    def deliver(
+        self,
+        client_id: Optional[str],
+        text: str,
+        coalesce_key: Optional[str] = None,
+        seq: Optional[int] = None,
+        topic: Optional[str] = None
+    ) -> int:
+        """
+        Queues an encoded message for this worker's connections of client_id,
+        the connections subscribed to topic, or everyone if neither is given.
+        Personal messages (with a seq) also go to the client's outbox.
+        """
+        if topic is not None:
+            connections = self.topics.get(topic)
+        elif client_id is None:
+            return sum(self._enqueue(connections, text, coalesce_key) for connections in list(self.active_connections.values()))
         else:
-            print(f"DEBUG: client_id {client_id} not found in active connections. Current connections: {list(self.active_connections.keys())}")
+            if seq is not None:
+                self.outbox.add(client_id, seq, text, coalesce_key)
+            connections = self.active_connections.get(client_id)
+        if not connections:
+            return 0
+        return self._enqueue(connections, text, coalesce_key)
+
+    async def send_personal_message(self, message: dict, client_id: str, coalesce_key: Optional[str] = None) -> int:
+        """
+        Publishes message (with a seq added) to every connection of client_id and
+        its outbox. Returns how many local connections it was queued for.
+        """
+        seq = self.outbox.next_seq()
+        delivered = await self.broker.publish(client_id, dumps({**message, "seq": seq}).decode(), coalesce_key, seq)
+        if not delivered and self.broker.local_only:
+            # Kept in the outbox for replay; counted rather than printed per message
+            self.counters["undeliverable"] += 1
+        return delivered
+
+    async def broadcast(self, message: dict, coalesce_key: Optional[str] = None) -> int:
+        return await self.broker.publish(None, dumps(message).decode(), coalesce_key)
+
+    async def publish(self, topic: str, message: dict, coalesce_key: Optional[str] = None) -> int:
+        """Publishes message to every connection subscribed to topic (never to a client_id of that name)."""
+        return await self.broker.publish(None, dumps(message).decode(), coalesce_key, topic=topic)
+
+    def connections(self) -> List[Connection]:
+        return [connection for connections in self.active_connections.values() for connection in connections]
+
+    # -- heartbeats ---------------------------------------------------------
+
+    async def start(self):
+        """Starts the broker and the heartbeat task on the running loop."""
+        if self._heartbeat is None or self._heartbeat.done():
+            await self.broker.start()
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
+            await self.broker.stop()
+        connections = self.connections()
+        for connection in connections:
+            connection.abort()
+        await asyncio.gather(*(connection.wait_closed() for connection in connections))
+
+    def check_heartbeats(self):
+        """Prunes idle and stuck connections and pings the rest."""
+        now = time.monotonic()
+        for connection in self.connections():
+            if now - connection.last_seen > self.idle_timeout:
+                print(f"WebSocket idle for {now - connection.last_seen:.0f}s, closing: {connection.client_id}")
+                connection.abort()
+            elif connection.sending_since is not None and now - connection.sending_since > self.send_timeout:
+                print(f"WebSocket send stuck for {now - connection.sending_since:.0f}s, closing: {connection.client_id}")
+                connection.abort()
+            else:
+                connection.enqueue(PING, coalesce_key="ping")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.check_heartbeats()
+
+    def stats(self) -> Dict[str, Any]:
+        connections = self.connections()
+        totals = {"sent": 0, "coalesced": 0, "dropped": 0}
+        for connection in connections:
+            for name in totals:
+                totals[name] += connection.counters[name]
+        return {
+            **self.counters,
+            "clients": len(self.active_connections),
+            "topics": len(self.topics),
+            "connections": len(connections),
+            "queued": sum(len(connection) for connection in connections),
+            **totals,
+            "outbox": self.outbox.stats(),
+            "broker": self.broker.stats(),
+        }
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections.values():
-            await connection.send_json(message)
 
 manager = ConnectionManager()
@@ -0,0 +1,190 @@
+"""
+Message brokers behind ConnectionManager.send_personal_message.
+
+A WebSocket is held by one uvicorn worker, but a message for it can come
+from any worker (e.g. a background estimation that started in another one).
+The manager publishes every message through a broker, and the broker calls
+the manager's deliver(client_id, text, coalesce_key, seq, topic) (given to
+bind()) on every worker that could hold the client or a subscriber of the
+topic; deliver only queues to that worker's own connections.
+
+- InProcessBroker (WS_BROKER=inprocess, the default): a single worker, so
+  publishing is just local delivery.
+- MongoBroker (WS_BROKER=mongo): messages are also appended to a capped
+  collection that every worker tails with a tailable-await cursor. This works
+  against a standalone local mongod; change streams would need a replica set.
+  Local connections get the message at once. Other workers get it when their
+  cursor returns it, and they record the publish-to-receive latency (stats()).
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+# deliver(client_id, encoded message, coalesce_key, outbox seq, topic) -> local connections queued;
+# client_id and topic both None means everyone
+Deliver = Callable[[Optional[str], str, Optional[str], Optional[int], Optional[str]], int]
+
+WS_BROKER = os.getenv("WS_BROKER", "inprocess")
+CAPPED_BYTES = int(os.getenv("WS_BROKER_CAPPED_MB", "16")) * 1024 * 1024
+
+
+class InProcessBroker:
+    local_only = True
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    def bind(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(
+        self,
+        client_id: Optional[str],
+        text: str,
+        coalesce_key: Optional[str] = None,
+        seq: Optional[int] = None,
+        topic: Optional[str] = None
+    ) -> int:
+        return self._deliver(client_id, text, coalesce_key, seq, topic)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "inprocess"}
+
+
+class MongoBroker:
+    local_only = False
+
+    def __init__(self, database=None, collection_name: str = "ws_messages", capped_bytes: int = CAPPED_BYTES, retry_delay: float = 0.5):
+        # database: an AsyncIOMotorDatabase; defaults to the "broker" pool on db.DB_NAME at start()
+        self.database = database
+        self.collection_name = collection_name
+        self.capped_bytes = capped_bytes
+        self.retry_delay = retry_delay
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._deliver: Optional[Deliver] = None
+        self._collection = None
+        self._task: Optional[asyncio.Task] = None
+        # Ids already handled, so a re-opened cursor (which starts a little early) doesn't deliver twice
+        self._seen: "OrderedDict[Any, None]" = OrderedDict()
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self.counters: Dict[str, int] = {"published": 0, "received": 0, "cursor_restarts": 0}
+
+    def bind(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def start(self):
+        if self.database is None:
+            import db
+            from mongo_clients import mongo_clients
+            self.database = mongo_clients.get("broker")[db.DB_NAME]
+        self._collection = await self._capped_collection()
+        # Our own marker keeps the tailable cursor alive (it dies if nothing matches)
+        started = time.time()
+        await self._collection.insert_one({"worker": self.worker_id, "published_at": started})
+        self._task = asyncio.create_task(self._tail(started))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _capped_collection(self):
+        try:
+            await self.database.create_collection(self.collection_name, capped=True, size=self.capped_bytes)
+        except CollectionInvalid:
+            options = await self.database[self.collection_name].options()
+            if not options.get("capped"):
+                raise RuntimeError(f"{self.collection_name} exists but is not a capped collection")
+        return self.database[self.collection_name]
+
+    async def publish(
+        self,
+        client_id: Optional[str],
+        text: str,
+        coalesce_key: Optional[str] = None,
+        seq: Optional[int] = None,
+        topic: Optional[str] = None
+    ) -> int:
+        delivered = self._deliver(client_id, text, coalesce_key, seq, topic)
+        await self._collection.insert_one({
+            "worker": self.worker_id,
+            "client_id": client_id,
+            "topic": topic,
+            "text": text,
+            "coalesce_key": coalesce_key,
+            "seq": seq,
+            "published_at": time.time(),
+        })
+        self.counters["published"] += 1
+        return delivered
+
+    async def _tail(self, since: float):
+        # published_at comes from each worker's clock; re-opened cursors look back a little
+        # further than the last message seen and skip what was already handled
+        slack = 5.0
+        while True:
+            try:
+                cursor = self._collection.find({"published_at": {"$gte": since}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for doc in cursor:
+                        since = max(since, doc["published_at"] - slack)
+                        self._receive(doc)
+            except PyMongoError as e:
+                print(f"✗ WebSocket broker cursor failed: {e}")
+            self.counters["cursor_restarts"] += 1
+            await asyncio.sleep(self.retry_delay)
+
+    def _receive(self, doc: Dict[str, Any]):
+        if doc["_id"] in self._seen:
+            return
+        self._seen[doc["_id"]] = None
+        if len(self._seen) > 4096:
+            self._seen.popitem(last=False)
+        if doc["worker"] == self.worker_id or "text" not in doc:
+            return
+        self.counters["received"] += 1
+        self._latencies.append((time.time() - doc["published_at"]) * 1000)
+        self._deliver(doc["client_id"], doc["text"], doc.get("coalesce_key"), doc.get("seq"), doc.get("topic"))
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+        return {
+            "backend": "mongo",
+            "worker": self.worker_id,
+            **self.counters,
+            "latency_ms_p50": percentile(0.5),
+            "latency_ms_p99": percentile(0.99),
+            "latency_ms_max": round(latencies[-1], 2) if latencies else None,
+        }
+
+
+def broker_from_env():
+    if WS_BROKER == "mongo":
+        return MongoBroker()
+    if WS_BROKER != "inprocess":
+        raise ValueError(f"Unknown WS_BROKER '{WS_BROKER}' (expected inprocess or mongo)")
+    return InProcessBroker()
@@ -1,5 +1,6 @@
-import React, { createContext, useContext, useEffect, useState, useRef } from 'react';
+import React, { createContext, useCallback, useContext, useEffect, useState, useRef } from 'react';
 import { v4 as uuidv4 } from 'uuid';
+import { useAuth } from './AuthContext';
 
 interface WebSocketMessage {
     type: string;
@@ -10,9 +11,18 @@ interface WebSocketContextType {
     socketId: string;
     lastMessage: WebSocketMessage | null;
     sendMessage: (message: any) => void;
+    request: (method: string, params: Record<string, any>) => Promise<any>;
     isConnected: boolean;
 }
 
+interface PendingRequest {
+    resolve: (result: any) => void;
+    reject: (error: Error) => void;
+    timer: ReturnType<typeof setTimeout>;
+}
+
+const REQUEST_TIMEOUT_MS = 10000;
+
 const WebSocketContext = createContext<WebSocketContextType | null>(null);
 
 export const WebSocketProvider: React.FC<{ children: React.ReactNode }> = ({ children }) => {
@@ -27,10 +37,15 @@ export const WebSocketProvider: React.FC<{ children: React.ReactNode }> = ({ chi
     const [lastMessage, setLastMessage] = useState<WebSocketMessage | null>(null);
     const [isConnected, setIsConnected] = useState(false);
     const socketRef = useRef<WebSocket | null>(null);
+    // rpc requests awaiting their rpc_result, by correlation id
+    const pendingRef = useRef<Map<string, PendingRequest>>(new Map());
+    const { email } = useAuth();
 
     useEffect(() => {
         const baseWsUrl = import.meta.env.VITE_WS_URL || 'ws://localhost:8000/ws';
-        const wsUrl = `${baseWsUrl}/${socketId}`;
+        // Messages newer than the last one we saw (e.g. an agent result sent during a reload) are replayed
+        const lastSeq = localStorage.getItem('flowstate_last_seq') || '0';
+        const wsUrl = `${baseWsUrl}/${socketId}?last_seq=${lastSeq}`;
         console.log('Connecting to WebSocket:', wsUrl);
         const socket = new WebSocket(wsUrl);
         socketRef.current = socket;
@@ -43,6 +58,24 @@ export const WebSocketProvider: React.FC<{ children: React.ReactNode }> = ({ chi
         socket.onmessage = (event) => {
             try {
                 const data = JSON.parse(event.data);
+                if (data.type === 'ping') {
+                    // Server heartbeat: answer so the connection isn't pruned as idle
+                    socket.send(JSON.stringify({ type: 'pong' }));
+                    return;
+                }
+                if (typeof data.seq === 'number' && data.seq > Number(localStorage.getItem('flowstate_last_seq') || 0)) {
+                    localStorage.setItem('flowstate_last_seq', String(data.seq));
+                }
+                if (data.type === 'rpc_result') {
+                    const pending = pendingRef.current.get(data.id);
+                    if (pending) {
+                        pendingRef.current.delete(data.id);
+                        clearTimeout(pending.timer);
+                        if (data.ok) pending.resolve(data.result);
+                        else pending.reject(new Error(`${data.error.code}: ${data.error.message}`));
+                    }
+                    return;
+                }
                 setLastMessage(data);
             } catch (err) {
                 console.error('Failed to parse WebSocket message:', err);
@@ -52,6 +85,11 @@ export const WebSocketProvider: React.FC<{ children: React.ReactNode }> = ({ chi
         socket.onclose = () => {
             console.log('WebSocket Disconnected');
             setIsConnected(false);
+            pendingRef.current.forEach((pending) => {
+                clearTimeout(pending.timer);
+                pending.reject(new Error('WebSocket closed'));
+            });
+            pendingRef.current.clear();
             // Optional: implement reconnect logic
         };
 
@@ -64,14 +102,43 @@ export const WebSocketProvider: React.FC<{ children: React.ReactNode }> = ({ chi
         };
     }, [socketId]);
 
+    // Join the signed-in user's change events (sent again after a reconnect)
+    useEffect(() => {
+        const socket = socketRef.current;
+        if (!email || !isConnected || socket?.readyState !== WebSocket.OPEN) return;
+        socket.send(JSON.stringify({ type: 'subscribe', email }));
+        return () => {
+            if (socket.readyState === WebSocket.OPEN) {
+                socket.send(JSON.stringify({ type: 'unsubscribe', email }));
+            }
+        };
+    }, [email, isConnected]);
+
     const sendMessage = (message: any) => {
         if (socketRef.current?.readyState === WebSocket.OPEN) {
             socketRef.current.send(JSON.stringify(message));
         }
     };
 
+    // Request/response over the socket; rejects if it isn't open or no answer comes in time
+    const request = useCallback((method: string, params: Record<string, any>): Promise<any> => {
+        const socket = socketRef.current;
+        if (socket?.readyState !== WebSocket.OPEN) {
+            return Promise.reject(new Error('WebSocket not connected'));
+        }
+        const id = uuidv4();
+        return new Promise((resolve, reject) => {
+            const timer = setTimeout(() => {
+                pendingRef.current.delete(id);
+                reject(new Error(`${method} timed out`));
+            }, REQUEST_TIMEOUT_MS);
+            pendingRef.current.set(id, { resolve, reject, timer });
+            socket.send(JSON.stringify({ type: 'rpc', id, method, params }));
+        });
+    }, []);
+
     return (
-        <WebSocketContext.Provider value={{ socketId, lastMessage, sendMessage, isConnected }}>
+        <WebSocketContext.Provider value={{ socketId, lastMessage, sendMessage, request, isConnected }}>
             {children}
         </WebSocketContext.Provider>
     );
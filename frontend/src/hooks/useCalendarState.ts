@@ -4,42 +4,44 @@ import { addMinutes, isSameDay } from 'date-fns';
 import { taskAPI } from '../api/flowstate';
 import { useWebSocket } from '../contexts/WebSocketContext';
 
+// Transform API tasks to frontend Task format
+const toTask = (t: any): Task => ({
+    id: t._id || t.id,
+    taskClientId: t.task_client_id, // Preserve for WebSocket matching
+    title: t.title,
+    description: t.description,
+    startTime: t.start_time ? new Date(t.start_time) : new Date(),
+    // Derive endTime from startTime + duration when backend doesn't store it
+    endTime: t.end_time
+        ? new Date(t.end_time)
+        : addMinutes(t.start_time ? new Date(t.start_time) : new Date(), t.duration || 30),
+    duration: t.duration || 30,
+    cost: t.estimated_cost || 0,
+    color: t.color || '#3b82f6',
+    isCompleted: t.is_completed || false,
+    estimatedTime: t.estimatedTime || 30,
+    estimatedCost: t.estimatedCost || 0,
+    recurrence: t.recurrence,
+    tagNames: t.tag_names || [],
+    actualDuration: t.actual_duration,
+    actualCost: t.actual_cost,
+    aiEstimationStatus: t.ai_estimation_status,
+    aiTimeEstimation: t.ai_time_estimation,
+    aiCostEstimation: t.ai_cost_estimation,
+    aiRecommendation: t.ai_recommendation,
+    aiReasoning: t.ai_reasoning,
+    aiConfidence: t.ai_confidence
+});
+
 export function useCalendarState(userEmail: string | null) {
     const [tasks, setTasks] = useState<Task[]>([]);
-    const { lastMessage } = useWebSocket();
+    const { lastMessage, request, isConnected } = useWebSocket();
 
     const fetchTasks = useCallback(async () => {
         if (!userEmail) return;
         try {
             const fetchedTasks = await taskAPI.getAllForUser(userEmail);
-            // Transform API tasks to frontend Task format
-            const formattedTasks: Task[] = fetchedTasks.map((t: any) => ({
-                id: t._id || t.id,
-                taskClientId: t.task_client_id, // Preserve for WebSocket matching
-                title: t.title,
-                description: t.description,
-                startTime: t.start_time ? new Date(t.start_time) : new Date(),
-                // Derive endTime from startTime + duration when backend doesn't store it
-                endTime: t.end_time
-                    ? new Date(t.end_time)
-                    : addMinutes(t.start_time ? new Date(t.start_time) : new Date(), t.duration || 30),
-                duration: t.duration || 30,
-                cost: t.estimated_cost || 0,
-                color: t.color || '#3b82f6',
-                isCompleted: t.is_completed || false,
-                estimatedTime: t.estimatedTime || 30,
-                estimatedCost: t.estimatedCost || 0,
-                recurrence: t.recurrence,
-                tagNames: t.tag_names || [],
-                actualDuration: t.actual_duration,
-                actualCost: t.actual_cost,
-                aiEstimationStatus: t.ai_estimation_status,
-                aiTimeEstimation: t.ai_time_estimation,
-                aiCostEstimation: t.ai_cost_estimation,
-                aiRecommendation: t.ai_recommendation,
-                aiReasoning: t.ai_reasoning,
-                aiConfidence: t.ai_confidence
-            }));
+            const formattedTasks: Task[] = fetchedTasks.map(toTask);
             setTasks(formattedTasks);
         } catch (error) {
             console.error("Failed to fetch tasks:", error);
@@ -50,11 +52,25 @@ export function useCalendarState(userEmail: string | null) {
         fetchTasks();
     }, [fetchTasks]);
 
-    // Handle WebSocket messages for AI estimation updates
+    // Handle WebSocket messages for AI estimation updates and task changes from other tabs/devices
     useEffect(() => {
         if (!lastMessage) return;
 
-        if (lastMessage.type === 'agent_status' && lastMessage.status === 'loading') {
+        if (lastMessage.type === 'changes' && lastMessage.tasks) {
+            if (lastMessage.tasks.resync) {
+                fetchTasks();
+                return;
+            }
+            const changed: Task[] = lastMessage.tasks.changed.map(toTask);
+            const changedIds = new Set(changed.map(t => t.id));
+            const deletedIds = new Set<string>(lastMessage.tasks.deleted.flatMap((d: any) => [d._id, d.task_client_id]));
+            setTasks(prev => [
+                ...prev.filter(t => !changedIds.has(t.id) && !deletedIds.has(t.id)
+                    // Optimistic tasks are keyed by their client id until the server _id is known
+                    && !changed.some(c => c.taskClientId === t.id)),
+                ...changed
+            ]);
+        } else if (lastMessage.type === 'agent_status' && lastMessage.status === 'loading') {
             // Find task by taskClientId and set loading state
             const taskClientId = lastMessage.task_client_id;
             setTasks(prev => prev.map(t =>
@@ -87,7 +103,7 @@ export function useCalendarState(userEmail: string | null) {
                     : t
             ));
         }
-    }, [lastMessage]);
+    }, [lastMessage, fetchTasks]);
 
     const addTask = useCallback(async (task: Task, socketId?: string) => {
         if (!userEmail) return;
@@ -130,6 +146,11 @@ export function useCalendarState(userEmail: string | null) {
             return merged;
         }));
         try {
+            const keys = Object.keys(updates);
+            if (isConnected && keys.length === 1 && updates.isCompleted !== undefined) {
+                await request('task.complete', { task_id: id, is_completed: updates.isCompleted });
+                return;
+            }
             const backendUpdates: any = { ...updates };
             // Map frontend keys to backend keys
             if (updates.startTime) backendUpdates.start_time = updates.startTime.toISOString();
@@ -154,7 +175,7 @@ export function useCalendarState(userEmail: string | null) {
         } catch (e) {
             console.error("Failed to update task", e);
         }
-    }, []);
+    }, [isConnected, request]);
 
     const moveTask = useCallback((id: string, newStartTime: Date, newTag?: string) => {
         setTasks((prev) => prev.map((t) => {
@@ -171,19 +192,23 @@ export function useCalendarState(userEmail: string | null) {
                 tagNames: newTagNames
             };
 
-            // We call the API asynchronously but update state immediately
-            taskAPI.update(id, {
-                start_time: newStartTime.toISOString(),
-                // end_time: endTime.toISOString(), // Removed
-                tag_names: newTagNames
-            }).catch(console.error);
+            // We call the API asynchronously but update state immediately.
+            // Over the socket, a burst of moves is written once by the server.
+            (isConnected
+                ? request('task.move', { task_id: id, start_time: newStartTime.toISOString(), tag_names: newTagNames })
+                : taskAPI.update(id, {
+                    start_time: newStartTime.toISOString(),
+                    // end_time: endTime.toISOString(), // Removed
+                    tag_names: newTagNames
+                })
+            ).catch(console.error);
 
             return {
                 ...t,
                 ...updates
             };
         }));
-    }, []);
+    }, [isConnected, request]);
 
     const resizeTask = useCallback((id: string, newDuration: number) => {
         setTasks((prev) => prev.map((t) => {
@@ -192,9 +217,10 @@ export function useCalendarState(userEmail: string | null) {
             const endTime = addMinutes(t.startTime, newDuration);
 
             // Trigger API update
-            taskAPI.update(id, {
-                duration: newDuration
-            }).catch(console.error);
+            (isConnected
+                ? request('task.resize', { task_id: id, duration: newDuration })
+                : taskAPI.update(id, { duration: newDuration })
+            ).catch(console.error);
 
             return {
                 ...t,
@@ -203,7 +229,7 @@ export function useCalendarState(userEmail: string | null) {
                 estimatedTime: newDuration,
             };
         }));
-    }, []);
+    }, [isConnected, request]);
 
     const deleteTask = useCallback(async (id: string) => {
         setTasks((prev) => prev.filter((t) => t.id !== id));